@@ -0,0 +1,75 @@
+"""Helpers shared by the benchmark scripts."""
+import asyncio
+import contextlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_synthetic_video(path, frames=120, size=(640, 360), fps=30):
+    import cv2
+    import numpy as np
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), 30, dtype=np.uint8)
+        x = int((size[0] - 80) * i / frames)
+        frame[140:220, x:x + 80] = (0, 120, 255)
+        writer.write(frame)
+    writer.release()
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(pct(50) * 1000, 3),
+        "p95_ms": round(pct(95) * 1000, 3),
+        "p99_ms": round(pct(99) * 1000, 3),
+    }
+
+
+@contextlib.asynccontextmanager
+async def running_api(env, port=None, startup_timeout=300, workers=1):
+    """Run gemma_api under uvicorn in a subprocess; yields its base URL once /health answers."""
+    port = port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "gemma_api:app", "--port", str(port), "--log-level", "warning",
+         "--workers", str(workers)],
+        cwd=BACKEND_DIR, env=dict(os.environ, WORKERS=str(workers), **env))
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+            for _ in range(startup_timeout * 2):
+                if server.poll() is not None:
+                    raise RuntimeError(f"API exited with code {server.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.5)
+            else:
+                raise RuntimeError("API did not start")
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
@@ -0,0 +1,79 @@
+"""Compare two benchmark result files written by benchmarks.run.
+
+Metrics ending in _ms are lower-is-better, *_per_sec and recall_* metrics
+are higher-is-better; everything else is shown for context only. Exits with
+status 1 when any metric regressed by more than --threshold.
+
+Run from backend/:
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(name):
+    """+1 if higher is better, -1 if lower is better, 0 if informational."""
+    metric = name.rsplit(".", 1)[-1]
+    if metric.endswith("_per_sec") or metric.startswith("recall_"):
+        return 1
+    if metric.endswith("_ms") and metric != "upstream_latency_ms":
+        return -1
+    return 0
+
+
+def compare(base, new, threshold):
+    base_flat, new_flat = flatten(base["results"]), flatten(new["results"])
+    rows, regressions = [], []
+    for name in sorted(base_flat.keys() & new_flat.keys()):
+        old, cur = base_flat[name], new_flat[name]
+        change = (cur - old) / old if old else 0.0
+        sign = direction(name)
+        verdict = ""
+        if sign and abs(change) > threshold:
+            verdict = "better" if change * sign > 0 else "REGRESSED"
+            if verdict == "REGRESSED":
+                regressions.append(name)
+        rows.append((name, old, cur, change, verdict))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as significant")
+    parser.add_argument("--all", action="store_true", help="Also show metrics that did not change significantly")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{base['meta']['commit']} -> {new['meta']['commit']}  (threshold {args.threshold:.0%})\n")
+    print(f"{'metric':<52} {'base':>12} {'new':>12} {'change':>9}")
+    for name, old, cur, change, verdict in rows:
+        if verdict or args.all:
+            print(f"{name:<52} {old:>12.4g} {cur:>12.4g} {change:>+9.1%} {verdict}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Fake Ollama server for load tests and benchmarks.
+
+Implements the parts of the Ollama HTTP API the backend uses (/api/generate,
+/api/chat, /api/tags, /api/show) with configurable latency and a limited
+number of parallel slots, like OLLAMA_NUM_PARALLEL on a real instance.
+
+Like Ollama's prompt cache, each slot remembers its last prompt plus reply;
+a new prompt only pays `per_token_latency` for the tokens (~4 chars each)
+after its longest common prefix with a cached one, and prompt_eval_count
+reports just those tokens.
+
+Run standalone:  python -m benchmarks.fake_ollama --port 11500
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, text_latency=0.05, image_latency=0.3,
+                 per_token_latency=0.0, parallel=4, models=("gemma3", "gemma2:2b"), reply_words=0):
+        self.text_latency = text_latency
+        self.reply_words = reply_words  # filler words appended to each reply, for realistic history sizes
+        self.image_latency = image_latency
+        self.per_token_latency = per_token_latency
+        self.models = list(models)
+        self.slots = threading.Semaphore(parallel)
+        self.prompt_cache = collections.deque(maxlen=parallel)  # prompt + reply per slot
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _reply_text(self, prompt):
+        # ReAct-style answer so a LangChain agent pointed at this server finishes in one step
+        return f"Final Answer: fake reply to {len(prompt)} chars" + " lorem" * self.reply_words
+
+    def _generate(self, prompt, images):
+        """Simulate model work; returns (text, timing fields)."""
+        queued_at = time.perf_counter()
+        with self.slots:
+            started = time.perf_counter()
+            with self._lock:
+                cached = max((len(os.path.commonprefix([prompt, c])) for c in self.prompt_cache), default=0)
+            prompt_tokens = max(1, (len(prompt) - cached) // 4)
+            prompt_work = self.per_token_latency * prompt_tokens
+            work = self.text_latency + self.image_latency * images + prompt_work
+            time.sleep(work)
+        text = self._reply_text(prompt)
+        with self._lock:
+            self.requests += 1
+            self.prompt_cache.append(prompt + text)
+        done = time.perf_counter()
+        stats = {
+            "total_duration": int((done - queued_at) * 1e9),
+            "load_duration": int((started - queued_at) * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prompt_work + (work - prompt_work) * 0.5) * 1e9),
+            "eval_count": max(1, len(text) // 4),
+            "eval_duration": int((work - prompt_work) * 0.5 * 1e9),
+        }
+        return text, stats
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json"):
+                raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._send(200, {"models": [{"name": m, "model": m} for m in fake.models]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                data = self._body()
+                if self.path.startswith("/api/show"):
+                    self._send(200, {"capabilities": ["completion", "vision"], "model_info": {}})
+                    return
+                if self.path.startswith("/api/generate"):
+                    # Ollama renders the system prompt ahead of the prompt
+                    prompt = data.get("system", "") + data.get("prompt", "")
+                    text, stats = fake._generate(prompt, len(data.get("images") or []))
+                    body = {"model": data.get("model"), "response": text, "done": True, **stats}
+                elif self.path.startswith("/api/chat"):
+                    messages = data.get("messages", [])
+                    # Rendered like a chat template, so the previous prompt + reply is a prefix of the next turn
+                    prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}</{m.get('role')}>" for m in messages)
+                    prompt += "<assistant>"
+                    images = sum(len(m.get("images") or []) for m in messages)
+                    text, stats = fake._generate(prompt, images)
+                    body = {"model": data.get("model"), "message": {"role": "assistant", "content": text},
+                            "done": True, **stats}
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+                if data.get("stream", True):
+                    # Ollama streams NDJSON by default; send the whole reply as one chunk
+                    final = dict(body)
+                    if "response" in final:
+                        final["response"] = ""
+                    else:
+                        final["message"] = {"role": "assistant", "content": ""}
+                    first = {k: v for k, v in body.items() if k in ("model", "response", "message")}
+                    first["done"] = False
+                    raw = (json.dumps(first) + "\n" + json.dumps(final) + "\n").encode()
+                    self._send(200, raw, "application/x-ndjson")
+                else:
+                    self._send(200, body)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--text-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=0.3)
+    parser.add_argument("--per-token-latency", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+    fake = FakeOllama(port=args.port, text_latency=args.text_latency, image_latency=args.image_latency,
+                      per_token_latency=args.per_token_latency, parallel=args.parallel)
+    print(f"Fake Ollama listening on {fake.base_url}")
+    fake.server.serve_forever()
@@ -0,0 +1,1007 @@
+"""Offline benchmark suite for the backend hot paths.
+
+Covers chunk_texts, /api/rag/upload (embedding + index build), retrieve_context
+at several index sizes, dense vs hybrid vs BM25-prefiltered retrieval (latency
+and recall against exhaustive dense search),
+int8/binary/PCA vector storage (memory and recall), embedding backends
+(sentences/sec and agreement with torch), search latency while the index is
+rebuilt in the background and the cost of deletes/compaction, per-caption
+appends to an on-disk shard, frame extraction/encoding on a synthetic video, the
+cost of the /metrics instrumentation and of logging, endpoint throughput
+against fake Ollama, Gemini and RapidAPI servers, tail latency and failures
+with and without the resilience layer against a fault-injecting stub, /api/chat
+routing between a saturated fake Ollama and a stub Gemini, prompt-eval cost of
+turn 10 with server-side chat sessions vs. flattened history (failing if the
+session history refolds or drops turns), prompt-eval time
+of RAG prompts with and without a cache-friendly layout (optionally against a
+real Ollama), prompt-eval cost of long conversations with and without a history
+budget, and RAG query throughput
+with several uvicorn workers sharing one store. Uses the hashing embedder,
+so no model download or network access is needed.
+
+Results are written as JSON (default: benchmarks/results/<commit>.json);
+compare two runs with benchmarks.compare.
+
+Run from backend/:
+    python -m benchmarks.run
+    python -m benchmarks.run --only retrieve_context --sizes 1000,100000
+    python -m benchmarks.run --only retrieval_modes --mode-sizes 10000,100000
+    python -m benchmarks.run --only quantization --quant-chunks 20000
+    python -m benchmarks.run --only embedders --embed-threads 1,4
+    python -m benchmarks.run --only prompt_cache --ollama-url http://localhost:11434 --ollama-model gemma3
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.common import BACKEND_DIR, percentiles, running_api, write_synthetic_video
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.stub_apis import StubAPIs
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+WORDS = ("integral derivative limit matrix vector photosynthesis mitochondria democracy "
+         "revolution equation velocity momentum algorithm recursion grammar poetry").split()
+
+
+def load_api():
+    """Import gemma_api with the offline embedder and in-memory RAG shards."""
+    os.environ.setdefault("RAG_EMBEDDER", "hashing")
+    os.environ.setdefault("RAG_STORE_DIR", "")  # keep shards in memory
+    with contextlib.redirect_stdout(io.StringIO()):
+        import gemma_api
+    return gemma_api
+
+
+def synthetic_docs(count, length, seed=0):
+    rng = np.random.default_rng(seed)
+    docs = []
+    for _ in range(count):
+        words = rng.choice(WORDS, size=length // 8)
+        docs.append(" ".join(words)[:length])
+    return docs
+
+
+def timed(fn, repeats):
+    """Run fn `repeats` times; returns (durations in seconds, last result)."""
+    durations, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return durations, result
+
+
+# --- in-process benchmarks ---
+
+def bench_chunk_texts(args):
+    api = load_api()
+    docs = synthetic_docs(200, 25_000)
+    total_mb = sum(len(d) for d in docs) / 1e6
+    durations, chunks = timed(lambda: api.chunk_texts(docs), args.repeats)
+    best = min(durations)
+    return {
+        "input_mb": round(total_mb, 2),
+        "chunks": len(chunks),
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "mb_per_sec": round(total_mb / best, 1),
+        "chunks_per_sec": round(len(chunks) / best),
+    }
+
+
+def bench_rag_upload(args):
+    api = load_api()
+    docs = synthetic_docs(args.upload_chunks // 10, 3000)
+    chunks = api.chunk_texts(docs)
+
+    embed_durations, embeddings = timed(lambda: api.RAG_MODEL.encode(chunks), 1)
+    build_durations, _ = timed(lambda: api.DOC_STORE.replace(api.PUBLIC_NAMESPACE, chunks, embeddings), args.repeats)
+
+    async def upload():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            resp = await client.post("/api/rag/upload", json={"texts": docs})
+            elapsed = time.perf_counter() - start
+            resp.raise_for_status()
+            return elapsed
+
+    endpoint_s = asyncio.run(upload())
+    api.DOC_STORE.replace(api.PUBLIC_NAMESPACE, [], [])
+    return {
+        "chunks": len(chunks),
+        "embed_ms": round(embed_durations[0] * 1000, 1),
+        "index_build_ms": round(statistics.median(build_durations) * 1000, 1),
+        "endpoint_ms": round(endpoint_s * 1000, 1),
+        "endpoint_chunks_per_sec": round(len(chunks) / endpoint_s),
+    }
+
+
+def bench_retrieve_context(args):
+    api = load_api()
+    rng = np.random.default_rng(0)
+    queries = [" ".join(rng.choice(WORDS, size=6)) for _ in range(args.queries)]
+    results = {}
+    for size in args.sizes:
+        # Random unit vectors stand in for embeddings; encoding 1M real chunks would dominate the run
+        embeddings = rng.standard_normal((size, 384), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        texts = [f"chunk {i}" for i in range(size)]
+        start = time.perf_counter()
+        api.DOC_STORE.replace(api.PUBLIC_NAMESPACE, texts, embeddings)
+        build_s = time.perf_counter() - start
+        del embeddings
+
+        api.retrieve_context(queries[0], mode="dense")  # warm-up
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            api.retrieve_context(query, k=5, mode="dense")
+            latencies.append(time.perf_counter() - start)
+        results[str(size)] = {"index_build_ms": round(build_s * 1000, 1), **percentiles(latencies)}
+        api.DOC_STORE.replace(api.PUBLIC_NAMESPACE, [], [])
+    return results
+
+
+def zipf_corpus(count, words_per_chunk, vocab_size=5000, codes=2000, seed=0):
+    """Chunks of Zipf-distributed words, each tagged with a course code like "cs-0042"."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(WORDS + [f"term{i}" for i in range(vocab_size)])
+    weights = 1 / np.arange(1, len(vocab) + 1)
+    word_ids = rng.choice(len(vocab), size=(count, words_per_chunk), p=weights / weights.sum())
+    chunk_codes = rng.integers(0, codes, size=count)
+    texts = [f"cs-{code:04d} " + " ".join(vocab[row]) for code, row in zip(chunk_codes, word_ids)]
+    return texts, vocab, word_ids, chunk_codes
+
+
+def bench_retrieval_modes(args):
+    """Query latency for dense, hybrid and BM25-prefiltered search, and their recall@5 against dense search.
+
+    Recall is measured against the exhaustive dense top 5 under the configured
+    embedder (RAG_EMBEDDER), so it shows how many of the dense results hybrid
+    ranking and the BM25 prefilter give up; it is not recall against a known
+    right answer, which the offline hashing embedder could not estimate.
+    """
+    from rag_store import RagIndex
+
+    api = load_api()
+    modes = ("dense", "hybrid", "prefilter")
+    rng = np.random.default_rng(1)
+
+    # Recall: each query names a chunk's course code plus two of its rarer words
+    texts, vocab, word_ids, codes = zipf_corpus(5000, 30)
+    index = RagIndex()
+    index.replace(texts, api.RAG_MODEL.encode(texts))
+    targets = rng.choice(len(texts), size=args.queries, replace=False)
+    queries = [f"cs-{codes[t]:04d} {' '.join(vocab[np.sort(word_ids[t])[-2:]])}" for t in targets]
+    query_embs = api.RAG_MODEL.encode(queries)
+    dense_top = [{t for t, _, _ in index.search(emb, k=5, query_text=query, mode="dense")}
+                 for query, emb in zip(queries, query_embs)]
+    results = {"recall_corpus_chunks": len(texts)}
+    for mode in ("hybrid", "prefilter"):
+        overlap = sum(len(top & {t for t, _, _ in index.search(emb, k=5, query_text=query, mode=mode)})
+                      for top, query, emb in zip(dense_top, queries, query_embs))
+        results[f"{mode}_recall_at_5_vs_dense"] = round(overlap / sum(len(top) for top in dense_top), 3)
+
+    # Latency: random vectors stand in for embeddings so large indexes build quickly; the queries are
+    # built as above, so the lexical modes have candidates to work on
+    for size in args.mode_sizes:
+        texts, vocab, word_ids, codes = zipf_corpus(size, 30, seed=size)
+        targets = rng.choice(size, size=args.queries, replace=False)
+        queries = [f"cs-{codes[t]:04d} {' '.join(vocab[np.sort(word_ids[t])[-2:]])}" for t in targets]
+        embeddings = rng.standard_normal((size, 384), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        index = RagIndex()
+        start = time.perf_counter()
+        index.replace(texts, embeddings)
+        build_s = time.perf_counter() - start
+        del embeddings, texts
+        query_embs = rng.standard_normal((args.queries, 384), dtype=np.float32)
+        for mode in modes:
+            index.search(query_embs[0], k=5, query_text=queries[0], mode=mode)  # warm-up
+            latencies = []
+            for query, emb in zip(queries, query_embs):
+                start = time.perf_counter()
+                index.search(emb, k=5, query_text=query, mode=mode)
+                latencies.append(time.perf_counter() - start)
+            results.setdefault(mode, {})[str(size)] = percentiles(latencies)
+        results[f"index_build_ms_{size}"] = round(build_s * 1000, 1)
+        results[f"lexical_mb_{size}"] = round(index.lexical.memory_bytes() / 1e6, 1)
+    return results
+
+
+def synthetic_embeddings(count, dim=384, rank=96, seed=0):
+    """Dense, anisotropic unit vectors (decaying spectrum plus noise), shaped like sentence embeddings.
+
+    Hashing-embedder vectors are sparse with many tied scores, which would
+    misrepresent how quantization and PCA behave on MiniLM vectors.
+    """
+    rng = np.random.default_rng(seed)
+    basis = np.random.default_rng(1234).standard_normal((rank, dim)).astype(np.float32)
+    basis /= np.sqrt(np.arange(1, rank + 1, dtype=np.float32))[:, None]
+    x = rng.standard_normal((count, rank), dtype=np.float32) @ basis
+    x += 0.3 * rng.standard_normal((count, dim), dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def bench_quantization(args):
+    """Vector memory per 1M chunks, latency and recall@10 against the exact float32 index.
+
+    Each index is saved and searched after loading it memory-mapped, as namespace shards are, so
+    resident memory leaves out arrays that are only read in part (binary's rescoring vectors).
+    """
+    from rag_store import RagIndex
+
+    embeddings = synthetic_embeddings(args.quant_chunks)
+    query_embs = synthetic_embeddings(args.queries, seed=1)
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+    configs = (("float32", 0), ("int8", 0), ("binary", 0), ("float32", 128), ("int8", 128), ("int8", 64))
+    exact = None
+    results = {"chunks": len(texts)}
+    for quantization, pca_dims in configs:
+        built = RagIndex(quantization=quantization, pca_dims=pca_dims)
+        start = time.perf_counter()
+        built.replace(texts, embeddings)
+        build_s = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            built.save(os.path.join(tmp, "index"))
+            index = RagIndex.load(os.path.join(tmp, "index"))
+            index.search(query_embs[0], k=10)  # warm-up
+            latencies, top = [], []
+            for emb in query_embs:
+                start = time.perf_counter()
+                hits = index.search(emb, k=10)
+                latencies.append(time.perf_counter() - start)
+                top.append({text for text, _, _ in hits})
+            exact = exact or top
+            recall = sum(len(a & b) for a, b in zip(exact, top)) / sum(len(a) for a in exact)
+            resident_bytes = index.vectors.nbytes()
+            stored_bytes = sum(a.nbytes for a in index.vectors.arrays().values())
+            del index
+        results[f"{quantization}_pca{pca_dims}" if pca_dims else quantization] = {
+            "vector_mb_per_1m_chunks": round(resident_bytes / len(texts) * 1e6 / 2 ** 20, 1),
+            "stored_mb_per_1m_chunks": round(stored_bytes / len(texts) * 1e6 / 2 ** 20, 1),
+            "recall_at_10": round(recall, 3),
+            "index_build_ms": round(build_s * 1000, 1),
+            **percentiles(latencies),
+        }
+    return results
+
+
+def bench_rebuild(args):
+    """Search latency while another thread keeps rebuilding the index, plus delete and compaction cost."""
+    import threading
+
+    from rag_store import COMPACT_RATIO, RagIndex
+
+    embeddings = synthetic_embeddings(args.quant_chunks)
+    query_embs = synthetic_embeddings(args.queries, seed=1)
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+    metadata = [{"doc_id": f"doc-{i % 100}"} for i in range(len(texts))]
+    index = RagIndex()
+    index.replace(texts, embeddings, metadata)
+
+    def search_all():
+        latencies = []
+        for emb in query_embs:
+            start = time.perf_counter()
+            hits = index.search(emb, k=10)
+            latencies.append(time.perf_counter() - start)
+            assert len(hits) == 10
+        return latencies
+
+    results = {"chunks": len(texts), "idle": percentiles(search_all())}
+    stop = threading.Event()
+    rebuilds = []
+
+    def rebuild():
+        while not stop.is_set():
+            start = time.perf_counter()
+            index.replace(texts, embeddings, metadata)
+            rebuilds.append(time.perf_counter() - start)
+
+    thread = threading.Thread(target=rebuild)
+    thread.start()
+    try:
+        during = []
+        while len(rebuilds) < 3:
+            during.extend(search_all())
+    finally:
+        stop.set()
+        thread.join()
+    results["during_rebuild"] = percentiles(during)
+    results["rebuild_ms"] = round(statistics.mean(rebuilds) * 1000, 1)
+
+    # Tombstone documents one at a time until compaction kicks in
+    deletes, doc = [], 0
+    while index.vectors is not None and len(index.texts) == len(texts):
+        start = time.perf_counter()
+        index.delete({"doc_id": f"doc-{doc}"})
+        deletes.append(time.perf_counter() - start)
+        doc += 1
+    results["delete_ms"] = round(statistics.median(deletes[:-1]) * 1000, 2)
+    results["compacting_delete_ms"] = round(deletes[-1] * 1000, 1)
+    results["deleted_fraction_at_compaction"] = round(doc / 100, 2)
+    assert doc / 100 >= COMPACT_RATIO
+    results["after_compaction"] = percentiles(search_all())
+    return results
+
+
+def bench_appends(args):
+    """Cost of publishing one caption at a time to an on-disk shard of --append-chunks chunks:
+    append-only segments vs. rewriting the shard on every append, and a cold load of the chain."""
+    import rag_namespaces
+    from rag_namespaces import NamespaceStore
+
+    embeddings = synthetic_embeddings(args.append_chunks)
+    texts = synthetic_docs(args.append_chunks, 200)
+    captions = synthetic_embeddings(args.appends, seed=1)
+    results = {"chunks": len(texts), "appends": args.appends}
+    for name, max_segments in (("full_rewrite", 1), ("segments", rag_namespaces.MAX_SEGMENTS)):
+        with tempfile.TemporaryDirectory() as root, mock_attr(rag_namespaces, "MAX_SEGMENTS", max_segments):
+            store = NamespaceStore(root)
+            store.replace("videos", texts, embeddings)
+            latencies = []
+            for i, emb in enumerate(captions):
+                start = time.perf_counter()
+                store.add("videos", [f"caption {i}"], emb[None, :], [{"start_ms": i * 1000}])
+                latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            assert len(NamespaceStore(root).get("videos")) == len(texts) + len(captions)
+            results[name] = {"append": percentiles(latencies),
+                             "cold_load_ms": round((time.perf_counter() - start) * 1000, 1)}
+    return results
+
+
+@contextlib.contextmanager
+def mock_attr(obj, name, value):
+    old = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, old)
+
+
+def bench_embedders(args):
+    """Sentences/sec per embedding backend on the chunked benchmark corpus, checked against torch.
+
+    The ONNX models are exported first if missing, as the image build does.
+    Backends whose runtime is not installed (or whose model cannot be
+    downloaded/exported) are reported as skipped.
+    """
+    from embeddings import BACKENDS, TOLERANCE, compare_embeddings, export_onnx, load_embedder
+
+    api = load_api()
+    chunks = api.chunk_texts(synthetic_docs(args.embed_sentences // 10, 3000))[:args.embed_sentences]
+    results = {"sentences": len(chunks)}
+    reference = None
+    for backend in BACKENDS:
+        results[backend] = {}
+        for threads in args.embed_threads:
+            embedder = load_embedder(args.embed_model, backend=backend, threads=threads)
+            try:
+                if backend != "torch" and not os.path.exists(embedder.path):
+                    export_onnx(args.embed_model, embedder.model_dir, embedder.max_seq_length)
+                embedder.encode(chunks[:8])  # load the model
+            except Exception as e:  # ImportError, download or export failures
+                results[backend] = {"skipped": f"{type(e).__name__}: {e}"}
+                break
+            durations, vectors = timed(lambda: embedder.encode(chunks), args.repeats)
+            entry = {"sentences_per_sec": round(len(chunks) / min(durations), 1),
+                     "empty_shape": list(embedder.encode([]).shape)}
+            if backend == "torch" and reference is None:
+                reference = vectors
+            if reference is not None:
+                agreement = compare_embeddings(reference, vectors)
+                entry.update({name: round(value, 5) for name, value in agreement.items()})
+                entry["within_tolerance"] = agreement["min_cosine"] >= TOLERANCE[backend]
+            results[backend][f"threads_{threads or 'default'}"] = entry
+    return results
+
+
+def bench_frames(args):
+    sys.path.append(os.path.join(BACKEND_DIR, "..", "notebooks"))
+    from video_inference_ollama import OllamaVideoAnalyzer
+
+    analyzer = OllamaVideoAnalyzer()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        write_synthetic_video(path, frames=args.video_frames, size=(1280, 720))
+        interval = max(1, args.video_frames // 30)
+        for raw in (False, True):
+            label = "raw" if raw else "pil"
+            with contextlib.redirect_stdout(io.StringIO()):
+                durations, frames = timed(lambda: analyzer.extract_frames(path, interval, 30, raw=raw), args.repeats)
+            encode_durations, encoded = timed(lambda: [analyzer.image_to_base64(f) for f in frames], args.repeats)
+            best, best_encode = min(durations), min(encode_durations)
+            results[label] = {
+                "frames": len(frames),
+                "extract_ms_per_frame": round(best / len(frames) * 1000, 3),
+                "encode_ms_per_frame": round(best_encode / len(frames) * 1000, 3),
+                "frames_per_sec": round(len(frames) / (best + best_encode), 1),
+                "bytes_per_frame": round(sum(len(e) for e in encoded) / len(encoded)),
+            }
+    analyzer.cleanup()
+    return results
+
+
+def bench_metrics_overhead(args):
+    """Per-request cost of MetricsMiddleware and of recording individual samples."""
+    import timeit
+
+    from fastapi import FastAPI
+
+    import metrics
+
+    def make_app(instrumented):
+        app = FastAPI()
+        if instrumented:
+            app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"id": item_id}
+
+        return app
+
+    async def drive(app, n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for i in range(50):
+                await client.get(f"/items/{i}")
+            start = time.perf_counter()
+            for i in range(n):
+                await client.get(f"/items/{i}")
+            return (time.perf_counter() - start) / n
+
+    # Alternate the two apps so drift on a busy machine affects both equally
+    n = args.requests * 10
+    plain_runs, instrumented_runs = [], []
+    for _ in range(args.repeats):
+        plain_runs.append(asyncio.run(drive(make_app(False), n)))
+        instrumented_runs.append(asyncio.run(drive(make_app(True), n)))
+    plain, instrumented = min(plain_runs), min(instrumented_runs)
+
+    histogram = metrics.Histogram("bench_observe_seconds", "benchmark only", ("route",),
+                                  registry=metrics.Registry())
+    observe_s = min(timeit.repeat(lambda: histogram.labels("/x").observe(0.01), number=100_000, repeat=3)) / 100_000
+
+    def upstream():
+        with metrics.track_upstream("bench", "model", llm=True):
+            pass
+
+    upstream_s = min(timeit.repeat(upstream, number=20_000, repeat=3)) / 20_000
+    return {
+        "request_plain_us": round(plain * 1e6, 2),
+        "request_instrumented_us": round(instrumented * 1e6, 2),
+        "middleware_overhead_us": round((instrumented - plain) * 1e6, 2),
+        "middleware_overhead_pct": round((instrumented - plain) / plain * 100, 2),
+        "histogram_observe_us": round(observe_s * 1e6, 3),
+        "track_upstream_us": round(upstream_s * 1e6, 3),
+        "render_ms": round(min(timeit.repeat(metrics.REGISTRY.render, number=10, repeat=3)) / 10 * 1000, 3),
+    }
+
+
+def bench_logging(args):
+    """Request overhead of the logging layer at INFO and DEBUG, and the old f-string pattern."""
+    import logging
+    import timeit
+
+    from structured_logging import log_event, setup_logging
+
+    api = load_api()
+    docs = synthetic_docs(50, 3000)
+    devnull = open(os.devnull, "w")
+
+    async def uploads(n):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            for _ in range(n):
+                (await client.post("/api/rag/upload", json={"texts": docs})).raise_for_status()
+            return (time.perf_counter() - start) / n
+
+    results = {}
+    n = max(5, args.requests // 10)
+    for level in ("WARNING", "INFO", "DEBUG"):
+        setup_logging(level=level, stream=devnull)
+        asyncio.run(uploads(2))  # warm-up
+        results[f"upload_{level.lower()}_ms"] = round(min(asyncio.run(uploads(n)) for _ in range(args.repeats)) * 1000, 3)
+
+    # Cost of one debug call with the upload body when DEBUG is off (the common production case)
+    setup_logging(level="INFO", stream=devnull)
+    logger = logging.getLogger("edupoint.bench")
+    body = {"texts": docs}
+    number = 200
+    fstring_s = min(timeit.repeat(lambda: logger.debug(f"Request JSON: {body}"), number=number, repeat=3)) / number
+    event_s = min(timeit.repeat(lambda: log_event(logger, logging.DEBUG, "rag.upload.request", route="/api/rag/upload",
+                                                  body=body), number=number, repeat=3)) / number
+    results["disabled_debug_fstring_us"] = round(fstring_s * 1e6, 2)
+    results["disabled_debug_log_event_us"] = round(event_s * 1e6, 3)
+    return results
+
+
+# --- endpoint throughput (API in a subprocess, upstreams stubbed) ---
+
+ENDPOINTS = {
+    "health": ("GET", "/health", None),
+    "ollama": ("POST", "/api/ollama",
+               {"messages": [{"role": "user", "content": [{"type": "text", "text": "What is 2+2?"}]}]}),
+    "gemini": ("POST", "/api/gemini",
+               {"messages": [{"role": "user", "content": [{"type": "text", "text": "What is 2+2?"}]}]}),
+    "hotels": ("GET", "/api/hotels?location=-2092174&checkin=2025-01-10&checkout=2025-01-12", None),
+    "flights": ("GET", "/api/flights?origin=BLR&destination=DEL&date=2025-01-10", None),
+    "attractions": ("GET", "/api/attractions?location=Goa", None),
+}
+
+
+async def endpoint_load(client, method, path, body, requests, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await client.request(method, path, json=body)
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"requests_per_sec": round(requests / elapsed, 1), **percentiles(latencies)}
+
+
+async def run_endpoints(args):
+    with FakeOllama(text_latency=args.upstream_latency, parallel=args.concurrency) as fake, \
+            StubAPIs(latency=args.upstream_latency) as stubs:
+        env = dict(stubs.env(), OLLAMA_URL=f"{fake.base_url}/api/generate",
+                   RAG_EMBEDDER="hashing", RAG_STORE_DIR="")
+        async with running_api(env) as base_url, httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            results = {}
+            for name, (method, path, body) in ENDPOINTS.items():
+                await endpoint_load(client, method, path, body, args.concurrency, args.concurrency)  # warm-up
+                results[name] = await endpoint_load(client, method, path, body, args.requests, args.concurrency)
+    return results
+
+
+def bench_endpoints(args):
+    results = asyncio.run(run_endpoints(args))
+    results["upstream_latency_ms"] = args.upstream_latency * 1000
+    return results
+
+
+# Upstream settings without retries, hedging or a circuit breaker, for comparison
+NAIVE_UPSTREAMS = {"UPSTREAM_RETRIES": "0", "UPSTREAM_HEDGING": "false", "UPSTREAM_BREAKER_FAILURES": "1000000"}
+
+
+async def proxy_load(client, path, requests, concurrency):
+    """Latencies of `requests` GETs to a proxy endpoint and how many came back as errors."""
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            failures += resp.status_code != 200 or "error" in resp.json()
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, failures
+
+
+async def run_resilience(args, stubs, env):
+    path = ENDPOINTS["hotels"][1]
+    async with running_api(env) as base_url, httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        stubs.slow_fraction, stubs.error_fraction = 0.0, 0.0
+        await proxy_load(client, path, 50, args.concurrency)  # warm-up, fills the latency window
+        # Flaky upstream: some slow answers and some 503s
+        stubs.slow_fraction, stubs.error_fraction = args.slow_fraction, args.error_fraction
+        sent = stubs.requests
+        latencies, failures = await proxy_load(client, path, args.requests, args.concurrency)
+        flaky = {"failure_fraction": round(failures / args.requests, 3),
+                 "upstream_requests_per_call": round((stubs.requests - sent) / args.requests, 2),
+                 **percentiles(latencies)}
+        # Outage: every upstream request fails
+        stubs.slow_fraction, stubs.error_fraction = 0.0, 1.0
+        sent = stubs.requests
+        latencies, failures = await proxy_load(client, path, args.requests, args.concurrency)
+        outage = {"failure_fraction": round(failures / args.requests, 3),
+                  "upstream_requests": stubs.requests - sent, **percentiles(latencies)}
+    return {"flaky": flaky, "outage": outage}
+
+
+def bench_resilience(args):
+    """/api/hotels against a stub with injected slow answers and 503s, naive vs. retries/hedging/breaker."""
+    results = {"slow_fraction": args.slow_fraction, "error_fraction": args.error_fraction,
+               "upstream_latency_ms": args.upstream_latency * 1000}
+    with StubAPIs(latency=args.upstream_latency, slow_latency=1.0) as stubs:
+        env = dict(stubs.env(), RAG_EMBEDDER="hashing", RAG_STORE_DIR="", LOG_LEVEL="WARNING")
+        results["naive"] = asyncio.run(run_resilience(args, stubs, dict(env, **NAIVE_UPSTREAMS)))
+        results["resilient"] = asyncio.run(run_resilience(args, stubs, env))
+    return results
+
+
+async def run_routing(args, env):
+    body = ENDPOINTS["ollama"][2]
+    latencies, served, failures = [], collections.Counter(), 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    async with running_api(env) as base_url, httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.post("/api/chat", json=body)
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    failures += 1
+                    return
+                decision = resp.json()["route"]
+                served[f"{decision['served_by']}:{decision['reason']}"] += 1
+
+        await asyncio.gather(*(one() for _ in range(args.chat_requests)))
+    return {"failures": failures, "served": dict(served), **percentiles(latencies)}
+
+
+def bench_routing(args):
+    """/api/chat against a one-slot fake Ollama: local only, spilling over to Gemini, and with Ollama down."""
+    results = {"local_latency_ms": args.local_latency * 1000, "remote_latency_ms": args.remote_latency * 1000}
+    with FakeOllama(text_latency=args.local_latency, parallel=1) as fake, StubAPIs(latency=args.remote_latency) as stubs:
+        env = dict(stubs.env(), OLLAMA_URL=f"{fake.base_url}/api/generate", OLLAMA_NUM_PARALLEL="1",
+                   CHAT_MAX_QUEUE_WAIT_MS=str(args.remote_latency * 1000), GEMINI_API_KEY="stub",
+                   RAG_EMBEDDER="hashing", RAG_STORE_DIR="", LOG_LEVEL="WARNING")
+        results["local_only"] = asyncio.run(run_routing(args, dict(env, GEMINI_API_KEY="")))
+        results["routed"] = asyncio.run(run_routing(args, env))
+        results["local_down"] = asyncio.run(run_routing(args, dict(env, OLLAMA_URL="http://127.0.0.1:9/api/generate")))
+    return results
+
+
+def ollama_ttft_ms(timings):
+    """Time to first token as reported by Ollama: model load plus prompt evaluation."""
+    return round(timings["load_ms"] + timings["prompt_eval_ms"], 1)
+
+
+async def run_sessions(args, base_url):
+    questions = [f"Question {i}: how does {WORDS[i % len(WORDS)]} relate to the previous answer?" for i in range(args.turns)]
+    per_turn = {"flattened": [], "session": []}
+    folds = []  # the session's history fit per turn
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        docs = synthetic_docs(5, 600)
+        (await client.post("/api/rag/upload", json={"texts": docs})).raise_for_status()
+        # Today: the client resends the whole conversation and the server flattens it behind fresh RAG context
+        history = []
+        for question in questions:
+            history.append({"role": "user", "content": [{"type": "text", "text": question}]})
+            start = time.perf_counter()
+            resp = await client.post("/api/chat", json={"messages": history})
+            resp.raise_for_status()
+            data = resp.json()
+            per_turn["flattened"].append((time.perf_counter() - start, data["timings"]))
+            history.append({"role": "assistant", "content": [{"type": "text", "text": data["result"]}]})
+        # Sessions: only the new turn is sent; Ollama gets the role-tagged history via /api/chat
+        session = (await client.post("/api/chat/sessions", json={})).json()["session_id"]
+        for question in questions:
+            start = time.perf_counter()
+            resp = await client.post(f"/api/chat/sessions/{session}", json={"text": question})
+            resp.raise_for_status()
+            data = resp.json()
+            per_turn["session"].append((time.perf_counter() - start, data["timings"]))
+            folds.append(data["history"])
+    results = {}
+    for name, turns in per_turn.items():
+        latency, timings = turns[-1]
+        results[name] = {
+            f"turn_{len(turns)}_prompt_eval_tokens": timings["prompt_tokens"],
+            f"turn_{len(turns)}_ttft_ms": ollama_ttft_ms(timings),
+            f"turn_{len(turns)}_request_ms": round(latency * 1000, 1),
+            "prompt_eval_tokens_all_turns": sum(t["prompt_tokens"] for _, t in turns),
+        }
+    # Each turn adds two messages, so the summarized prefix may move at most every fold_step / 2 turns
+    refolds = sum(a["folded"] != b["folded"] for a, b in zip(folds, folds[1:]))
+    results["session"].update(folded=folds[-1]["folded"], refolds=refolds,
+                              omitted=sum(f["omitted"] for f in folds))
+    assert results["session"]["omitted"] == 0, "session history dropped messages awaiting their summary"
+    assert refolds <= math.ceil(2 * len(folds) / args.fold_step), f"session history refolded on {refolds} turns"
+    # Both fold the same history; sessions only differ by the chat template's role markers
+    assert (results["session"]["prompt_eval_tokens_all_turns"]
+            <= 1.1 * results["flattened"]["prompt_eval_tokens_all_turns"]), "sessions evaluated more prompt than flattened"
+    return results
+
+
+def bench_sessions(args):
+    """Prompt tokens evaluated and time to first token on the last turn of a conversation, against a
+    fake Ollama with a prompt cache: flattened history via /api/chat vs. a server-side session."""
+    with FakeOllama(text_latency=0.05, per_token_latency=args.per_token_latency, parallel=1, reply_words=150) as fake:
+        env = {"OLLAMA_URL": f"{fake.base_url}/api/generate", "GEMINI_API_KEY": "", "RAG_EMBEDDER": "hashing",
+               "RAG_STORE_DIR": "", "LOG_LEVEL": "WARNING",
+               "CHAT_HISTORY_BUDGET_TOKENS": str(args.session_history_budget),
+               "CHAT_HISTORY_FOLD_MESSAGES": str(args.fold_step)}
+
+        async def run():
+            async with running_api(env) as base_url:
+                return await run_sessions(args, base_url)
+
+        results = asyncio.run(run())
+    results["per_token_latency_ms"] = args.per_token_latency * 1000
+    return results
+
+
+async def run_history(args, base_url):
+    """Two conversations taking turns against one Ollama slot, so neither finds its prefix cached."""
+    per_turn = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        histories = [[], []]
+        for turn in range(args.history_turns):
+            for n, history in enumerate(histories):
+                words = " ".join(WORDS[(turn + i) % len(WORDS)] for i in range(60))
+                text = f"Conversation {n}, turn {turn}: {words}?"
+                history.append({"role": "user", "content": [{"type": "text", "text": text}]})
+                start = time.perf_counter()
+                resp = await client.post("/api/chat", json={"messages": history})
+                resp.raise_for_status()
+                data = resp.json()
+                per_turn.append((time.perf_counter() - start, data["timings"]))
+                history.append({"role": "assistant", "content": [{"type": "text", "text": data["result"]}]})
+        summaries = {}
+        for line in (await client.get("/metrics")).text.splitlines():
+            if line.startswith("edupoint_chat_summaries{"):
+                summaries[line.split('"')[1]] = float(line.rsplit(" ", 1)[1])
+    last = per_turn[-4:]  # both conversations' last two turns
+    return {
+        "last_turns_prompt_eval_tokens": round(statistics.mean(t["prompt_tokens"] for _, t in last)),
+        "last_turns_ttft_ms": round(statistics.mean(ollama_ttft_ms(t) for _, t in last), 1),
+        "last_turns_request_ms": round(statistics.mean(latency for latency, _ in last) * 1000, 1),
+        "prompt_eval_tokens_all_turns": sum(t["prompt_tokens"] for _, t in per_turn),
+        "summaries": summaries,
+    }
+
+
+def bench_history(args):
+    """Prompt tokens and time to first token late in long /api/chat conversations, with the history
+    forwarded in full vs. fitted to CHAT_HISTORY_BUDGET_TOKENS with background summaries."""
+    results = {}
+    with FakeOllama(text_latency=0.05, per_token_latency=args.per_token_latency, parallel=1, reply_words=100) as fake:
+        env = {"OLLAMA_URL": f"{fake.base_url}/api/generate", "GEMINI_API_KEY": "", "RAG_EMBEDDER": "hashing",
+               "RAG_STORE_DIR": "", "LOG_LEVEL": "WARNING"}
+        for name, budget in (("unbounded", 0), (f"budget_{args.history_budget}", args.history_budget)):
+
+            async def run():
+                async with running_api(dict(env, CHAT_HISTORY_BUDGET_TOKENS=str(budget))) as base_url:
+                    return await run_history(args, base_url)
+
+            results[name] = asyncio.run(run())
+    results["turns"] = args.history_turns
+    return results
+
+
+def prompt_cache_prompt(api, model, layout, history, question):
+    """(prompt, system) for the next turn of a conversation, with the old layout or the prompts module's."""
+    from prompts import PromptParts, order_hits, template_for
+
+    hits = api.retrieve_chunks(question, k=api.CHAT_RAG_K, video_k=0)
+    if layout == "legacy":
+        # Score-ordered context first, then the text of every message flattened, no system prompt
+        flattened = "\n".join([m["content"] for m in history] + [question])
+        return f"Relevant info:\n{api.format_context(hits)}\n\nUser: {flattened}", None
+    fitted = api.CHAT_HISTORY.fit(model, history + [{"role": "user", "content": question}])
+    parts = PromptParts(api.CHAT_SYSTEM_PROMPT, api.format_context(order_hits(hits)), question, fitted.history_text())
+    prompt = template_for(model).render(parts)
+    return prompt.prompt, prompt.system or None
+
+
+def run_prompt_cache(args, base_url, model):
+    from ollama_client import OllamaClient
+
+    api = load_api()
+    docs = synthetic_docs(args.prompt_docs, 600)
+    api.build_documents(api.PUBLIC_NAMESPACE, docs, [f"doc-{i}" for i in range(len(docs))])
+    questions = [f"What does the material say about {WORDS[i % len(WORDS)]} and {WORDS[(i * 7 + 3) % len(WORDS)]}?"
+                 for i in range(args.queries)]
+    client = OllamaClient(base_url, keep_alive="10m")
+    results = {"rag_k": api.CHAT_RAG_K, "turns": len(questions)}
+    try:
+        client.warm(model)
+        for layout in ("legacy", "assembled"):
+            timings, history = [], []
+            for question in questions:
+                prompt, system = prompt_cache_prompt(api, model, layout, history, question)
+                extra = {"system": system} if system else {}
+                result = client.generate(model, prompt, options={"num_predict": 32, "temperature": 0}, **extra)
+                timings.append(result.timings)
+                history += [{"role": "user", "content": question}, {"role": "assistant", "content": result.text}]
+            # The first turn cannot hit the cache; report the rest of the conversation
+            steady = timings[1:]
+            results[layout] = {
+                "last_prompt_chars": len(prompt) + len(system or ""),
+                "prompt_eval_tokens_mean": round(statistics.mean(t.prompt_tokens for t in steady), 1),
+                "prompt_eval_ms_mean": round(statistics.mean(t.prompt_eval_ms for t in steady), 1),
+                "prompt_eval_ms_p95": round(sorted(t.prompt_eval_ms for t in steady)[int(0.95 * len(steady))], 1),
+                "total_ms_mean": round(statistics.mean(t.total_ms for t in steady), 1),
+            }
+    finally:
+        client.close()
+    results["prompt_eval_ms_saved_per_request"] = round(
+        results["legacy"]["prompt_eval_ms_mean"] - results["assembled"]["prompt_eval_ms_mean"], 1)
+    return results
+
+
+def bench_prompt_cache(args):
+    """Prompt evaluation per turn of a RAG conversation (top CHAT_RAG_K chunks per question): score-ordered
+    context in front of the flattened messages vs. system prompt, history, document-ordered context, then
+    question. Uses --ollama-url/--ollama-model when
+    given (a real Ollama; set OLLAMA_NUM_PARALLEL=1 there so every request shares one slot's cache),
+    otherwise a fake Ollama with a prompt cache."""
+    if args.ollama_url:
+        results = run_prompt_cache(args, args.ollama_url, args.ollama_model)
+        results["server"] = f"ollama {args.ollama_model}"
+    else:
+        # Replies about as long as num_predict allows a real model
+        with FakeOllama(text_latency=0.01, per_token_latency=args.per_token_latency, parallel=1,
+                        reply_words=25) as fake:
+            results = run_prompt_cache(args, fake.base_url, args.ollama_model)
+        results["server"] = f"fake, {args.per_token_latency * 1000:g} ms/token"
+    return results
+
+
+async def run_workers(args, workers, store_dir):
+    """Ingest once, then query from many connections; every worker must see the segments."""
+    env = {"RAG_EMBEDDER": "hashing", "RAG_STORE_DIR": store_dir, "LOG_LEVEL": "WARNING",
+           "OLLAMA_URL": "http://127.0.0.1:9/api/generate"}
+    segments = [{"start_ms": i * 1000, "text": text} for i, text in enumerate(synthetic_docs(2000, 200))]
+    async with running_api(env, workers=workers) as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_keepalive_connections=0)) as client:
+        (await client.post("/api/rag/video/ingest", json={"video_id": "bench", "segments": segments})).raise_for_status()
+        await asyncio.sleep(1)  # > NamespaceStore.refresh_interval
+        body = {"query": " ".join(WORDS[:4]), "k": 5}
+        latencies, consistent = [], 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            nonlocal consistent
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.post("/api/rag/video/query", json=body)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                consistent += len(resp.json()["matches"]) == 5
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+    return {"requests_per_sec": round(args.requests / elapsed, 1), "consistent_fraction": consistent / args.requests,
+            **percentiles(latencies)}
+
+
+def bench_workers(args):
+    """RAG query throughput with 1 and N uvicorn workers sharing RAG_STORE_DIR."""
+    results = {}
+    for workers in sorted({1, args.workers}):
+        with tempfile.TemporaryDirectory() as store_dir:
+            results[f"workers_{workers}"] = asyncio.run(run_workers(args, workers, store_dir))
+    return results
+
+
+BENCHMARKS = {
+    "chunk_texts": bench_chunk_texts,
+    "rag_upload": bench_rag_upload,
+    "retrieve_context": bench_retrieve_context,
+    "retrieval_modes": bench_retrieval_modes,
+    "quantization": bench_quantization,
+    "rebuild": bench_rebuild,
+    "appends": bench_appends,
+    "embedders": bench_embedders,
+    "frames": bench_frames,
+    "metrics_overhead": bench_metrics_overhead,
+    "logging": bench_logging,
+    "endpoints": bench_endpoints,
+    "resilience": bench_resilience,
+    "routing": bench_routing,
+    "sessions": bench_sessions,
+    "prompt_cache": bench_prompt_cache,
+    "history": bench_history,
+    "workers": bench_workers,
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "."], cwd=BACKEND_DIR) != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Index sizes for retrieve_context")
+    parser.add_argument("--mode-sizes", default="10000,100000", help="Index sizes for retrieval_modes latency")
+    parser.add_argument("--quant-chunks", type=int, default=20000, help="Corpus size for quantization and rebuild")
+    parser.add_argument("--append-chunks", type=int, default=50000, help="Shard size for appends")
+    parser.add_argument("--appends", type=int, default=100, help="Single-caption appends for appends")
+    parser.add_argument("--embed-model", default="all-MiniLM-L6-v2", help="Model for embedders")
+    parser.add_argument("--embed-sentences", type=int, default=2000)
+    parser.add_argument("--embed-threads", default="0", help="Comma-separated thread counts for embedders (0 = default)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--upload-chunks", type=int, default=5000)
+    parser.add_argument("--video-frames", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upstream-latency", type=float, default=0.02)
+    parser.add_argument("--chat-requests", type=int, default=60, help="Requests per scenario for routing")
+    parser.add_argument("--local-latency", type=float, default=0.2, help="Fake Ollama latency for routing")
+    parser.add_argument("--remote-latency", type=float, default=0.3, help="Stub Gemini latency for routing")
+    parser.add_argument("--turns", type=int, default=10, help="Conversation turns for sessions")
+    parser.add_argument("--session-history-budget", type=int, default=1024,
+                        help="CHAT_HISTORY_BUDGET_TOKENS for sessions, small enough to fold")
+    parser.add_argument("--fold-step", type=int, default=4, help="CHAT_HISTORY_FOLD_MESSAGES for sessions")
+    parser.add_argument("--per-token-latency", type=float, default=0.001,
+                        help="Fake prompt eval s/token for sessions, prompt_cache and history")
+    parser.add_argument("--history-turns", type=int, default=20, help="Turns per conversation for history")
+    parser.add_argument("--history-budget", type=int, default=1024, help="CHAT_HISTORY_BUDGET_TOKENS for history")
+    parser.add_argument("--prompt-docs", type=int, default=20, help="Documents indexed for prompt_cache")
+    parser.add_argument("--ollama-url", help="Real Ollama for prompt_cache, e.g. http://localhost:11434")
+    parser.add_argument("--ollama-model", default="gemma3", help="Model for prompt_cache")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="Upstream answers taking 1s (resilience)")
+    parser.add_argument("--error-fraction", type=float, default=0.03, help="Upstream 503s (resilience)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="uvicorn workers for workers")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.mode_sizes = [int(s) for s in args.mode_sizes.split(",")]
+    args.embed_threads = [int(s) for s in args.embed_threads.split(",")]
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("only", "output")},
+        },
+        "results": {},
+    }
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        start = time.perf_counter()
+        report["results"][name] = BENCHMARKS[name](args)
+        print(json.dumps(report["results"][name], indent=2))
+        print(f"  ({time.perf_counter() - start:.1f}s)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Stub Gemini and RapidAPI servers for benchmarks.
+
+Answers Gemini `generateContent` POSTs and the RapidAPI GET searches the
+backend proxies (hotels, flights, attractions) with canned JSON after a
+configurable latency, so proxy throughput can be measured offline. Faults
+can be injected: a fraction of requests answer after `slow_latency` instead,
+and a fraction fail with 503 (the attributes can be changed while running).
+
+Run standalone:  python -m benchmarks.stub_apis --port 11600
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Paths the backend is pointed at via *_API_URL environment variables
+GEMINI_PATH = "/v1beta/models/gemini-pro:generateContent"
+RAPIDAPI_PATHS = {
+    "BOOKING_API_URL": "/v1/hotels/search",
+    "SKYSCANNER_API_URL": "/search",
+    "TRIPADVISOR_API_URL": "/api/v1/attractions/searchAttractions",
+}
+
+
+class StubAPIs:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.02, results=20,
+                 slow_fraction=0.0, slow_latency=1.0, error_fraction=0.0, seed=0):
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_fraction = error_fraction
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Roughly the size of a real search response page
+        self.search_body = json.dumps({
+            "result": [{"id": i, "name": f"Result {i}", "rating": 4.2, "price": 100 + i,
+                        "description": "Lorem ipsum dolor sit amet " * 8} for i in range(results)]
+        }).encode()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the backend at this server."""
+        urls = {name: self.base_url + path for name, path in RAPIDAPI_PATHS.items()}
+        urls["GEMINI_API_URL"] = self.base_url + GEMINI_PATH
+        return urls
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, raw):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _respond(self, raw):
+                with stub._lock:
+                    stub.requests += 1
+                    slow = stub._rng.random() < stub.slow_fraction
+                    failed = stub._rng.random() < stub.error_fraction
+                    stub.errors += failed
+                time.sleep(stub.slow_latency if slow else stub.latency)
+                if failed:
+                    self._send(503, b'{"error": "injected failure"}')
+                else:
+                    self._send(200, raw)
+
+            def do_GET(self):
+                if self.path.split("?")[0] in RAPIDAPI_PATHS.values():
+                    self._respond(stub.search_body)
+                else:
+                    self._send(404, b'{"error": "not found"}')
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.split("?")[0] != GEMINI_PATH:
+                    self._send(404, b'{"error": "not found"}')
+                    return
+                prompt = data["contents"][0]["parts"][0]["text"]
+                body = {"candidates": [{"content": {"parts": [{"text": f"stub reply to {len(prompt)} chars"}]}}]}
+                self._respond(json.dumps(body).encode())
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run stub Gemini/RapidAPI servers")
+    parser.add_argument("--port", type=int, default=11600)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--error-fraction", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubAPIs(port=args.port, latency=args.latency, slow_fraction=args.slow_fraction,
+                    slow_latency=args.slow_latency, error_fraction=args.error_fraction)
+    for name, url in stub.env().items():
+        print(f"{name}={url}")
+    stub.server.serve_forever()
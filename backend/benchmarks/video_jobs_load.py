@@ -0,0 +1,106 @@
+"""Load test: chat latency with and without video analysis jobs running.
+
+Starts a fake Ollama and the real API (uvicorn subprocess) pointed at it,
+measures /api/ollama latency under a fixed chat load, then submits video jobs
+on a synthetic video and measures the same chat load again.
+
+Run from backend/:  python -m benchmarks.video_jobs_load --jobs 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import percentiles, running_api, write_synthetic_video
+from benchmarks.fake_ollama import FakeOllama
+
+
+async def chat_load(base_url, requests, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    body = {"messages": [{"role": "user", "content": [{"type": "text", "text": "What is 2+2?"}]}]}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.post("/api/ollama", json=body)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as video_root, \
+            FakeOllama(text_latency=args.chat_latency, image_latency=args.frame_latency,
+                       parallel=args.ollama_parallel) as fake:
+        write_synthetic_video(os.path.join(video_root, "sample.mp4"))
+        env = dict(OLLAMA_URL=f"{fake.base_url}/api/generate",
+                   RAG_EMBEDDER="hashing", RAG_STORE_DIR="",
+                   OLLAMA_NUM_PARALLEL=str(args.ollama_parallel),
+                   VIDEO_JOB_ROOT=video_root,
+                   VIDEO_JOB_WORKERS=str(args.workers),
+                   VIDEO_JOB_MAX_YIELD_MS=str(args.max_yield_ms))
+        async with running_api(env) as base_url, httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+            await chat_load(base_url, args.concurrency, args.concurrency)  # warm-up
+            baseline = await chat_load(base_url, args.requests, args.concurrency)
+
+            job_ids = []
+            for _ in range(args.jobs):
+                resp = await client.post("/api/video/jobs", json={
+                    "path": "sample.mp4", "prompt": "Describe the frame.",
+                    "frame_interval": 1, "max_frames": args.frames_per_job})
+                job_ids.append(resp.json()["id"])
+            loaded = await chat_load(base_url, args.requests, args.concurrency)
+
+            frames_done = 0
+            for job_id in job_ids:
+                frames_done += (await client.get(f"/api/video/jobs/{job_id}")).json()["frames_done"]
+                await client.delete(f"/api/video/jobs/{job_id}")
+
+    report = {
+        "baseline": percentiles(baseline),
+        "with_video_jobs": percentiles(loaded),
+        "video_jobs": args.jobs,
+        "video_workers": args.workers,
+        "video_frames_done_during_load": frames_done,
+    }
+    report["p95_ratio"] = round(report["with_video_jobs"]["p95_ms"] / report["baseline"]["p95_ms"], 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--frames-per-job", type=int, default=100)
+    parser.add_argument("--chat-latency", type=float, default=0.05)
+    parser.add_argument("--frame-latency", type=float, default=0.2)
+    # Slots of the fake Ollama; production runs Ollama with OLLAMA_NUM_PARALLEL (1 by default)
+    parser.add_argument("--ollama-parallel", type=int, default=int(os.getenv("OLLAMA_NUM_PARALLEL", "1")))
+    parser.add_argument("--max-yield-ms", type=int, default=5000, help="VIDEO_JOB_MAX_YIELD_MS")
+    parser.add_argument("--max-p95-ratio", type=float, default=1.25)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["p95_ratio"] > args.max_p95_ratio:
+        print(f"FAIL: chat p95 grew {report['p95_ratio']}x while video jobs ran")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""In-memory BM25 inverted index for lexical retrieval.
+
+Postings are kept in compressed-row segments (sorted term ids, offsets, doc
+ids, term frequencies) so a corpus costs a few numpy arrays rather than a
+Python list per term. An index is never modified after construction:
+`extended(texts)` returns a new index that shares the existing segments and
+adds one small segment for the new texts (merging once there are too many),
+so incremental video indexing stays cheap and searches need no lock.
+"""
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Keeps course codes and formula names together: "cs-101", "h2o", "3.14"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what "
+    "when where which who why will with you your".split()
+)
+MAX_SEGMENTS = 8
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _Segment:
+    __slots__ = ("terms", "offsets", "doc_ids", "tfs")
+
+    def __init__(self, terms, offsets, doc_ids, tfs):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+
+    @classmethod
+    def build(cls, term_ids, doc_ids, tfs):
+        order = np.argsort(term_ids, kind="stable")  # stable: doc ids stay ascending within a term
+        terms, starts = np.unique(term_ids[order], return_index=True)
+        return cls(terms, np.append(starts, len(order)).astype(np.int64), doc_ids[order], tfs[order])
+
+    def postings(self, term_id):
+        i = np.searchsorted(self.terms, term_id)
+        if i == len(self.terms) or self.terms[i] != term_id:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def expanded_terms(self):
+        return np.repeat(self.terms, np.diff(self.offsets))
+
+    def nbytes(self):
+        return self.terms.nbytes + self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes
+
+
+def _merged(segments):
+    return _Segment.build(
+        np.concatenate([s.expanded_terms() for s in segments]),
+        np.concatenate([s.doc_ids for s in segments]),
+        np.concatenate([s.tfs for s in segments]),
+    )
+
+
+class BM25Index:
+    """Okapi BM25 over an immutable list of documents (doc id = position)."""
+
+    def __init__(self, texts=(), k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}  # term -> term id
+        self.df = np.zeros(0, dtype=np.int32)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.segments = []
+        self._add(texts)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def extended(self, texts):
+        """A new index over these documents followed by `texts`; this one is left untouched."""
+        index = BM25Index(k1=self.k1, b=self.b)
+        index.vocab = dict(self.vocab)
+        index.df = self.df
+        index.doc_len = self.doc_len
+        index.segments = list(self.segments)
+        index._add(texts)
+        return index
+
+    def _add(self, texts):
+        if not len(texts):
+            return
+        base = len(self.doc_len)
+        term_ids, doc_ids, tfs, lengths = array("i"), array("i"), array("f"), array("f")
+        for doc, text in enumerate(texts, start=base):
+            counts = Counter(tokenize(text))
+            term_ids.extend([self.vocab.setdefault(term, len(self.vocab)) for term in counts])
+            tfs.extend(counts.values())
+            doc_ids.extend([doc] * len(counts))
+            lengths.append(sum(counts.values()))
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        df = np.bincount(term_ids, minlength=len(self.vocab)).astype(np.int32)
+        df[:len(self.df)] += self.df
+        self.df = df
+        self.doc_len = np.concatenate([self.doc_len, np.frombuffer(lengths, dtype=np.float32)])
+        self.segments.append(_Segment.build(term_ids, np.frombuffer(doc_ids, dtype=np.int32),
+                                            np.frombuffer(tfs, dtype=np.float32)))
+        if len(self.segments) > MAX_SEGMENTS:
+            self.segments = [_merged(self.segments)]
+
+    def arrays(self):
+        """(vocabulary in term-id order, dict of arrays) for saving, with the segments merged into one."""
+        arrays = {"df": self.df, "doc_len": self.doc_len}
+        if self.segments:
+            segment = self.segments[0] if len(self.segments) == 1 else _merged(self.segments)
+            arrays.update(terms=segment.terms, offsets=segment.offsets, doc_ids=segment.doc_ids, tfs=segment.tfs)
+        return list(self.vocab), arrays
+
+    @classmethod
+    def from_arrays(cls, vocab, arrays, k1=1.5, b=0.75):
+        """Rebuild a saved index; the arrays may be read-only memory maps."""
+        index = cls(k1=k1, b=b)
+        index.vocab = {term: i for i, term in enumerate(vocab)}
+        index.df = arrays["df"]
+        index.doc_len = arrays["doc_len"]
+        if "terms" in arrays:
+            index.segments = [_Segment(arrays["terms"], arrays["offsets"], arrays["doc_ids"], arrays["tfs"])]
+        return index
+
+    def search(self, query, n=10):
+        """Return (doc_ids, scores) of the n best-scoring documents, best first.
+
+        Only documents containing at least one query term are returned.
+        """
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or not len(self.doc_len):
+            return empty
+        total = len(self.doc_len)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.doc_len.mean())
+        ids, weights = [], []
+        for term_id in term_ids:
+            df = self.df[term_id]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for segment in self.segments:
+                postings = segment.postings(term_id)
+                if postings is None:
+                    continue
+                docs, tfs = postings
+                ids.append(docs)
+                weights.append(idf * tfs * (self.k1 + 1) / (tfs + norm[docs]))
+        if not ids:
+            return empty
+        docs, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        if len(docs) > n:
+            top = np.argpartition(-scores, n - 1)[:n]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
+
+    def memory_bytes(self):
+        postings = sum(s.nbytes() for s in self.segments)
+        # Rough dict + str overhead per vocabulary entry
+        return postings + self.df.nbytes + self.doc_len.nbytes + 80 * len(self.vocab)
@@ -0,0 +1,205 @@
+"""Token budgeting and rolling summaries for chat history.
+
+Clients of /api/ollama, /api/gemini and /api/chat resend the whole
+conversation with every request. `HistoryManager.fit` bounds what reaches
+the model to `budget` tokens (system messages, history and the new
+question, not the retrieved context):
+- the newest messages are kept verbatim;
+- older ones are cut in blocks of `fold_step` messages and replaced by a
+  summary of at most `summary_tokens` tokens. Cutting in blocks keeps the
+  prompt prefix unchanged for several turns, so the model server's prompt
+  cache still applies between cuts.
+- summaries are generated in the background and cached by a hash of the
+  messages they cover. Each one extends the previous summary with the
+  newly folded block (a rolling summary), so a request never waits for the
+  summarizer: until the summary for the current cut exists, the latest one
+  available is used and the messages it does not cover yet stay verbatim,
+  which may take the prompt up to `overflow_tokens` over the budget. Past
+  that, or without a summarizer, they are dropped oldest block first.
+
+Tokens are counted per model: with a tokenizer registered for the model
+family (`register_tokenizer`), or from the family's average characters per
+token.
+"""
+import asyncio
+import collections
+import hashlib
+import logging
+import math
+from dataclasses import dataclass
+
+from prompts import family_entry
+
+logger = logging.getLogger("edupoint.chat_history")
+
+# Average characters per token by model family (English text), used without a registered tokenizer
+CHARS_PER_TOKEN = {
+    "gemma": 4.0,
+    "gemini": 4.0,
+    "llama3": 3.8,
+    "qwen": 3.6,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5  # errs towards more tokens
+MESSAGE_OVERHEAD_TOKENS = 4  # role markers added by chat templates
+TOKENIZERS = {}  # family -> count(text) -> int
+
+
+def register_tokenizer(family, count):
+    TOKENIZERS[family] = count
+
+
+def count_tokens(model, text):
+    tokenizer = family_entry(TOKENIZERS, model)
+    if tokenizer is not None:
+        return tokenizer(text)
+    return math.ceil(len(text) / (family_entry(CHARS_PER_TOKEN, model) or DEFAULT_CHARS_PER_TOKEN))
+
+
+def message_tokens(model, message):
+    return count_tokens(model, message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_tokens(model, text, tokens, keep="end"):
+    """Text cut to about `tokens` tokens, keeping its start or its end."""
+    if count_tokens(model, text) <= tokens:
+        return text
+    chars = int(tokens * (family_entry(CHARS_PER_TOKEN, model) or DEFAULT_CHARS_PER_TOKEN))
+    return text[-chars:] if keep == "end" and chars else text[:chars]
+
+
+def _chain(digest, message):
+    return hashlib.sha1(f"{digest}\0{message['role']}\0{message['content']}".encode()).hexdigest()
+
+
+@dataclass
+class BudgetedHistory:
+    system: list  # leading system messages, unchanged
+    summary: str  # of the folded messages; "" when nothing is folded or no summary is ready yet
+    messages: list  # newest history messages kept verbatim, ending with the question
+    folded: int = 0  # history messages replaced by the summary
+    pending: int = 0  # messages past the summary kept verbatim until their summary is ready
+    omitted: int = 0  # messages neither summarized nor kept, as they did not fit in the budget
+    tokens: int = 0
+    truncated: bool = False  # the question alone was over budget and was cut
+
+    @property
+    def question(self):
+        return self.messages[-1]["content"] if self.messages else ""
+
+    def as_messages(self):
+        """Role-tagged messages for a chat endpoint."""
+        summary = [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}]
+        return self.system + (summary if self.summary else []) + self.messages
+
+    def history_text(self):
+        """The summary and the kept turns before the question, as plain text for a single prompt.
+
+        System messages are left out; they belong in the prompt's system part.
+        """
+        lines = [f"(Earlier: {self.summary})"] if self.summary else []
+        lines += [f"{m['role'].capitalize()}: {m['content']}" for m in self.messages[:-1]]
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {"kept": len(self.messages), "folded": self.folded, "pending": self.pending, "omitted": self.omitted,
+                "summarized": bool(self.summary), "tokens": self.tokens, "truncated": self.truncated}
+
+
+class HistoryManager:
+    def __init__(self, budget=4096, summarize=None, fold_step=4, summary_tokens=256, overflow_tokens=2048,
+                 max_summaries=1000, max_pending=8, concurrency=1):
+        self.budget = budget  # tokens; 0 disables budgeting
+        # summarize(previous summary, messages) -> new summary covering both; awaited in the background
+        self.summarize = summarize
+        self.fold_step = fold_step
+        self.summary_tokens = summary_tokens
+        self.overflow_tokens = overflow_tokens  # allowed over budget for messages awaiting their summary
+        self.max_summaries = max_summaries
+        self.max_pending = max_pending
+        self.concurrency = concurrency  # summaries generated at once, so they do not crowd out requests
+        self._summaries = collections.OrderedDict()  # digest of the covered messages -> summary, LRU first
+        self._pending = {}  # digest -> task
+        self._slots = None
+        self.generated = 0
+        self.failed = 0
+
+    def fit(self, model, messages):
+        """Bound messages (role/content dicts ending with the question) to the budget.
+
+        Schedules the summary for the new cut when it is missing, so call it from the event loop.
+        """
+        start = 0
+        while start < len(messages) - 1 and messages[start]["role"] == "system":
+            start += 1
+        system, history, question = messages[:start], messages[start:-1], messages[-1:]
+        costs = [message_tokens(model, m) for m in history]
+        fixed = sum(message_tokens(model, m) for m in system + question)
+        if not self.budget or fixed + sum(costs) <= self.budget:
+            return BudgetedHistory(system, "", history + question, tokens=fixed + sum(costs))
+
+        truncated = False
+        room = self.budget - sum(message_tokens(model, m) for m in system) - MESSAGE_OVERHEAD_TOKENS
+        if question and fixed > self.budget - self.summary_tokens:
+            # Keep the end of an oversized question, leaving room for the summary
+            content = truncate_tokens(model, question[0]["content"], max(1, room - self.summary_tokens))
+            question = [{**question[0], "content": content}]
+            fixed = self.budget - self.summary_tokens
+            truncated = True
+        # Fold whole blocks of fold_step messages until the rest fits next to a summary
+        available = self.budget - fixed - self.summary_tokens
+        cut, kept = 0, sum(costs)
+        while cut < len(history) and kept > available:
+            step = min(self.fold_step, len(history) - cut)
+            kept -= sum(costs[cut:cut + step])
+            cut += step
+
+        digests = [""]
+        for message in history[:cut]:
+            digests.append(_chain(digests[-1], message))
+        covered, summary = 0, ""
+        for n in range(cut, 0, -1):
+            if digests[n] in self._summaries:
+                covered, summary = n, self._summaries[digests[n]]
+                self._summaries.move_to_end(digests[n])
+                break
+        if covered < cut:
+            self._schedule(digests[cut], summary, history[covered:cut])
+        summary = truncate_tokens(model, summary, self.summary_tokens, keep="start")
+        # Keep the messages the summary does not cover yet, dropping whole blocks only past the overflow
+        used = fixed + kept + (count_tokens(model, summary) if summary else 0)
+        limit = self.budget + (self.overflow_tokens if self.summarize else 0)
+        start = covered
+        while start < cut and used + sum(costs[start:cut]) > limit:
+            start = min(start + self.fold_step, cut)
+        tokens = used + sum(costs[start:cut])
+        return BudgetedHistory(system, summary, history[start:] + question, folded=covered,
+                               pending=cut - start, omitted=start - covered, tokens=tokens, truncated=truncated)
+
+    def _schedule(self, key, previous, messages):
+        if self.summarize is None or key in self._pending or len(self._pending) >= self.max_pending:
+            return
+        self._pending[key] = asyncio.get_running_loop().create_task(self._summarize(key, previous, messages))
+
+    async def _summarize(self, key, previous, messages):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._slots:
+                summary = (await self.summarize(previous, messages)).strip()
+            self._summaries[key] = summary
+            self.generated += 1
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Could not summarize %d chat messages: %s", len(messages), e)
+        finally:
+            del self._pending[key]
+
+    def cancel_pending(self):
+        for task in list(self._pending.values()):
+            task.cancel()
+
+    def stats(self):
+        return {"cached": len(self._summaries), "pending": len(self._pending),
+                "generated": self.generated, "failed": self.failed}
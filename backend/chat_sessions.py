@@ -0,0 +1,95 @@
+"""Server-side multi-turn chat sessions for the local model.
+
+A session keeps the role-tagged message history of one conversation, so a
+client sends only its new turn and the full history goes to Ollama's
+/api/chat. Because earlier turns are resent unchanged and in the same
+order, Ollama finds them in its prompt cache and only evaluates the new
+turn's tokens; flattening the history into one prompt with fresh RAG
+context in front made it re-evaluate the whole conversation every turn.
+
+Sessions live in memory in a bounded LRU store: sessions idle for longer
+than `idle_ttl` are dropped, and the least recently used one is dropped when
+`max_sessions` is reached. The store is not shared between worker
+processes, so the API only serves sessions when it runs a single worker
+(WORKERS=1); with more workers clients send the whole conversation to the
+stateless /api/chat instead.
+"""
+import asyncio
+import collections
+import threading
+import time
+import uuid
+
+
+class ChatSession:
+    def __init__(self, owner, model, system=None, max_messages=100):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.model = model
+        self.max_messages = max_messages
+        self.messages = [{"role": "system", "content": system}] if system else []
+        self.turns = 0
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()  # one turn at a time, so replies land in order
+
+    def append(self, role, content):
+        self.messages.append({"role": role, "content": content})
+        # Drop the oldest exchange (keeping the system prompt) once over the cap
+        start = 1 if self.messages[0]["role"] == "system" else 0
+        while len(self.messages) > self.max_messages and len(self.messages) - start > 2:
+            del self.messages[start:start + 2]
+
+    def as_dict(self):
+        return {"session_id": self.id, "model": self.model, "turns": self.turns, "messages": len(self.messages)}
+
+
+class ChatSessionStore:
+    def __init__(self, max_sessions=1000, idle_ttl=1800.0, max_messages=100):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._sessions = collections.OrderedDict()  # id -> ChatSession, least recently used first
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, owner, model, system=None):
+        session = ChatSession(owner, model, system, self.max_messages)
+        with self._lock:
+            self._expire()
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id, owner):
+        """The caller's session, or None if it does not exist, expired or belongs to someone else."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None or session.owner != owner:
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id, owner):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.owner != owner:
+                return False
+            del self._sessions[session_id]
+            return True
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
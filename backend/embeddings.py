@@ -0,0 +1,229 @@
+"""Text embedders for the RAG indexes.
+
+`load_embedder(name, backend)` returns an object with `encode(texts) -> np.ndarray`.
+Models are loaded lazily on first use so importing the API does not download
+or load a model. Backends:
+- torch: sentence-transformers on PyTorch.
+- onnx / onnx-int8: the same transformer exported to ONNX (int8: dynamically
+  quantized weights) and run with ONNX Runtime plus mean pooling. The export
+  needs torch and is a build step, not done at runtime:
+      python -m embeddings all-MiniLM-L6-v2   # writes to RAG_ONNX_DIR
+- hashing: a dependency-free, deterministic embedder for offline benchmarks
+  and tests (pass it as the model name).
+
+Model backends group texts into length buckets under a token budget, so
+short chunks are batched widely and long ones are not padded against short
+ones. `threads` caps the intra-op thread pool (0 = library default).
+"""
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+HASHING = "hashing"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# Minimum per-sentence cosine similarity to the torch vectors for a backend
+# to be used against an index built with torch
+TOLERANCE = {"torch": 1.0, "onnx": 0.999, "onnx-int8": 0.98}
+MAX_BATCH_TOKENS = 8192
+MAX_BATCH_SIZE = 128
+
+
+class HashingEmbedder:
+    """Feature-hashed bag of words and character trigrams, L2-normalised."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _features(self, text):
+        text = text.lower()
+        words = re.findall(r"\w+", text)
+        return words + [text[i:i + 3] for i in range(max(0, len(text) - 2))]
+
+    def encode(self, texts, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+def length_buckets(lengths, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE):
+    """Yield index arrays of texts sorted by length, each batch padded size <= max_batch_tokens."""
+    order = np.argsort(lengths, kind="stable")
+    start = 0
+    while start < len(order):
+        end = start + 1
+        # Sorted ascending, so the last item sets the padded length of the batch
+        while (end < len(order) and end - start < max_batch_size
+               and (end - start + 1) * lengths[order[end]] <= max_batch_tokens):
+            end += 1
+        yield order[start:end]
+        start = end
+
+
+def hf_model_id(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+class LazySentenceTransformer:
+    """Loads the SentenceTransformer model on the first encode() call."""
+
+    def __init__(self, model_name, threads=0):
+        self.model_name = model_name
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    if self.threads:
+                        import torch
+                        torch.set_num_threads(self.threads)
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, texts, **kwargs):
+        model = self.model
+        if not len(texts):
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Character length is a good enough proxy for token count to form the buckets
+        lengths = np.array([len(t) for t in texts]) // 4 + 2
+        out = None
+        for idx in length_buckets(lengths):
+            vectors = model.encode([texts[i] for i in idx], batch_size=len(idx), convert_to_numpy=True,
+                                   show_progress_bar=False)
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        return out
+
+
+def export_onnx(model_name, out_dir, max_seq_length=256):
+    """Export the transformer to out_dir/model.onnx plus an int8 copy and tokenizer.json (needs torch)."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    model_id = hf_model_id(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id).eval()
+    os.makedirs(out_dir, exist_ok=True)
+    sample = tokenizer(["An example sentence."], return_tensors="pt", truncation=True, max_length=max_seq_length)
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+            opset_version=17,
+        )
+    quantize_dynamic(path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+
+
+def onnx_model_dir(model_name):
+    return os.path.join(os.getenv("RAG_ONNX_DIR", "models"), hf_model_id(model_name).replace("/", "__"))
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from an exported transformer on ONNX Runtime (mean pooling, L2-normalised)."""
+
+    def __init__(self, model_name, model_dir=None, quantized=True, threads=0, max_seq_length=256):
+        self.model_name = model_name
+        self.model_dir = model_dir or onnx_model_dir(model_name)
+        self.quantized = quantized
+        self.threads = threads
+        self.max_seq_length = max_seq_length
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.model_dir, "model.int8.onnx" if self.quantized else "model.onnx")
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None:
+                return
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No exported model at {self.path}; run "
+                                        f"`python -m embeddings {self.model_name}` when building the image")
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.inter_op_num_threads = 1
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+            tokenizer.enable_truncation(self.max_seq_length)
+            tokenizer.no_padding()
+            self._tokenizer = tokenizer
+            session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+            self._inputs = {i.name for i in session.get_inputs()}
+            self.dim = session.get_outputs()[0].shape[-1]  # last_hidden_state: (batch, sequence, hidden)
+            self._session = session
+
+    def encode(self, texts, **kwargs):
+        if self._session is None:
+            self._load()
+        if not len(texts):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        encodings = self._tokenizer.encode_batch(list(texts))
+        lengths = np.array([len(e.ids) for e in encodings])
+        out = None
+        for idx in length_buckets(lengths):
+            width = lengths[idx].max()
+            ids = np.zeros((len(idx), width), dtype=np.int64)
+            mask = np.zeros((len(idx), width), dtype=np.int64)
+            for row, i in enumerate(idx):
+                ids[row, :lengths[i]] = encodings[i].ids
+                mask[row, :lengths[i]] = 1
+            feed = {"input_ids": ids, "attention_mask": mask, "token_type_ids": np.zeros_like(ids)}
+            hidden = self._session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+            pooled = (hidden * mask[..., None]).sum(axis=1) / mask.sum(axis=1, keepdims=True)
+            if out is None:
+                out = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            out[idx] = pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+        return out
+
+
+def compare_embeddings(reference, candidate):
+    """Per-sentence cosine similarity between two backends' vectors for the same texts."""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def load_embedder(name, backend="torch", threads=0):
+    if name == HASHING:
+        return HashingEmbedder()
+    if backend == "torch":
+        return LazySentenceTransformer(name, threads=threads)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(name, quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to ONNX for the onnx backends")
+    parser.add_argument("model", nargs="?", default=os.getenv("RAG_EMBEDDER", "all-MiniLM-L6-v2"))
+    parser.add_argument("--out", help="Output directory (default: under RAG_ONNX_DIR)")
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    args = parser.parse_args()
+    export_onnx(args.model, args.out or onnx_model_dir(args.model), args.max_seq_length)
@@ -17,6 +17,10 @@ until curl -s http://localhost:11434/api/tags > /dev/null; do
 done
 echo "Ollama is ready."
 
-# Start Uvicorn (Cloud Run will pass $PORT)
-echo "Starting API..."
-exec uvicorn gemma_api:app --host 0.0.0.0 --port ${PORT:-8000}
+# Start Uvicorn (Cloud Run will pass $PORT). RAG shards and video job status
+# (RAG_STORE_DIR/video_jobs) are shared through RAG_STORE_DIR, so WORKERS can
+# be raised to the number of cores. Chat sessions are kept in one worker's
+# memory, so the API refuses /api/chat/sessions (503) when WORKERS > 1.
+export WORKERS=${WORKERS:-1}
+echo "Starting API with ${WORKERS} worker(s)..."
+exec uvicorn gemma_api:app --host 0.0.0.0 --port ${PORT:-8000} --workers ${WORKERS}
@@ -1,39 +1,64 @@
 from fastapi import FastAPI, Request, Response, Cookie, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, auth
 import os
 import httpx
-from sentence_transformers import SentenceTransformer
-from sklearn.neighbors import NearestNeighbors
-import numpy as np
 import logging
 import re
+import json
+import hashlib
+import asyncio
 from langchain.agents import initialize_agent, Tool
 from langchain_community.llms import OpenAI
 from langchain_ollama.llms import OllamaLLM
 from langchain.agents import AgentType
 import datetime
+from video_jobs import VideoJobManager, JobQueueFull, FINISHED_STATES
+from rag_namespaces import NamespaceStore
+from ollama_client import OllamaClient, OllamaError
+from resilience import Upstream, UpstreamError, UpstreamPolicy
+from llm_router import ChatBackend, LlmRouter
+from chat_sessions import ChatSessionStore
+from prompts import SYSTEM_PROMPT, PromptParts, order_hits, template_for
+from chat_history import HistoryManager
+from embeddings import load_embedder
+import metrics
+from request_timing import ServerTimingMiddleware, phase
+from structured_logging import log_event, setup_logging
 
 load_dotenv()
 
 app = FastAPI()
 
+CORS_ORIGINS = ["http://localhost:3000"]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 SESSION_COOKIE_NAME = "session"
 SESSION_EXPIRE_SECONDS = 60 * 60 * 24 * 5  # 5 days
 DEV_MODE = os.getenv("DEV", "true").lower() == "true"
+# uvicorn worker processes serving the API (set by entrypoint.sh); state kept in one process must be shared
+API_WORKERS = int(os.getenv("WORKERS", "1"))
 SECURE_COOKIE = not DEV_MODE
 
+# Server-Timing phases on every response; with REQUEST_PROFILING=true (off by default, independent of DEV),
+# `X-Profile: 1` or ?profile=1 profiles a request
+app.add_middleware(
+    ServerTimingMiddleware,
+    allow_origins=CORS_ORIGINS,
+    profile=os.getenv("REQUEST_PROFILING", "false").lower() == "true",
+    profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+)
+
 if os.path.exists("edupoint-b1bf5-b530d165b8dd.json") and DEV_MODE:
     cred = credentials.Certificate("edupoint-b1bf5-b530d165b8dd.json")
     firebase_admin.initialize_app(cred)
@@ -42,11 +67,44 @@ else:
 
 GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_MODEL = GEMINI_API_URL.rsplit("/", 1)[-1].split(":")[0]
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3")
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+OLLAMA_BASE_URL = OLLAMA_URL.split("/api/")[0]
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+AGENT_MODEL = os.getenv("AGENT_MODEL", "gemma2:2b")
+# First part of every chat prompt; keep it fixed so model servers can reuse its KV cache
+CHAT_SYSTEM_PROMPT = os.getenv("CHAT_SYSTEM_PROMPT", SYSTEM_PROMPT)
+BOOKING_API_URL = os.getenv("BOOKING_API_URL", "https://booking-com.p.rapidapi.com/v1/hotels/search")
+SKYSCANNER_API_URL = os.getenv("SKYSCANNER_API_URL", "https://skyscanner44.p.rapidapi.com/search")
+TRIPADVISOR_API_URL = os.getenv("TRIPADVISOR_API_URL", "https://tripadvisor16.p.rapidapi.com/api/v1/attractions/searchAttractions")
+OLLAMA_CLIENT = OllamaClient(
+    OLLAMA_BASE_URL,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    tracker=lambda model: metrics.track_upstream("ollama", model, llm=True),
+)
+metrics.register_cache("ollama_discovery", OLLAMA_CLIENT.cache)
+
+# Deadlines, retries, hedging and circuit breakers per external API (see resilience.py).
+# Travel/info lookups are idempotent GETs, so they are retried and, with
+# UPSTREAM_HEDGING, hedged after the API's recent p95 latency.
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE_SECONDS", "10"))
+TRAVEL_POLICY = UpstreamPolicy(
+    deadline=UPSTREAM_DEADLINE,
+    attempt_timeout=UPSTREAM_DEADLINE / 2,
+    retries=int(os.getenv("UPSTREAM_RETRIES", "2")),
+    hedge=os.getenv("UPSTREAM_HEDGING", "true").lower() == "true",
+    failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+)
+# generateContent is a POST: only retried when the connection failed, never hedged
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE_SECONDS", "60"))
+GEMINI = Upstream("gemini", UpstreamPolicy(deadline=GEMINI_DEADLINE, attempt_timeout=GEMINI_DEADLINE, retries=1),
+                  llm=True)
+UPSTREAMS = {name: Upstream(name, TRAVEL_POLICY)
+             for name in ("booking", "skyscanner", "openweathermap", "exchangerate", "eventbrite", "tripadvisor")}
+
+# Set up logging: JSON lines written from a background thread (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES)
+setup_logging()
 logger = logging.getLogger("edupoint")
 
 
@@ -55,31 +113,148 @@ async def health():
     return {"status": "ok"}
 
 
-@app.post("/api/gemini")
-async def gemini_infer(request: Request):
-    data = await request.json()
-    messages = data.get("messages", [])
-    prompt = "\n".join(
-        c["text"] for m in messages for c in m.get("content", []) if c["type"] == "text"
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def chat_messages(data):
+    """The request's messages as role/content dicts with their text parts joined."""
+    messages = []
+    for m in data.get("messages", []):
+        text = "\n".join(c["text"] for c in m.get("content", []) if c["type"] == "text")
+        if text:
+            role = "assistant" if m.get("role") == "model" else m.get("role", "user")
+            messages.append({"role": role, "content": text})
+    return messages
+
+
+async def summarize_history(previous, messages):
+    """Rolling summary for CHAT_HISTORY: the previous summary extended with the folded messages."""
+    transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+    prompt = (f"Summary so far:\n{previous}\n\n" if previous else "") + f"New messages:\n{transcript}"
+    result = await OLLAMA_CLIENT.agenerate(
+        CHAT_SUMMARY_MODEL, prompt, options={"num_predict": CHAT_HISTORY.summary_tokens},
+        system="Update the summary of this conversation with the new messages. Keep the facts, names, numbers "
+               "and decisions later answers may need, in at most a few short paragraphs. Reply with the summary only.",
     )
+    return result.text
+
+
+# Bounds the conversation sent with every chat request; older turns are folded into background summaries
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", OLLAMA_MODEL)
+CHAT_HISTORY = HistoryManager(
+    budget=int(os.getenv("CHAT_HISTORY_BUDGET_TOKENS", "4096")),
+    summarize=summarize_history,
+    fold_step=int(os.getenv("CHAT_HISTORY_FOLD_MESSAGES", "4")),
+    summary_tokens=int(os.getenv("CHAT_SUMMARY_TOKENS", "256")),
+    overflow_tokens=int(os.getenv("CHAT_HISTORY_OVERFLOW_TOKENS", "2048")),
+)
+metrics.CallbackMetric(
+    "edupoint_chat_summaries", "Chat history summaries cached, pending, generated and failed.", "gauge", ("stat",),
+    lambda: {(stat,): value for stat, value in CHAT_HISTORY.stats().items()},
+)
+
+
+def fit_history(data, model, route):
+    history = CHAT_HISTORY.fit(model, chat_messages(data))
+    log_event(logger, logging.INFO, "chat.history", route=route, model=model, **history.as_dict())
+    return history
+
+
+async def gemini_generate(prompt):
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
     headers = {"Content-Type": "application/json"}
     url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
+    resp = await GEMINI.post(url, json=payload, headers=headers, model=GEMINI_MODEL)
+    if resp.status_code != 200:
+        raise UpstreamError(f"Gemini returned {resp.status_code}: {resp.text[:200]}")
+    return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+
+@app.post("/api/gemini")
+async def gemini_infer(request: Request):
+    data = await request.json()
+    history = fit_history(data, GEMINI_MODEL, "/api/gemini")
+    system = "\n\n".join(m["content"] for m in history.system)
+    prompt = template_for(GEMINI_MODEL).render(PromptParts(system, "", history.question, history.history_text()))
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            result = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-            return {"result": result}
+        return {"result": await gemini_generate(prompt.text())}
     except Exception as e:
         return {"result": f"Gemini error: {str(e)}"}
 
 
 # --- RAG Vector Store (in-memory, for demo) ---
-RAG_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-RAG_CHUNKS = []  # List of (text, embedding)
-RAG_TEXTS = []   # List of text chunks
-RAG_EMBEDDINGS = None  # np.array of embeddings
-RAG_NN = None    # NearestNeighbors index
+# Loaded on first use; RAG_EMBEDDER=hashing gives an offline embedder for benchmarks.
+# RAG_EMBEDDER_BACKEND: torch | onnx | onnx-int8; RAG_EMBEDDER_THREADS=0 leaves the thread count to the runtime
+RAG_MODEL = metrics.InstrumentedEmbedder(load_embedder(
+    os.getenv("RAG_EMBEDDER", "all-MiniLM-L6-v2"),
+    backend=os.getenv("RAG_EMBEDDER_BACKEND", "torch"),
+    threads=int(os.getenv("RAG_EMBEDDER_THREADS", "0")),
+))
+# Vector storage for new indexes: float32 | int8 | binary, optionally PCA-reduced (0 keeps all dimensions)
+RAG_QUANTIZATION = os.getenv("RAG_QUANTIZATION", "float32")
+RAG_PCA_DIMS = int(os.getenv("RAG_PCA_DIMS", "0"))
+# Shards are published to RAG_STORE_DIR and shared by all uvicorn workers;
+# RAG_STORE_DIR="" keeps them in memory, which only works with a single worker
+RAG_STORE_DIR = os.getenv("RAG_STORE_DIR", "rag_store")
+# Uploaded document chunks, one shard per namespace (user, course)
+DOC_STORE = NamespaceStore(
+    root_dir=RAG_STORE_DIR or None,
+    memory_budget_bytes=int(os.getenv("RAG_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024,
+    index_options={"quantization": RAG_QUANTIZATION, "pca_dims": RAG_PCA_DIMS},
+)
+# Video captions/transcript segments with (video_id, start_ms, end_ms), in the same namespaces as
+# documents; appended in small batches, so no PCA (the projection would be fitted on the first video only)
+VIDEO_STORE = NamespaceStore(
+    root_dir=os.path.join(RAG_STORE_DIR, "video") if RAG_STORE_DIR else None,
+    index_options={"quantization": RAG_QUANTIZATION},
+)
+metrics.CallbackMetric(
+    "edupoint_rag_index_chunks", "Chunks in each RAG index (documents: loaded shards only).", "gauge", ("index",),
+    lambda: {("documents",): DOC_STORE.stats()["chunks"], ("video",): VIDEO_STORE.stats()["chunks"]},
+)
+metrics.CallbackMetric(
+    "edupoint_rag_shards", "Loaded document shards and their approximate memory.", "gauge", ("stat",),
+    lambda: {(name,): value for name, value in DOC_STORE.stats().items() if name != "chunks"},
+)
+VIDEO_RAG_K = int(os.getenv("VIDEO_RAG_K", "5"))
+# Document chunks retrieved into each chat prompt
+CHAT_RAG_K = int(os.getenv("CHAT_RAG_K", "5"))
+# dense | hybrid (BM25 + vectors) | prefilter (BM25 candidates, then vectors) | auto
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "auto")
+PUBLIC_NAMESPACE = "public"
+
+
+def session_claims(request):
+    """Decoded session cookie claims, or None for anonymous/invalid sessions."""
+    session = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session:
+        return None
+    try:
+        return auth.verify_session_cookie(session)
+    except Exception:
+        return None
+
+
+def rag_namespaces(claims):
+    """Namespaces a caller may read: their own plus their courses (custom claim "courses").
+
+    Anonymous callers share the public namespace in dev mode only.
+    """
+    if claims is None:
+        return [PUBLIC_NAMESPACE] if DEV_MODE else []
+    uid = claims.get("uid") or claims["sub"]
+    return [f"user:{uid}"] + [f"course:{c}" for c in claims.get("courses", [])]
+
+
+def writable_namespaces(claims):
+    """Namespaces a caller may upload to: their own plus courses they teach (custom claim "teaching")."""
+    if claims is None:
+        return [PUBLIC_NAMESPACE] if DEV_MODE else []
+    uid = claims.get("uid") or claims["sub"]
+    return [f"user:{uid}"] + [f"course:{c}" for c in claims.get("teaching", [])]
+
 
 # Helper: chunk text (simple, can be improved)
 def chunk_texts(texts, chunk_size=300):
@@ -91,91 +266,554 @@ def chunk_texts(texts, chunk_size=300):
 
 @app.post("/api/rag/upload")
 async def rag_upload(request: Request):
-    logger.info("Received request to /api/rag/upload")
+    route = "/api/rag/upload"
     try:
         data = await request.json()
-        logger.debug(f"Request JSON: {data}")
     except Exception as e:
-        logger.error(f"Failed to parse JSON body: {e}")
+        log_event(logger, logging.ERROR, "rag.upload.invalid_json", route=route, error=e)
         return {"status": "error", "message": "Invalid JSON"}
     texts = data.get("texts", [])
-    logger.info(f"Uploading {len(texts)} texts to RAG vector store.")
+    log_event(logger, logging.DEBUG, "rag.upload.request", route=route, body=data)
+    allowed = writable_namespaces(session_claims(request))
+    if not allowed:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    namespace = data.get("namespace") or allowed[0]
+    if namespace not in allowed:
+        return JSONResponse(status_code=403, content={"error": f"Cannot upload to namespace {namespace}"})
     if not isinstance(texts, list):
-        logger.error(f"'texts' is not a list: {type(texts)}")
+        log_event(logger, logging.ERROR, "rag.upload.invalid", route=route, reason="texts is not a list",
+                  type=type(texts).__name__)
         return {"status": "error", "message": "'texts' must be a list of strings."}
     if not all(isinstance(t, str) for t in texts):
-        logger.error("Not all items in 'texts' are strings.")
+        log_event(logger, logging.ERROR, "rag.upload.invalid", route=route, reason="non-string item in texts")
         return {"status": "error", "message": "All items in 'texts' must be strings."}
-    global RAG_CHUNKS, RAG_TEXTS, RAG_EMBEDDINGS, RAG_NN
+    doc_ids = data.get("ids") or [hashlib.sha1(t.encode("utf-8")).hexdigest()[:12] for t in texts]
+    if len(doc_ids) != len(texts) or not all(isinstance(d, str) and d for d in doc_ids):
+        return {"status": "error", "message": "'ids' must be one non-empty string per text."}
     try:
-        RAG_TEXTS = chunk_texts(texts)
-        logger.info(f"Chunked texts into {len(RAG_TEXTS)} chunks.")
-        RAG_EMBEDDINGS = RAG_MODEL.encode(RAG_TEXTS)
-        logger.info(f"Generated embeddings for {len(RAG_TEXTS)} chunks.")
-        RAG_NN = NearestNeighbors(n_neighbors=5, metric='cosine').fit(RAG_EMBEDDINGS)
-        logger.info("NearestNeighbors index built successfully.")
-        return {"status": "ok", "chunks": len(RAG_TEXTS)}
+        # Chunking, embedding and the index build run off the event loop; searches keep
+        # being served from the namespace's previous snapshot until the new one is published
+        shard = await asyncio.to_thread(build_documents, namespace, texts, doc_ids)
+        log_event(logger, logging.INFO, "rag.upload.indexed", route=route, namespace=namespace,
+                  texts=len(texts), chunks=len(shard))
+        return {"status": "ok", "namespace": namespace, "chunks": len(shard), "doc_ids": doc_ids}
     except Exception as e:
-        logger.error(f"Error during RAG upload processing: {e}")
+        log_event(logger, logging.ERROR, "rag.upload.failed", route=route, error=e)
         return {"status": "error", "message": str(e)}
 
-# Helper: retrieve top-k relevant chunks
-def retrieve_context(query, k=5):
-    if RAG_EMBEDDINGS is None or RAG_NN is None or not RAG_TEXTS:
-        return ""
-    q_emb = RAG_MODEL.encode([query])
-    dists, idxs = RAG_NN.kneighbors(q_emb, n_neighbors=min(k, len(RAG_TEXTS)))
-    return "\n".join([RAG_TEXTS[i] for i in idxs[0]])
+
+def build_documents(namespace, texts, doc_ids):
+    """Chunk, embed and index the texts as the namespace's new document set."""
+    with phase("chunk"):
+        chunks, metadata = [], []
+        for text, doc_id in zip(texts, doc_ids):
+            pieces = chunk_texts([text])
+            chunks.extend(pieces)
+            metadata.extend({"doc_id": doc_id, "chunk": i} for i in range(len(pieces)))
+    with phase("embed"):
+        embeddings = RAG_MODEL.encode(chunks)
+    with phase("index"):
+        return DOC_STORE.replace(namespace, chunks, embeddings, metadata)
+
+
+@app.delete("/api/rag/documents/{doc_id}")
+async def rag_delete_document(doc_id: str, request: Request, namespace: str = None):
+    route = "/api/rag/documents"
+    allowed = writable_namespaces(session_claims(request))
+    if not allowed:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    namespace = namespace or allowed[0]
+    if namespace not in allowed:
+        return JSONResponse(status_code=403, content={"error": f"Cannot delete from namespace {namespace}"})
+    with phase("index"):
+        deleted = await asyncio.to_thread(DOC_STORE.delete, namespace, {"doc_id": doc_id})
+    log_event(logger, logging.INFO, "rag.delete", route=route, namespace=namespace, doc_id=doc_id, chunks=deleted)
+    if not deleted:
+        return JSONResponse(status_code=404, content={"error": f"No document {doc_id} in {namespace}"})
+    return {"status": "ok", "namespace": namespace, "deleted": deleted}
+
+
+def format_timestamp(ms):
+    seconds = int(ms) // 1000
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def index_video_segments(namespace, video_id, segments, replace=False):
+    """Embed and append video segments ({start_ms, end_ms, text, kind}) to the namespace's video index.
+
+    With replace, the video's segments already in the namespace are deleted first, so ingesting a
+    video again does not index it twice.
+    """
+    segments = [s for s in segments if s.get("text")]
+    texts = [s["text"] for s in segments]
+    metadata = [
+        {
+            "video_id": video_id,
+            "start_ms": int(s["start_ms"]),
+            "end_ms": int(s.get("end_ms", s["start_ms"])),
+            "kind": s.get("kind", "caption"),
+        }
+        for s in segments
+    ]
+    if replace:
+        with phase("index"):
+            VIDEO_STORE.delete(namespace, {"video_id": video_id})
+    if not segments:
+        return 0
+    with phase("embed"):
+        embeddings = RAG_MODEL.encode(texts)
+    with phase("index"):
+        VIDEO_STORE.add(namespace, texts, embeddings, metadata)
+    return len(segments)
+
+
+# Helper: retrieve top-k relevant chunks (the caller's documents and video moments)
+def retrieve_chunks(query, namespaces=(PUBLIC_NAMESPACE,), k=5, video_k=VIDEO_RAG_K, mode=None):
+    mode = mode or RAG_SEARCH_MODE
+    doc_count = DOC_STORE.count(namespaces)
+    video_count = VIDEO_STORE.count(namespaces) if video_k else 0
+    if not doc_count and not video_count:
+        return []
+    with phase("rag_embed"):
+        q_emb = RAG_MODEL.encode([query])[0]
+    hits = []
+    if doc_count:
+        with phase("rag_search"), metrics.RAG_QUERY_SECONDS.labels("documents").time():
+            hits = DOC_STORE.search(namespaces, q_emb, k=k, query_text=query, mode=mode)
+    if video_count:
+        with phase("rag_search"), metrics.RAG_QUERY_SECONDS.labels("video").time():
+            hits += VIDEO_STORE.search(namespaces, q_emb, k=video_k, query_text=query, mode=mode)
+    return hits
+
+
+def format_context(hits):
+    lines = []
+    for text, meta, _ in hits:
+        if "video_id" in meta:
+            # Tag video chunks so the model can cite the exact moment
+            lines.append(f"[Video {meta['video_id']} at {format_timestamp(meta['start_ms'])}] {text}")
+        else:
+            lines.append(text)
+    return "\n".join(lines)
+
+
+def retrieve_context(query, namespaces=(PUBLIC_NAMESPACE,), k=5, mode=None):
+    return format_context(retrieve_chunks(query, namespaces, k=k, mode=mode))
+
+
+@app.post("/api/rag/video/ingest")
+async def rag_video_ingest(request: Request):
+    data = await request.json()
+    allowed = writable_namespaces(session_claims(request))
+    if not allowed:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    namespace = data.get("namespace") or allowed[0]
+    if namespace not in allowed:
+        return JSONResponse(status_code=403, content={"error": f"Cannot ingest into namespace {namespace}"})
+    video_id = data.get("video_id")
+    segments = data.get("segments", [])
+    if not video_id or not isinstance(segments, list) or not all(isinstance(s, dict) for s in segments):
+        return JSONResponse(status_code=400, content={"error": "Provide 'video_id' and a list of 'segments' objects"})
+    try:
+        added = await asyncio.to_thread(index_video_segments, namespace, video_id, segments, replace=True)
+    except (KeyError, TypeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid segment: {e}"})
+    return {"status": "ok", "namespace": namespace, "added": added, "video_chunks": VIDEO_STORE.count([namespace])}
+
+
+@app.post("/api/rag/video/query")
+async def rag_video_query(request: Request):
+    data = await request.json()
+    namespaces = rag_namespaces(session_claims(request))
+    if not namespaces:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    query = data.get("query")
+    if not query:
+        return JSONResponse(status_code=400, content={"error": "Missing query"})
+    k = int(data.get("k", 5))
+    where = {"video_id": data["video_id"]} if data.get("video_id") else None
+    with phase("rag_embed"):
+        q_emb = (await asyncio.to_thread(RAG_MODEL.encode, [query]))[0]
+    with phase("rag_search"), metrics.RAG_QUERY_SECONDS.labels("video").time():
+        hits = VIDEO_STORE.search(namespaces, q_emb, k=k, where=where, query_text=query, mode=RAG_SEARCH_MODE)
+    matches = [{**meta, "text": text, "score": round(1 - dist, 4)} for text, meta, dist in hits]
+    return {"matches": matches}
+
+
+def rag_lookup(request, text, route):
+    """Retrieved context for text from the caller's namespaces; returns (context, video sources).
+
+    Chunks are listed in document order rather than by score, so the same retrieved set always
+    renders to the same text.
+    """
+    namespaces = rag_namespaces(session_claims(request))
+    rag_hits = order_hits(retrieve_chunks(text, namespaces, k=CHAT_RAG_K))
+    rag_context = format_context(rag_hits)
+    sources = [
+        {"video_id": meta["video_id"], "start_ms": meta["start_ms"], "end_ms": meta["end_ms"]}
+        for _, meta, _ in rag_hits if "video_id" in meta
+    ]
+    log_event(logger, logging.INFO, "chat.prompt", route=route, prompt_chars=len(text),
+              rag_chunks=len(rag_hits), rag_context_chars=len(rag_context))
+    return rag_context, sources
+
+
+def chat_prompt(request, data, route, model):
+    """PromptParts for the request's messages and their retrieved context; returns (parts, sources).
+
+    The conversation is fitted to CHAT_HISTORY's budget in model's tokens, and context is retrieved
+    for the last message. Each backend renders the parts with its model's template (prompts.template_for).
+    """
+    history = fit_history(data, model, route)
+    question = history.question
+    rag_context, sources = rag_lookup(request, question, route)
+    system = "\n\n".join([CHAT_SYSTEM_PROMPT] + [m["content"] for m in history.system])
+    parts = PromptParts(system, rag_context, question, history.history_text())
+    log_event(logger, logging.DEBUG, "chat.prompt_text", route=route, question=question, context=rag_context)
+    return parts, sources
 
 
 @app.post("/api/ollama")
 async def ollama_infer(request: Request):
-    logger.info("Received request to /api/ollama")
+    route = "/api/ollama"
     data = await request.json()
-    messages = data.get("messages", [])
-    prompt = "\n".join(
-        c["text"] for m in messages for c in m.get("content", []) if c["type"] == "text"
-    )
-    logger.debug(f"Prompt before RAG: {prompt}")
-    logger.debug(f"RAG_TEXTS length: {len(RAG_TEXTS) if RAG_TEXTS else 0}")
-    # --- RAG: retrieve relevant context ---
-    rag_context = retrieve_context(prompt, k=len(RAG_TEXTS) if RAG_TEXTS else 5)
-    logger.debug(f"RAG context retrieved: {rag_context[:100]}... (length: {len(rag_context)})")
-    if rag_context:
-        logger.info("RAG context found for prompt. Including in Ollama request.")
-        prompt = f"Relevant info:\n{rag_context}\n\nUser: {prompt}"
-    else:
-        logger.info("No RAG context found for prompt.")
-    logger.debug(f"Final prompt sent to Ollama: {prompt}")
-    
+    parts, sources = chat_prompt(request, data, route, OLLAMA_MODEL)
+
     # --- LangChain agent tool-use ---
     try:
-        agent_result = agent.run(prompt)
-        return {"result": agent_result}
+        # The ReAct template puts the tool descriptions first, then this input
+        with metrics.track_upstream("ollama_agent", AGENT_MODEL, llm=True):
+            agent_result = agent.run(template_for(AGENT_MODEL).render(parts).text())
+        return {"result": agent_result, "sources": sources}
     except Exception as e:
-        logger.error(f"LangChain agent error: {str(e)}")
+        log_event(logger, logging.ERROR, "ollama.agent_failed", route=route, error=e)
         # fallback to Ollama if agent fails
         pass
     
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "stream": False
-    }
-    logger.debug(f"Payload to Ollama: {payload}")
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(OLLAMA_URL, json=payload)
-            logger.debug(f"Ollama raw response: {resp.text}")
-            ollama_json = resp.json()
-            result = ollama_json.get("response") or ollama_json.get("result") or str(ollama_json)
-            logger.info("Ollama response received successfully.")
-            return {"result": result}
-    except Exception as e:
-        logger.error(f"Ollama error: {str(e)}")
+        prompt = template_for(OLLAMA_MODEL).render(parts)
+        ollama_result = await OLLAMA_CLIENT.agenerate(OLLAMA_MODEL, **prompt.ollama_fields())
+        timings = ollama_result.timings
+        log_event(logger, logging.INFO, "ollama.response", route=route, model=OLLAMA_MODEL,
+                  load_ms=round(timings.load_ms), inference_ms=round(timings.inference_ms))
+        log_event(logger, logging.DEBUG, "ollama.response_text", route=route, text=ollama_result.text)
+        return {"result": ollama_result.text, "sources": sources, "timings": timings.as_dict()}
+    except (OllamaError, httpx.HTTPError) as e:
+        log_event(logger, logging.ERROR, "ollama.failed", route=route, model=OLLAMA_MODEL, error=e)
         return {"result": f"Ollama error: {str(e)}"}
 
 
+# --- Unified chat: local Ollama by default, Gemini when the local model is saturated ---
+
+async def ollama_chat(parts):
+    prompt = template_for(OLLAMA_MODEL).render(parts)
+    result = await OLLAMA_CLIENT.agenerate(OLLAMA_MODEL, **prompt.ollama_fields())
+    return {"result": result.text, "timings": result.timings.as_dict()}
+
+
+async def gemini_chat(parts):
+    return {"result": await gemini_generate(template_for(GEMINI_MODEL).render(parts).text())}
+
+
+def record_route(decision):
+    metrics.LLM_ROUTE_DECISIONS.labels(decision.served_by or "none", decision.reason).inc()
+    log_event(logger, logging.INFO, "chat.route", route="/api/chat", **decision.as_dict())
+
+
+# OLLAMA_NUM_PARALLEL should match the Ollama server's setting; requests beyond it queue here
+CHAT_ROUTER = LlmRouter(
+    ChatBackend("ollama", ollama_chat, concurrency=int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))),
+    ChatBackend("gemini", gemini_chat, available=lambda: bool(GEMINI_API_KEY) and GEMINI.breaker.available()),
+    max_queue_wait=float(os.getenv("CHAT_MAX_QUEUE_WAIT_MS", "2000")) / 1000,
+    max_latency=float(os.getenv("CHAT_MAX_LATENCY_MS", "20000")) / 1000,
+    on_decision=record_route,
+)
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    route = "/api/chat"
+    data = await request.json()
+    # Budgeted in the local model's tokens; Gemini's context is larger
+    parts, sources = chat_prompt(request, data, route, OLLAMA_MODEL)
+    try:
+        result, decision = await CHAT_ROUTER.chat(parts)
+    except Exception as e:
+        log_event(logger, logging.ERROR, "chat.failed", route=route, error=e)
+        return JSONResponse(status_code=502, content={"error": f"No model could answer: {e}"})
+    return {**result, "sources": sources, "route": decision.as_dict()}
+
+
+@app.get("/api/chat/routing")
+async def chat_routing():
+    return CHAT_ROUTER.stats()
+
+
+# --- Multi-turn sessions: the server keeps the history, clients send only the new turn ---
+
+# Sessions are held in this worker's memory, so a later turn routed to another worker would not find its
+# session; with several workers the session endpoints are refused and clients use the stateless /api/chat
+CHAT_SESSIONS_ENABLED = API_WORKERS == 1
+CHAT_SESSIONS = ChatSessionStore(
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+    idle_ttl=float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800")),
+)
+metrics.CallbackMetric(
+    "edupoint_chat_sessions", "Chat sessions held in memory and sessions evicted so far.", "gauge", ("stat",),
+    lambda: {("active",): len(CHAT_SESSIONS), ("evicted",): CHAT_SESSIONS.evicted},
+)
+
+
+def session_owner(request):
+    claims = session_claims(request)
+    return (claims.get("uid") or claims["sub"]) if claims else None
+
+
+def sessions_unavailable():
+    return JSONResponse(status_code=503, content={
+        "error": "Chat sessions need a single API worker (WORKERS=1); send the whole conversation to /api/chat"})
+
+
+@app.post("/api/chat/sessions")
+async def create_chat_session(request: Request):
+    if not CHAT_SESSIONS_ENABLED:
+        return sessions_unavailable()
+    data = await request.json() if await request.body() else {}
+    owner = session_owner(request)
+    if owner is None and not DEV_MODE:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    session = CHAT_SESSIONS.create(owner, OLLAMA_MODEL, system=data.get("system", CHAT_SYSTEM_PROMPT))
+    return session.as_dict()
+
+
+@app.post("/api/chat/sessions/{session_id}")
+async def chat_session_turn(session_id: str, request: Request):
+    route = "/api/chat/sessions"
+    if not CHAT_SESSIONS_ENABLED:
+        return sessions_unavailable()
+    data = await request.json()
+    text = data.get("text")
+    if not isinstance(text, str) or not text:
+        return JSONResponse(status_code=400, content={"error": "Provide the new turn as 'text'"})
+    session = CHAT_SESSIONS.get(session_id, session_owner(request))
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired session"})
+    # Only the user's text is kept in the history; the context is sent with the current turn alone,
+    # after the text, so the stored turns stay a cacheable prefix
+    rag_context, sources = rag_lookup(request, text, route)
+    async with session.lock:
+        history = CHAT_HISTORY.fit(session.model, session.messages + [{"role": "user", "content": text}])
+        messages = history.as_messages()
+        if rag_context:
+            messages[-1] = {"role": "user", "content": f"{history.question}\n\nRelevant info:\n{rag_context}"}
+        try:
+            result = await OLLAMA_CLIENT.achat(session.model, messages)
+        except (OllamaError, httpx.HTTPError) as e:
+            log_event(logger, logging.ERROR, "chat.session_failed", route=route, model=session.model, error=e)
+            return JSONResponse(status_code=502, content={"error": f"Ollama error: {e}"})
+        session.append("user", text)
+        session.append("assistant", result.text)
+        session.turns += 1
+    timings = result.timings
+    log_event(logger, logging.INFO, "chat.session_turn", route=route, model=session.model, turn=session.turns,
+              prompt_tokens=timings.prompt_tokens, prompt_eval_ms=round(timings.prompt_eval_ms),
+              history_tokens=history.tokens, folded=history.folded)
+    return {"result": result.text, "sources": sources, "timings": timings.as_dict(), "history": history.as_dict(),
+            **session.as_dict()}
+
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str, request: Request):
+    if not CHAT_SESSIONS_ENABLED:
+        return sessions_unavailable()
+    if not CHAT_SESSIONS.delete(session_id, session_owner(request)):
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired session"})
+    return {"status": "ok"}
+
+
+async def warm_model(model):
+    try:
+        timings = await OLLAMA_CLIENT.awarm(model)
+        logger.info("Warmed Ollama model %s (load %.0f ms, keep_alive %s)", model, timings.load_ms, OLLAMA_KEEP_ALIVE)
+    except (OllamaError, httpx.HTTPError) as e:
+        logger.warning("Could not warm Ollama model %s: %s", model, e)
+
+
+@app.on_event("startup")
+async def warm_ollama_models():
+    # Load models in the background so startup is not blocked by Ollama
+    for model in dict.fromkeys([OLLAMA_MODEL, AGENT_MODEL]):
+        asyncio.create_task(warm_model(model))
+
+
+@app.on_event("shutdown")
+async def close_ollama_client():
+    CHAT_HISTORY.cancel_pending()
+    await OLLAMA_CLIENT.aclose()
+    OLLAMA_CLIENT.close()
+
+
+@app.on_event("shutdown")
+async def close_upstreams():
+    for upstream in [GEMINI, *UPSTREAMS.values()]:
+        await upstream.aclose()
+
+
+# --- Video analysis jobs (own worker pool, separate from chat requests) ---
+
+def index_video_job_result(job, timestamp_ms, result):
+    """VIDEO_JOBS callback: index each frame caption into the submitter's namespace as soon as it is produced.
+
+    The job's first caption replaces what earlier runs indexed for the same video.
+    """
+    if result.startswith("Error"):
+        return
+    first = not any(not r["result"].startswith("Error") for r in job.results[:-1])
+    index_video_segments(job.namespace, job.video_id, [{
+        "start_ms": timestamp_ms,
+        "end_ms": timestamp_ms + job.frame_duration_ms,
+        "text": result,
+        "kind": "caption",
+    }], replace=first)
+
+
+# Job state is mirrored next to the RAG shards so every uvicorn worker can report and cancel any job
+VIDEO_JOB_STATE_DIR = os.path.join(RAG_STORE_DIR, "video_jobs") if RAG_STORE_DIR else None
+VIDEO_JOBS = VideoJobManager(
+    ollama_client=os.getenv("VIDEO_JOB_OLLAMA_URL") or OLLAMA_CLIENT,
+    model=os.getenv("VIDEO_JOB_MODEL", OLLAMA_MODEL),
+    max_workers=int(os.getenv("VIDEO_JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("VIDEO_JOB_MAX_PENDING", "16")),
+    video_root=os.getenv("VIDEO_JOB_ROOT"),
+    url_hosts=os.getenv("VIDEO_JOB_URL_HOSTS", "youtube.com,youtu.be,vimeo.com").split(","),
+    on_result=index_video_job_result,
+    max_yield=float(os.getenv("VIDEO_JOB_MAX_YIELD_MS", "5000")) / 1000,
+    state_dir=VIDEO_JOB_STATE_DIR,
+)
+# Interactive routes answered by the local model; video jobs hold back frames while these run
+FOREGROUND_ROUTES = ("/api/ollama", "/api/chat")
+
+
+@app.middleware("http")
+async def yield_video_jobs(request: Request, call_next):
+    if not request.url.path.startswith(FOREGROUND_ROUTES):
+        return await call_next(request)
+    with VIDEO_JOBS.foreground():
+        return await call_next(request)
+
+
+metrics.CallbackMetric(
+    "edupoint_video_jobs", "Video analysis jobs by status (queued jobs are waiting LLM work).", "gauge", ("status",),
+    lambda: {(status,): count for status, count in VIDEO_JOBS.status_counts().items()},
+)
+
+
+@app.on_event("shutdown")
+def shutdown_video_jobs():
+    VIDEO_JOBS.shutdown()
+
+
+@app.post("/api/video/jobs")
+async def submit_video_job(request: Request):
+    if API_WORKERS > 1 and VIDEO_JOB_STATE_DIR is None:
+        return JSONResponse(status_code=503, content={
+            "error": "Video jobs with several API workers need a shared RAG_STORE_DIR for their status"})
+    data = await request.json()
+    allowed = writable_namespaces(session_claims(request))
+    if not allowed:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    namespace = data.get("namespace") or allowed[0]
+    if namespace not in allowed:
+        return JSONResponse(status_code=403, content={"error": f"Cannot index into namespace {namespace}"})
+    source = data.get("url") or data.get("path")
+    prompt = data.get("prompt", "Describe what you see in this video frame in detail.")
+    if not source or not isinstance(source, str):
+        return JSONResponse(status_code=400, content={"error": "Provide a video 'url' or 'path'"})
+    try:
+        job = VIDEO_JOBS.submit(
+            source,
+            prompt,
+            model=data.get("model"),
+            frame_interval=max(1, int(data.get("frame_interval", 30))),
+            max_frames=max(1, int(data.get("max_frames", 10))),
+            video_id=data.get("video_id"),
+            namespace=namespace,
+            owner=session_owner(request),
+        )
+    except JobQueueFull as e:
+        return JSONResponse(status_code=429, content={"error": str(e)})
+    except (ValueError, TypeError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+def video_job_owner(request):
+    """(owner, error response); anonymous callers only get the jobs they submitted in dev mode."""
+    owner = session_owner(request)
+    if owner is None and not DEV_MODE:
+        return None, JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    return owner, None
+
+
+@app.get("/api/video/jobs")
+async def list_video_jobs(request: Request):
+    owner, error = video_job_owner(request)
+    if error:
+        return error
+    return {"jobs": [job.to_dict(since=len(job.results)) for job in VIDEO_JOBS.list(owner)]}
+
+
+@app.get("/api/video/jobs/{job_id}")
+async def get_video_job(job_id: str, request: Request, since: int = 0):
+    owner, error = video_job_owner(request)
+    if error:
+        return error
+    job = VIDEO_JOBS.get(job_id, owner)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job.to_dict(since=since)
+
+
+@app.get("/api/video/jobs/{job_id}/events")
+async def stream_video_job(job_id: str, request: Request):
+    owner, error = video_job_owner(request)
+    if error:
+        return error
+    job = VIDEO_JOBS.get(job_id, owner)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    async def events():
+        nonlocal job
+        sent, version = 0, -1
+        while True:
+            # Re-read jobs run by another worker; this worker's own jobs are the same object
+            job = VIDEO_JOBS.get(job_id, owner) or job
+            if job.version != version:
+                version = job.version
+                update = job.to_dict(since=sent)
+                sent += len(update["results"])
+                yield f"data: {json.dumps(update)}\n\n"
+                if update["status"] in FINISHED_STATES:
+                    break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.delete("/api/video/jobs/{job_id}")
+async def cancel_video_job(job_id: str, request: Request):
+    owner, error = video_job_owner(request)
+    if error:
+        return error
+    job = VIDEO_JOBS.cancel(job_id, owner)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job.to_dict(since=len(job.results))
+
+
 # External APIs
 
 @app.get("/api/hotels")
@@ -193,9 +831,8 @@ async def get_hotels(location: str, checkin: str, checkout: str, guests: int = 1
         "order_by": "popularity"
     }
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get("https://booking-com.p.rapidapi.com/v1/hotels/search", headers=headers, params=params)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["booking"].get(BOOKING_API_URL, headers=headers, params=params)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -208,9 +845,8 @@ async def get_flights(origin: str, destination: str, date: str):
     }
     params = {"origin": origin, "destination": destination, "date": date}
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get("https://skyscanner44.p.rapidapi.com/search", headers=headers, params=params)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["skyscanner"].get(SKYSCANNER_API_URL, headers=headers, params=params)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -220,9 +856,8 @@ async def get_weather(city: str):
     api_key = os.getenv("OPENWEATHERMAP_API_KEY", "")
     url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["openweathermap"].get(url)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -231,9 +866,8 @@ async def get_weather(city: str):
 async def get_currency(base: str = "USD", symbols: str = "INR"):
     url = f"https://api.exchangerate.host/latest?base={base}&symbols={symbols}"
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["exchangerate"].get(url)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -243,9 +877,8 @@ async def get_events(city: str):
     headers = {"Authorization": f"Bearer {os.getenv('EVENTBRITE_API_KEY', '')}"}
     url = f"https://www.eventbriteapi.com/v3/events/search/?location.address={city}"
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, headers=headers)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["eventbrite"].get(url, headers=headers)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -258,9 +891,8 @@ async def get_attractions(location: str):
     }
     params = {"query": location}
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get("https://tripadvisor16.p.rapidapi.com/api/v1/attractions/searchAttractions", headers=headers, params=params)
-            return JSONResponse(content=resp.json())
+        resp = await UPSTREAMS["tripadvisor"].get(TRIPADVISOR_API_URL, headers=headers, params=params)
+        return JSONResponse(content=resp.json())
     except Exception as e:
         return {"error": str(e)}
 
@@ -328,5 +960,5 @@ tools = [
 ]
 
 # Initialize LangChain agent (Gemma3/Ollama LLM)
-llm = OllamaLLM(model="gemma2:2b")
+llm = OllamaLLM(model=AGENT_MODEL, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE)
 agent = initialize_agent(tools, llm, agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=True)
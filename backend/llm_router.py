@@ -0,0 +1,176 @@
+"""Load-aware routing of chat requests between a local and a remote model.
+
+Requests go to the local backend (Ollama) unless it looks saturated, in
+which case they spill over to the remote one (Gemini):
+- queue wait: the local backend serves `concurrency` requests at a time
+  (OLLAMA_NUM_PARALLEL); the wait for a new request is estimated from the
+  number already in flight and the recent median service time.
+- latency: the recent p95 service time of the local backend.
+Either one over its threshold sends the request remote, as long as the
+remote backend is available. If the chosen backend fails, the other one is
+tried. Latency statistics only cover the last `horizon` seconds, so a local
+backend that stopped getting traffic is tried again once its slow samples
+have aged out.
+
+Every request produces a RouteDecision, returned to the caller and kept in
+a short history for /api/chat/routing.
+"""
+import asyncio
+import collections
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Optional
+
+
+class LatencyStats:
+    """Service times of recent successful requests, limited to the last `horizon` seconds."""
+
+    def __init__(self, horizon=60.0, size=200):
+        self.horizon = horizon
+        self._samples = collections.deque(maxlen=size)  # (monotonic time, seconds)
+
+    def observe(self, seconds):
+        self._samples.append((time.monotonic(), seconds))
+
+    def quantile(self, q):
+        cutoff = time.monotonic() - self.horizon
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        if not self._samples:
+            return None
+        ordered = sorted(seconds for _, seconds in self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class ChatBackend:
+    name: str
+    # generate(prompt) -> dict with at least "result"; raises on failure. prompt is whatever chat() was given
+    generate: Callable[[object], Awaitable[dict]]
+    concurrency: int = 0  # requests served at once; 0 = no local queue
+    available: Callable[[], bool] = lambda: True
+    stats: LatencyStats = field(default_factory=LatencyStats)
+    in_flight: int = 0
+    errors: int = 0
+    _slots: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+    def slots(self):
+        if self._slots is None and self.concurrency:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+
+@dataclass
+class RouteDecision:
+    backend: str  # first choice
+    reason: str  # default | queue_wait | latency | remote_unavailable | <backend>_error
+    served_by: str = ""
+    local_in_flight: int = 0
+    estimated_wait_ms: float = 0.0
+    local_p95_ms: Optional[float] = None
+    queue_wait_ms: float = 0.0
+    latency_ms: float = 0.0
+    error: str = ""
+
+    def as_dict(self):
+        return {k: round(v, 1) if isinstance(v, float) else v for k, v in asdict(self).items()}
+
+
+class LlmRouter:
+    def __init__(self, local, remote, max_queue_wait=2.0, max_latency=20.0, default_latency=5.0, history=100,
+                 on_decision=None):
+        self.local = local
+        self.remote = remote
+        self.max_queue_wait = max_queue_wait
+        self.max_latency = max_latency
+        # Assumed local service time until there are samples
+        self.default_latency = default_latency
+        self.decisions = collections.deque(maxlen=history)
+        # Optional on_decision(RouteDecision) called after every request (metrics, logging)
+        self.on_decision = on_decision
+
+    def estimated_wait(self):
+        """Seconds a new local request would queue before a slot frees up."""
+        local = self.local
+        if not local.concurrency or local.in_flight < local.concurrency:
+            return 0.0
+        median = local.stats.quantile(0.5) or self.default_latency
+        return (local.in_flight - local.concurrency + 1) / local.concurrency * median
+
+    def decide(self):
+        wait = self.estimated_wait()
+        p95 = self.local.stats.quantile(0.95)
+        reason = "default"
+        if wait > self.max_queue_wait:
+            reason = "queue_wait"
+        elif p95 is not None and p95 > self.max_latency:
+            reason = "latency"
+        if reason != "default" and not self.remote.available():
+            reason = "remote_unavailable"
+        backend = self.remote if reason in ("queue_wait", "latency") else self.local
+        return RouteDecision(
+            backend=backend.name, reason=reason,
+            local_in_flight=self.local.in_flight, estimated_wait_ms=wait * 1000,
+            local_p95_ms=p95 * 1000 if p95 is not None else None,
+        )
+
+    async def chat(self, prompt):
+        """Generate a reply; returns (result dict, RouteDecision). Raises the last error if both backends fail."""
+        decision = self.decide()
+        first = self.local if decision.backend == self.local.name else self.remote
+        second = self.remote if first is self.local else self.local
+        start = time.perf_counter()
+        try:
+            try:
+                result = await self._run(first, prompt, decision)
+            except Exception as e:
+                if not second.available():
+                    raise
+                decision.error = f"{first.name}: {e}"
+                decision.reason = f"{first.name}_error"
+                result = await self._run(second, prompt, decision)
+        finally:
+            decision.latency_ms = (time.perf_counter() - start) * 1000
+            self.decisions.append(decision)
+            if self.on_decision is not None:
+                self.on_decision(decision)
+        return result, decision
+
+    async def _run(self, backend, prompt, decision):
+        backend.in_flight += 1
+        queued = time.perf_counter()
+        try:
+            slots = backend.slots()
+            if slots is not None:
+                await slots.acquire()
+            try:
+                started = time.perf_counter()
+                decision.queue_wait_ms = (started - queued) * 1000
+                result = await backend.generate(prompt)
+            except Exception:
+                backend.errors += 1
+                raise
+            finally:
+                if slots is not None:
+                    slots.release()
+            backend.stats.observe(time.perf_counter() - started)
+            decision.served_by = backend.name
+            return result
+        finally:
+            backend.in_flight -= 1
+
+    def stats(self):
+        return {
+            "thresholds": {"max_queue_wait_ms": self.max_queue_wait * 1000, "max_latency_ms": self.max_latency * 1000},
+            "backends": {
+                b.name: {"in_flight": b.in_flight, "errors": b.errors, "available": b.available(),
+                         "p50_ms": _ms(b.stats.quantile(0.5)), "p95_ms": _ms(b.stats.quantile(0.95))}
+                for b in (self.local, self.remote)
+            },
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+            "recent": [d.as_dict() for d in self.decisions],
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
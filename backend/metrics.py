@@ -0,0 +1,358 @@
+"""Prometheus-style metrics for the API, exposed in text format on /metrics.
+
+A small in-process registry: counters, gauges and histograms with labels,
+plus callback metrics read at scrape time (index sizes, cache counters, job
+queues). Recording a sample is a dict lookup and a short lock, so the
+per-request cost stays in the low microseconds.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+from request_timing import phase
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+        registry.register(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        out = []
+        for values, child in sorted(self._children.items()):
+            out.extend(self._child_samples(values, child))
+        return out
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    @contextlib.contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _child_samples(self, values, child):
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def track_inprogress(self):
+        return self._default.track_inprogress()
+
+    def _child_samples(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _child_samples(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        out, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            out.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        out.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        out.append(f"{self.name}_count{labels} {cumulative}")
+        return out
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples come from fn() -> {label_values_tuple: value} at scrape time."""
+
+    def __init__(self, name, help, type, labelnames, fn, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        registry.register(self)
+
+    def samples(self):
+        suffix = "_total" if self.type == "counter" else ""
+        try:
+            values = self.fn()
+        except Exception:
+            return []
+        return [f"{self.name}{suffix}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(values.items())]
+
+
+# --- application metrics ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "edupoint_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+HTTP_IN_FLIGHT = Gauge("edupoint_http_requests_in_flight", "HTTP requests currently being served.")
+UPSTREAM_SECONDS = Histogram(
+    "edupoint_upstream_request_duration_seconds", "Latency of calls to external APIs and models.", ("api", "model"))
+UPSTREAM_ERRORS = Counter(
+    "edupoint_upstream_errors", "Failed calls to external APIs and models.", ("api", "model", "reason"))
+UPSTREAM_ATTEMPTS = Counter(
+    "edupoint_upstream_attempts", "HTTP attempts sent to external APIs (first, retry, hedge).", ("api", "kind"))
+LLM_ROUTE_DECISIONS = Counter(
+    "edupoint_llm_route_decisions", "/api/chat requests by backend that served them and routing reason.",
+    ("backend", "reason"))
+LLM_IN_FLIGHT = Gauge("edupoint_llm_requests_in_flight", "LLM requests waiting for a response.", ("backend",))
+RAG_QUERY_SECONDS = Histogram(
+    "edupoint_rag_query_duration_seconds", "Nearest-neighbour search latency per index.", ("index",))
+EMBEDDING_BATCH_SIZE = Histogram(
+    "edupoint_embedding_batch_size", "Texts per embedding call.", buckets=BATCH_BUCKETS)
+EMBEDDING_SECONDS = Histogram("edupoint_embedding_duration_seconds", "Embedding call latency.")
+
+_caches = {}
+
+
+def register_cache(name, cache):
+    """Export hit/miss counters of a cache object with `hits` and `misses` attributes."""
+    _caches[name] = cache
+
+
+def _cache_counts():
+    counts = {}
+    for name, cache in _caches.items():
+        counts[(name, "hit")] = cache.hits
+        counts[(name, "miss")] = cache.misses
+    return counts
+
+
+CACHE_REQUESTS = CallbackMetric(
+    "edupoint_cache_requests", "Cache lookups by result.", "counter", ("cache", "result"), _cache_counts)
+
+
+_breakers = {}
+
+
+def register_breaker(api, breaker):
+    """Export the state of an upstream's circuit breaker (resilience.CircuitBreaker)."""
+    _breakers[api] = breaker
+
+
+def _breaker_states():
+    return {(api, state): int(breaker.state == state)
+            for api, breaker in _breakers.items() for state in ("closed", "open", "half_open")}
+
+
+UPSTREAM_CIRCUIT = CallbackMetric(
+    "edupoint_upstream_circuit_state", "1 for the current circuit breaker state of each external API.", "gauge",
+    ("api", "state"), _breaker_states)
+
+
+class UpstreamCall:
+    """Handle yielded by track_upstream; set status_code so HTTP errors are counted."""
+    __slots__ = ("status_code",)
+
+    def __init__(self):
+        self.status_code = None
+
+
+@contextlib.contextmanager
+def track_upstream(api, model="", llm=False):
+    """Time a call to an external service and count failures (exceptions or 4xx/5xx).
+
+    The call is also recorded as a Server-Timing phase named after the API.
+    """
+    call = UpstreamCall()
+    in_flight = LLM_IN_FLIGHT.labels(api) if llm else None
+    if in_flight is not None:
+        in_flight.inc()
+    start = time.perf_counter()
+    try:
+        with phase(api):
+            yield call
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(api, model, type(e).__name__).inc()
+        raise
+    else:
+        if call.status_code is not None and call.status_code >= 400:
+            UPSTREAM_ERRORS.labels(api, model, f"http_{call.status_code}").inc()
+    finally:
+        UPSTREAM_SECONDS.labels(api, model).observe(time.perf_counter() - start)
+        if in_flight is not None:
+            in_flight.dec()
+
+
+class InstrumentedEmbedder:
+    """Wraps an embedder to record batch sizes and latency of encode() calls."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def encode(self, texts, **kwargs):
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        with EMBEDDING_SECONDS.time():
+            return self.embedder.encode(texts, **kwargs)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests.
+
+    Routes are labelled by their path template (e.g. /api/video/jobs/{job_id})
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+            HTTP_IN_FLIGHT.dec()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
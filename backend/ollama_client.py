@@ -0,0 +1,257 @@
+"""Shared Ollama client for the backend and the notebooks.
+
+Keeps pooled HTTP connections, caches model discovery (/api/tags, /api/show)
+with a TTL, keeps chosen models resident with `keep_alive`, and splits every
+response's timings into model load time vs. inference time.
+"""
+import contextlib
+import threading
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+class OllamaError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Ollama returned {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+@dataclass
+class OllamaTimings:
+    """Durations from Ollama's response fields, in milliseconds."""
+    load_ms: float = 0.0
+    prompt_eval_ms: float = 0.0
+    eval_ms: float = 0.0
+    total_ms: float = 0.0
+    prompt_tokens: int = 0
+    eval_tokens: int = 0
+
+    @property
+    def inference_ms(self):
+        return self.prompt_eval_ms + self.eval_ms
+
+    @classmethod
+    def from_response(cls, data):
+        ns = 1e6
+        return cls(
+            load_ms=data.get("load_duration", 0) / ns,
+            prompt_eval_ms=data.get("prompt_eval_duration", 0) / ns,
+            eval_ms=data.get("eval_duration", 0) / ns,
+            total_ms=data.get("total_duration", 0) / ns,
+            prompt_tokens=data.get("prompt_eval_count", 0),
+            eval_tokens=data.get("eval_count", 0),
+        )
+
+    def as_dict(self):
+        return {
+            "load_ms": round(self.load_ms, 1),
+            "inference_ms": round(self.inference_ms, 1),
+            "prompt_eval_ms": round(self.prompt_eval_ms, 1),
+            "eval_ms": round(self.eval_ms, 1),
+            "total_ms": round(self.total_ms, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+        }
+
+
+@dataclass
+class OllamaResult:
+    text: str
+    raw: dict = field(repr=False)
+    timings: OllamaTimings
+
+
+class _TTLCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item and time.monotonic() - item[0] < self.ttl:
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class OllamaClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, keep_alive="30m", discovery_ttl=60.0, timeout=120.0,
+                 tracker=None):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        # Optional tracker(model) -> context manager wrapped around every generate call (metrics)
+        self.tracker = tracker
+        self.cache = _TTLCache(discovery_ttl)
+        self._sync_client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    # --- HTTP plumbing ---
+
+    def _client(self):
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(base_url=self.base_url, timeout=self.timeout)
+        return self._sync_client
+
+    def _aclient(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._async_client
+
+    @staticmethod
+    def _check(resp):
+        if resp.status_code != 200:
+            raise OllamaError(resp.status_code, resp.text)
+        return resp.json()
+
+    def _track(self, model):
+        return self.tracker(model) if self.tracker else contextlib.nullcontext()
+
+    def close(self):
+        if self._sync_client is not None:
+            self._sync_client.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    # --- model discovery (cached) ---
+
+    def list_models(self, refresh=False):
+        models = None if refresh else self.cache.get("tags")
+        if models is None:
+            data = self._check(self._client().get("/api/tags"))
+            models = [m["name"] for m in data.get("models", [])]
+            self.cache.put("tags", models)
+        return models
+
+    async def alist_models(self, refresh=False):
+        models = None if refresh else self.cache.get("tags")
+        if models is None:
+            data = self._check(await self._aclient().get("/api/tags"))
+            models = [m["name"] for m in data.get("models", [])]
+            self.cache.put("tags", models)
+        return models
+
+    def capabilities(self, model):
+        """Capabilities reported by /api/show (e.g. ["completion", "vision"]); [] if unknown."""
+        key = ("show", model)
+        caps = self.cache.get(key)
+        if caps is None:
+            try:
+                data = self._check(self._client().post("/api/show", json={"model": model}))
+                caps = data.get("capabilities") or []
+            except (OllamaError, httpx.HTTPError):
+                caps = []
+            self.cache.put(key, caps)
+        return caps
+
+    def find_model(self, preferred=(), capability=None):
+        """First preferred model that is installed (and has `capability`), else any capable model."""
+        models = self.list_models()
+        for name in preferred:
+            if name in models and (capability is None or capability in self.capabilities(name)):
+                return name
+        for name in models:
+            if capability is None or capability in self.capabilities(name):
+                return name
+        return None
+
+    def invalidate(self):
+        self.cache.clear()
+
+    # --- residency ---
+
+    def _warm_payload(self, model, keep_alive):
+        # An empty prompt makes Ollama load the model and return immediately
+        return {"model": model, "prompt": "", "stream": False,
+                "keep_alive": self.keep_alive if keep_alive is None else keep_alive}
+
+    def warm(self, model, keep_alive=None):
+        with self._track(model):
+            data = self._check(self._client().post("/api/generate", json=self._warm_payload(model, keep_alive)))
+        return OllamaTimings.from_response(data)
+
+    async def awarm(self, model, keep_alive=None):
+        with self._track(model):
+            data = self._check(await self._aclient().post("/api/generate", json=self._warm_payload(model, keep_alive)))
+        return OllamaTimings.from_response(data)
+
+    # --- inference ---
+
+    def _generate_payload(self, model, prompt, images, options, keep_alive, extra):
+        payload = {"model": model, "prompt": prompt, "stream": False,
+                   "keep_alive": self.keep_alive if keep_alive is None else keep_alive}
+        if images:
+            payload["images"] = list(images)
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        return payload
+
+    def generate(self, model, prompt, images=None, options=None, keep_alive=None, timeout=None, **extra):
+        payload = self._generate_payload(model, prompt, images, options, keep_alive, extra)
+        with self._track(model):
+            data = self._check(self._client().post("/api/generate", json=payload, timeout=timeout or self.timeout))
+        return OllamaResult(data.get("response", "").strip(), data, OllamaTimings.from_response(data))
+
+    async def agenerate(self, model, prompt, images=None, options=None, keep_alive=None, timeout=None, **extra):
+        payload = self._generate_payload(model, prompt, images, options, keep_alive, extra)
+        with self._track(model):
+            data = self._check(await self._aclient().post("/api/generate", json=payload, timeout=timeout or self.timeout))
+        return OllamaResult(data.get("response", "").strip(), data, OllamaTimings.from_response(data))
+
+    def _chat_payload(self, model, messages, options, keep_alive, extra):
+        payload = {"model": model, "messages": list(messages), "stream": False,
+                   "keep_alive": self.keep_alive if keep_alive is None else keep_alive}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        return payload
+
+    def chat(self, model, messages, options=None, keep_alive=None, timeout=None, **extra):
+        """/api/chat with role-tagged messages; resending the same history lets Ollama reuse its prompt cache."""
+        payload = self._chat_payload(model, messages, options, keep_alive, extra)
+        with self._track(model):
+            data = self._check(self._client().post("/api/chat", json=payload, timeout=timeout or self.timeout))
+        return OllamaResult(data.get("message", {}).get("content", "").strip(), data, OllamaTimings.from_response(data))
+
+    async def achat(self, model, messages, options=None, keep_alive=None, timeout=None, **extra):
+        payload = self._chat_payload(model, messages, options, keep_alive, extra)
+        with self._track(model):
+            data = self._check(await self._aclient().post("/api/chat", json=payload, timeout=timeout or self.timeout))
+        return OllamaResult(data.get("message", {}).get("content", "").strip(), data, OllamaTimings.from_response(data))
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(base_url=DEFAULT_BASE_URL, **kwargs):
+    """One client per Ollama host per process, so discovery caches and connections are shared."""
+    key = base_url.rstrip("/")
+    with _shared_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = OllamaClient(key, **kwargs)
+        return _shared_clients[key]
@@ -0,0 +1,107 @@
+"""Prompt assembly for RAG requests.
+
+Model servers reuse the KV cache for the longest prefix a prompt shares
+with an earlier one, so prompts are laid out from most to least stable:
+
+    system instructions    identical for every request
+    conversation history   only grows within a conversation, so it extends
+                           the previous turn's prompt (chat_history)
+    retrieved context      top-k chunks for this question; listed in
+                           document order, not by score, so the same chunks
+                           always render to the same text
+    question               changes every request
+
+The context depends on the question, so nothing placed after it is reused
+from one turn to the next; putting the history first keeps it cached.
+
+How the parts map onto a model's input comes from a per-model template:
+models whose chat template has a system turn get the instructions as the
+`system` field, others get them at the top of the prompt. Templates are
+registered per model family and matched against the start of the model
+name, so "gemma" covers "gemma2:2b" and "gemma3:4b"; models without a
+registered family use DEFAULT_TEMPLATE.
+"""
+from dataclasses import dataclass
+
+SYSTEM_PROMPT = (
+    "You are EduPoint's assistant for students and travellers. Use the reference material when it "
+    "is relevant to the question and say so when it does not cover it. Cite video references by "
+    "their timestamp."
+)
+
+
+@dataclass(frozen=True)
+class PromptParts:
+    system: str
+    context: str
+    question: str
+    history: str = ""  # earlier turns (and their summary), already fitted to the history budget
+
+
+@dataclass(frozen=True)
+class Prompt:
+    system: str  # empty when the template folds it into the prompt
+    prompt: str
+
+    def text(self):
+        """Single-string form, for backends without a system field."""
+        return f"{self.system}\n\n{self.prompt}" if self.system else self.prompt
+
+    def ollama_fields(self):
+        return {"prompt": self.prompt, **({"system": self.system} if self.system else {})}
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    system_role: bool = True  # the model's chat template has a system turn
+    context_header: str = "Reference material:"
+    history_header: str = "Conversation so far:"
+    question_header: str = "Question:"
+
+    def render(self, parts):
+        sections = []
+        if parts.history:
+            sections.append(f"{self.history_header}\n{parts.history}")
+        if parts.context:
+            sections.append(f"{self.context_header}\n{parts.context}")
+        sections.append(f"{self.question_header}\n{parts.question}")
+        user = "\n\n".join(sections)
+        if self.system_role or not parts.system:
+            return Prompt(parts.system, user)
+        return Prompt("", f"{parts.system}\n\n{user}")
+
+
+DEFAULT_TEMPLATE = PromptTemplate()
+TEMPLATES = {
+    # Gemma's chat template has no system turn; Ollama pastes the system text into the user turn
+    "gemma": PromptTemplate(system_role=False),
+    # gemini_generate sends a single text part
+    "gemini": PromptTemplate(system_role=False),
+}
+
+
+def family_entry(registry, model):
+    """The entry of the longest registered family the model name starts with, or None."""
+    name = model.rsplit("/", 1)[-1].lower()  # "hf.co/org/model:tag" -> "model:tag"
+    matches = [family for family in registry if name.startswith(family)]
+    return registry[max(matches, key=len)] if matches else None
+
+
+def template_for(model):
+    return family_entry(TEMPLATES, model) or DEFAULT_TEMPLATE
+
+
+def register_template(family, template):
+    TEMPLATES[family] = template
+
+
+def hit_order(hit):
+    """Sort key placing retrieved chunks by source and position instead of by score."""
+    text, meta, _ = hit
+    if "video_id" in meta:
+        return (1, str(meta["video_id"]), meta.get("start_ms", 0), text)
+    return (0, str(meta.get("doc_id", "")), meta.get("chunk", 0), text)
+
+
+def order_hits(hits):
+    return sorted(hits, key=hit_order)
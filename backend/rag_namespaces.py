@@ -0,0 +1,295 @@
+"""Per-tenant RAG namespaces.
+
+Each namespace (e.g. "user:<uid>", "course:<id>") is its own RagIndex shard.
+Queries only touch the caller's shards; shards are kept in memory in LRU
+order and the least recently used ones are dropped when the loaded shards
+exceed the memory budget.
+
+With a root_dir the store is safe to share between uvicorn workers. Every
+change is published as a new generation of the shard:
+
+    <root_dir>/<namespace dir>/g00000007/   arrays and header (RagIndex.save)
+    <root_dir>/<namespace dir>/g00000008/   rows appended by generation 8 only
+    <root_dir>/<namespace dir>/CURRENT      "7 8", replaced atomically
+
+CURRENT lists a chain: a full generation followed by the append-only
+segments published on top of it, newest last. Appends (video captions
+arrive one frame at a time) only write their own rows; after MAX_SEGMENTS
+segments, and on every upload or delete, the shard is written in full again.
+A reader that already holds part of the chain only loads the newer segments.
+
+Writers hold an flock on the namespace while they apply a change to the
+latest generation and publish the next one, so an upload is applied exactly
+once whichever worker receives it. Readers re-check CURRENT at most every
+`refresh_interval` seconds and load a newer generation memory-mapped, so all
+workers share one copy of the vectors in the page cache.
+
+Readers never wait for writers: building, saving and loading a shard happen
+outside the store lock, which only guards the in-memory maps, and a shard
+keeps serving its previous snapshot until the new one is swapped in.
+"""
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from rag_store import RagIndex
+
+logger = logging.getLogger("edupoint.rag_namespaces")
+
+# Segments appended to a full generation before the next append rewrites the shard
+MAX_SEGMENTS = 32
+
+
+class NamespaceStore:
+    def __init__(self, root_dir=None, memory_budget_bytes=1024 ** 3, index_options=None, refresh_interval=0.5):
+        # root_dir=None keeps everything in memory, per process, and never evicts
+        self.root_dir = root_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        # RagIndex kwargs for new shards (quantization, pca_dims); loaded shards keep their saved encoding
+        self.index_options = index_options or {}
+        self.refresh_interval = refresh_interval
+        self.shards = OrderedDict()  # namespace -> RagIndex, least recently used first
+        self.generations = {}  # namespace -> generation of the loaded shard
+        self._checked = {}  # namespace -> monotonic time CURRENT was last read
+        self._lock = threading.Lock()  # guards the dicts above; never held during I/O
+        self._write_locks = {}  # namespace -> threading.Lock serialising this process's writers
+        self._held = threading.local()  # namespaces whose write lock the current thread holds
+        if root_dir:
+            os.makedirs(root_dir, exist_ok=True)
+
+    def _dir(self, namespace):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)[:64]
+        digest = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.root_dir, f"{safe}-{digest}")
+
+    def _path(self, namespace, generation):
+        return os.path.join(self._dir(namespace), f"g{generation:08d}")
+
+    def _current_chain(self, namespace):
+        """Generations making up the published shard: a full one, then its segments; [] if none."""
+        try:
+            with open(os.path.join(self._dir(namespace), "CURRENT")) as f:
+                return [int(generation) for generation in f.read().split()]
+        except FileNotFoundError:
+            return []
+
+    def _current_generation(self, namespace):
+        chain = self._current_chain(namespace)
+        return chain[-1] if chain else 0
+
+    @contextlib.contextmanager
+    def _exclusive(self, namespace):
+        """Serialise writers of one namespace across threads and worker processes (re-entrant)."""
+        held = self._held.__dict__.setdefault("namespaces", set())
+        if namespace in held:
+            yield
+            return
+        with self._lock:
+            write_lock = self._write_locks.setdefault(namespace, threading.Lock())
+        with write_lock:
+            held.add(namespace)
+            try:
+                if not self.root_dir:
+                    yield
+                    return
+                os.makedirs(self._dir(namespace), exist_ok=True)
+                with open(os.path.join(self._dir(namespace), "LOCK"), "w") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            finally:
+                held.discard(namespace)
+
+    def get(self, namespace, create=False):
+        """Latest shard for namespace, loading it from disk if needed; None if it does not exist."""
+        with self._lock:
+            shard = self.shards.get(namespace)
+            if shard is not None:
+                self.shards.move_to_end(namespace)
+                if not self.root_dir or time.monotonic() - self._checked.get(namespace, 0) < self.refresh_interval:
+                    return shard
+            elif not self.root_dir:
+                if not create:
+                    return None
+                shard = self.shards[namespace] = RagIndex(**self.index_options)
+                self.generations[namespace] = 0
+                return shard
+            loaded = self.generations.get(namespace)
+            self._checked[namespace] = time.monotonic()
+        chain = self._current_chain(namespace)
+        generation = chain[-1] if chain else 0
+        if shard is not None and generation == loaded:
+            return shard
+        if generation:
+            shard, generation = self._load(namespace, chain, shard, loaded)
+        elif create:
+            shard = RagIndex(**self.index_options)
+        else:
+            with self._lock:
+                self.shards.pop(namespace, None)
+                self.generations.pop(namespace, None)
+            return None
+        return self._install(namespace, shard, generation)
+
+    def _load(self, namespace, chain, loaded=None, loaded_generation=None):
+        """The shard published as `chain`; extends `loaded` when it is a generation of the same chain."""
+        while True:
+            try:
+                if loaded is not None and loaded_generation in chain[:-1]:
+                    base, segments = loaded, chain[chain.index(loaded_generation) + 1:]
+                else:
+                    base, segments = RagIndex.load(self._path(namespace, chain[0])), chain[1:]
+                shard = base.extended([RagIndex.load(self._path(namespace, g)) for g in segments])
+            except FileNotFoundError:
+                # Newer generations were published (and old ones removed) while we read CURRENT; follow it
+                newer = self._current_chain(namespace)
+                if newer == chain:
+                    raise
+                chain = newer
+                continue
+            logger.info("Loaded RAG shard %s generation %d (%d chunks)", namespace, chain[-1], len(shard))
+            return shard, chain[-1]
+
+    def _install(self, namespace, shard, generation, force=False):
+        """Make shard the loaded one unless another thread already installed a newer generation."""
+        with self._lock:
+            if not force and self.generations.get(namespace, -1) > generation and namespace in self.shards:
+                shard = self.shards[namespace]
+            self.shards[namespace] = shard
+            self.shards.move_to_end(namespace)
+            self.generations[namespace] = generation
+            self._checked[namespace] = time.monotonic()
+            self._evict(keep=namespace)
+            return shard
+
+    def _publish(self, namespace, shard, start=0):
+        """Save shard as the next generation and point CURRENT at it (caller holds _exclusive).
+
+        With `start`, the shard is the published one plus rows appended from `start` on, and
+        only those rows are written, as a segment, while the chain is shorter than MAX_SEGMENTS.
+        """
+        if self.root_dir:
+            directory = self._dir(namespace)
+            chain = self._current_chain(namespace)
+            generation = self._remove_stale(directory, chain) + 1
+            if start and chain and len(chain) < MAX_SEGMENTS:
+                shard.save(self._path(namespace, generation), start=start)
+                published = chain + [generation]
+            else:
+                shard.save(self._path(namespace, generation))
+                published = [generation]
+            tmp = os.path.join(directory, f"CURRENT.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                f.write(" ".join(map(str, published)))
+            os.replace(tmp, os.path.join(directory, "CURRENT"))
+            # Keep the previous chain for readers that are loading it right now
+            self._remove_old_generations(directory, set(chain) | set(published))
+        else:
+            generation = self.generations.get(namespace, 0) + 1
+        self._install(namespace, shard, generation, force=True)
+
+    @staticmethod
+    def _remove_stale(directory, chain):
+        """Remove what a writer that died mid-publish left behind: temporary files and generations
+        saved but never made CURRENT. Returns the highest generation number seen on disk or in chain.
+
+        Runs under _exclusive, so no other writer is between its save and its CURRENT update.
+        """
+        current = highest = max(chain, default=0)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+            elif re.fullmatch(r"g\d{8}", name) and int(name[1:]) > current:
+                highest = max(highest, int(name[1:]))
+                shutil.rmtree(path, ignore_errors=True)
+        return highest
+
+    @staticmethod
+    def _remove_old_generations(directory, keep):
+        # Older generations are unlinked (open memory maps stay valid on POSIX)
+        newest = max(keep)
+        for name in os.listdir(directory):
+            if re.fullmatch(r"g\d{8}", name) and int(name[1:]) < newest and int(name[1:]) not in keep:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def replace(self, namespace, texts, embeddings, metadata=None):
+        shard = RagIndex(**self.index_options)
+        shard.replace(texts, embeddings, metadata)
+        with self._exclusive(namespace):
+            self._publish(namespace, shard)
+        return shard
+
+    def add(self, namespace, texts, embeddings, metadata=None):
+        with self._exclusive(namespace):
+            # Readers may be extending the published shard with segments; change a copy
+            shard = self._latest(namespace, create=True).copy()
+            start = len(shard.texts)
+            shard.add(texts, embeddings, metadata)
+            self._publish(namespace, shard, start=start)
+        return shard
+
+    def delete(self, namespace, where):
+        """Delete the namespace's chunks whose metadata matches `where`; returns how many were removed."""
+        with self._exclusive(namespace):
+            shard = self._latest(namespace)
+            shard = shard.copy() if shard is not None else None
+            removed = shard.delete(where) if shard is not None else 0
+            if removed:
+                self._publish(namespace, shard)
+        return removed
+
+    def _latest(self, namespace, create=False):
+        # Apply changes on top of the latest published generation, not a cached one
+        with self._lock:
+            self._checked.pop(namespace, None)
+        return self.get(namespace, create=create)
+
+    def search(self, namespaces, query_embedding, k=5, where=None, query_text=None, mode="dense"):
+        """Merge the k best chunks over the given namespaces' shards (see RagIndex.search)."""
+        hits = []
+        for namespace in namespaces:
+            shard = self.get(namespace)
+            if shard is not None:
+                hits.extend(shard.search(query_embedding, k=k, where=where, query_text=query_text, mode=mode))
+        hits.sort(key=lambda hit: hit[2])
+        return hits[:k]
+
+    def count(self, namespaces):
+        return sum(len(shard) for shard in (self.get(ns) for ns in namespaces) if shard is not None)
+
+    def stats(self):
+        with self._lock:
+            shards = list(self.shards.values())
+        return {
+            "loaded_shards": len(shards),
+            "chunks": sum(len(s) for s in shards),
+            "memory_bytes": sum(s.memory_bytes() for s in shards),
+        }
+
+    def _evict(self, keep):
+        if not self.root_dir:
+            return
+        total = sum(s.memory_bytes() for s in self.shards.values())
+        for namespace in list(self.shards):
+            if total <= self.memory_budget_bytes:
+                break
+            if namespace == keep:
+                continue
+            shard = self.shards.pop(namespace)
+            self.generations.pop(namespace, None)
+            total -= shard.memory_bytes()
+            logger.info("Evicted RAG shard %s from memory", namespace)
@@ -0,0 +1,322 @@
+"""In-memory retrieval index used by the RAG endpoints."""
+import json
+import os
+import threading
+
+import numpy as np
+
+from bm25 import BM25Index
+from vector_codecs import CODECS, RESCORE_FACTOR, PcaProjection, from_arrays, normalize, top_n
+
+SEARCH_MODES = ("dense", "hybrid", "prefilter", "auto")
+# "auto" switches from hybrid to lexical prefiltering at this many chunks
+PREFILTER_MIN_CHUNKS = 50_000
+HYBRID_ALPHA = 0.5  # weight of the dense score in hybrid fusion
+COMPACT_RATIO = 0.25  # fraction of tombstoned rows that triggers compaction
+
+
+class _Snapshot:
+    """One immutable generation of an index; readers work on whichever snapshot they picked up."""
+    __slots__ = ("texts", "metadata", "vectors", "projection", "lexical", "deleted", "live", "text_bytes")
+
+    def __init__(self, texts=None, metadata=None, vectors=None, projection=None, lexical=None, deleted=None,
+                 text_bytes=None):
+        texts = [] if texts is None else texts
+        self.texts = texts
+        # Passed on by appends so memory_bytes does not walk every chunk
+        self.text_bytes = sum(len(t) for t in texts) if text_bytes is None else text_bytes
+        self.metadata = [] if metadata is None else metadata
+        self.vectors = vectors if len(texts) else None
+        self.projection = projection if len(texts) else None
+        self.lexical = lexical if lexical is not None else BM25Index(texts)
+        # Tombstones: bool mask over rows, None while nothing is deleted
+        self.deleted = deleted if deleted is not None and deleted.any() else None
+        self.live = len(texts) - (int(self.deleted.sum()) if self.deleted is not None else 0)
+
+
+class RagIndex:
+    """Text chunks with per-chunk metadata, a cosine vector index and a BM25 index.
+
+    Supports full replacement (document uploads), incremental appends (video
+    segments arriving while a job runs) and deletes.
+
+    All state lives in an immutable snapshot. Writers build the next snapshot
+    off to the side (serialised by a write lock) and publish it with a single
+    attribute assignment, so searches never take a lock and never see texts
+    and vectors from different generations. Deletes only set tombstones;
+    once COMPACT_RATIO of the rows are deleted, the index is compacted into a
+    new snapshot without them.
+
+    Vectors are normalised and stored with the `quantization` codec
+    (float32, int8 or binary, see vector_codecs); with `pca_dims` they are
+    first projected to that many dimensions by a PCA fitted on the first
+    batch that has at least 4 * pca_dims rows. The float embeddings passed
+    in are not kept, except by the binary codec, which rescores with them.
+    """
+
+    def __init__(self, quantization="float32", pca_dims=0):
+        if quantization not in CODECS:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {tuple(CODECS)}")
+        self.quantization = quantization
+        self.pca_dims = pca_dims
+        self._snapshot = _Snapshot()
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        return self._snapshot.live
+
+    # Read-only views of the current snapshot
+    texts = property(lambda self: self._snapshot.texts)
+    metadata = property(lambda self: self._snapshot.metadata)
+    vectors = property(lambda self: self._snapshot.vectors)
+    projection = property(lambda self: self._snapshot.projection)
+    lexical = property(lambda self: self._snapshot.lexical)
+
+    def memory_bytes(self):
+        """Approximate resident size: vectors, chunk text and postings."""
+        snap = self._snapshot
+        size = snap.vectors.nbytes() if snap.vectors is not None else 0
+        size += snap.projection.nbytes() if snap.projection is not None else 0
+        return size + snap.text_bytes + snap.lexical.memory_bytes()
+
+    def save(self, path, start=0):
+        """Write the index to directory `path`: header.json plus one .npy file per array.
+
+        With `start`, only rows from `start` on are written: a segment to be
+        appended to an index holding the earlier rows (see extended).
+        The directory is written under a temporary name and renamed into
+        place, so readers never see a partial index.
+        """
+        snap = self._snapshot
+        texts, metadata, vectors, lexical, deleted = snap.texts, snap.metadata, snap.vectors, snap.lexical, snap.deleted
+        if start:
+            texts, metadata = texts[start:], metadata[start:]
+            lexical = BM25Index(texts)
+            if vectors is not None:
+                vectors = vectors.take(np.arange(start, len(snap.texts)))
+            if deleted is not None:
+                deleted = deleted[start:] if deleted[start:].any() else None
+        vocab, lexical_arrays = lexical.arrays()
+        header = {"texts": texts, "metadata": metadata, "quantization": self.quantization,
+                  "pca_dims": self.pca_dims, "vocab": vocab}
+        arrays = {f"bm25_{name}": value for name, value in lexical_arrays.items()}
+        if vectors is not None:
+            arrays.update({f"vectors_{name}": value for name, value in vectors.arrays().items()})
+        if snap.projection is not None:
+            arrays.update({f"pca_{name}": value for name, value in snap.projection.arrays().items()})
+        if deleted is not None:
+            arrays["deleted"] = deleted
+        tmp = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, "header.json"), "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        for name, value in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), value)
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index written by save(); with mmap the arrays are memory-mapped read-only,
+        so processes loading the same files share their pages."""
+        with open(os.path.join(path, "header.json"), encoding="utf-8") as f:
+            header = json.load(f)
+        arrays = {}
+        for filename in os.listdir(path):
+            if filename.endswith(".npy"):
+                arrays[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode="r" if mmap else None)
+        index = cls(header["quantization"], header["pca_dims"])
+        vectors = _prefixed(arrays, "vectors_")
+        pca = _prefixed(arrays, "pca_")
+        index._snapshot = _Snapshot(
+            header["texts"], header["metadata"],
+            from_arrays(index.quantization, vectors) if vectors else None,
+            PcaProjection(**pca) if pca else None,
+            BM25Index.from_arrays(header["vocab"], _prefixed(arrays, "bm25_")),
+            np.array(arrays["deleted"]) if "deleted" in arrays else None,
+        )
+        return index
+
+    def _encode(self, embeddings, projection, fit=True):
+        x = normalize(embeddings)
+        if fit and projection is None and self.pca_dims and len(x) >= 4 * self.pca_dims:
+            projection = PcaProjection.fit(x, self.pca_dims)
+        if projection is not None:
+            x = projection.apply(x)
+        return CODECS[self.quantization].encode(x), projection
+
+    def replace(self, texts, embeddings, metadata=None):
+        texts = list(texts)
+        metadata = list(metadata) if metadata is not None else [{} for _ in texts]
+        vectors, projection = self._encode(embeddings, None) if texts else (None, None)
+        snapshot = _Snapshot(texts, metadata, vectors, projection)
+        with self._write_lock:
+            self._snapshot = snapshot
+
+    def add(self, texts, embeddings, metadata=None):
+        if not texts:
+            return
+        metadata = list(metadata) if metadata is not None else [{} for _ in texts]
+        with self._write_lock:
+            old = self._snapshot
+            # Only an empty index can still pick a projection; stored vectors keep their dimensions
+            vectors, projection = self._encode(embeddings, old.projection, fit=old.vectors is None)
+            deleted = old.deleted
+            if deleted is not None:
+                deleted = np.concatenate([deleted, np.zeros(len(texts), dtype=bool)])
+            self._snapshot = _Snapshot(
+                old.texts + list(texts), old.metadata + metadata,
+                vectors if old.vectors is None else old.vectors.append(vectors), projection,
+                old.lexical.extended(texts), deleted, old.text_bytes + sum(len(t) for t in texts),
+            )
+
+    def copy(self):
+        """An index sharing this one's snapshot; later changes to either leave the other as it was."""
+        index = RagIndex(self.quantization, self.pca_dims)
+        index._snapshot = self._snapshot
+        return index
+
+    def extended(self, segments):
+        """A new index with the rows of `segments` (indexes written by save(path, start)) appended.
+
+        Vectors are concatenated once for all segments; this index is left unchanged.
+        """
+        old = self._snapshot
+        parts = [segment._snapshot for segment in segments if segment._snapshot.texts]
+        if not parts:
+            return self
+        texts = [text for part in parts for text in part.texts]
+        vectors = [part.vectors for part in parts]
+        if old.vectors is not None:
+            vectors.insert(0, old.vectors)
+        deleted = None
+        if old.deleted is not None or any(part.deleted is not None for part in parts):
+            deleted = np.concatenate([
+                snap.deleted if snap.deleted is not None else np.zeros(len(snap.texts), dtype=bool)
+                for snap in [old, *parts]
+            ])
+        index = RagIndex(self.quantization, self.pca_dims)
+        index._snapshot = _Snapshot(
+            old.texts + texts, old.metadata + [meta for part in parts for meta in part.metadata],
+            vectors[0].append(*vectors[1:]), old.projection if old.vectors is not None else parts[0].projection,
+            old.lexical.extended(texts), deleted, old.text_bytes + sum(len(t) for t in texts),
+        )
+        return index
+
+    def delete(self, where):
+        """Tombstone every chunk whose metadata matches all fields in `where`; returns the count."""
+        with self._write_lock:
+            old = self._snapshot
+            matches = np.array([all(meta.get(key) == value for key, value in where.items())
+                                for meta in old.metadata], dtype=bool)
+            deleted = matches if old.deleted is None else (matches | old.deleted)
+            removed = int(deleted.sum()) - (len(old.texts) - old.live)
+            if not removed:
+                return 0
+            snapshot = _Snapshot(old.texts, old.metadata, old.vectors, old.projection, old.lexical, deleted,
+                                 old.text_bytes)
+            if len(old.texts) - snapshot.live >= COMPACT_RATIO * len(old.texts):
+                snapshot = _compacted(snapshot)
+            self._snapshot = snapshot
+            return removed
+
+    def compact(self):
+        """Drop tombstoned rows now instead of waiting for COMPACT_RATIO."""
+        with self._write_lock:
+            if self._snapshot.deleted is not None:
+                self._snapshot = _compacted(self._snapshot)
+
+    def search(self, query_embedding, k=5, where=None, query_text=None, mode="dense"):
+        """Return [(text, metadata, distance)] for the k best chunks, best first.
+
+        `where` is an optional dict of metadata fields that must match.
+        Modes (the lexical ones need `query_text`, and fall back to dense
+        without it or when no chunk shares a term with the query):
+        - dense: cosine nearest neighbours; distance is the cosine distance
+          (binary indexes rescore RESCORE_FACTOR * n Hamming candidates).
+        - hybrid: dense and BM25 candidates fused as
+          HYBRID_ALPHA * cosine + (1 - HYBRID_ALPHA) * BM25 / max BM25;
+          distance is 1 - fused score.
+        - prefilter: cosine distance computed only for the top BM25
+          candidates, which avoids scanning every vector in large indexes.
+        - auto: prefilter from PREFILTER_MIN_CHUNKS chunks, hybrid below.
+        """
+        snap = self._snapshot
+        texts, metadata, vectors, deleted = snap.texts, snap.metadata, snap.vectors, snap.deleted
+        if vectors is None or not snap.live:
+            return []
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+        if mode == "auto":
+            mode = "prefilter" if snap.live >= PREFILTER_MIN_CHUNKS else "hybrid"
+        query = normalize(np.asarray(query_embedding).reshape(-1))
+        if snap.projection is not None:
+            query = snap.projection.apply(query)
+        # Over-fetch when filtering so k matches usually survive the filter
+        if mode != "dense" and query_text:
+            n = len(texts) if where else max(10 * k, 100 if mode == "hybrid" else 500)
+            lex_ids, lex_scores = snap.lexical.search(query_text, n=n)
+            if deleted is not None:
+                live = ~deleted[lex_ids]
+                lex_ids, lex_scores = lex_ids[live], lex_scores[live]
+            if len(lex_ids):
+                if mode == "hybrid":
+                    ranked = _hybrid(vectors, query, lex_ids, lex_scores, min(n, snap.live), deleted)
+                else:
+                    similarity = vectors.scores(query, lex_ids)
+                    order = np.argsort(-similarity, kind="stable")
+                    ranked = zip(lex_ids[order], 1 - similarity[order])
+                return _collect(ranked, texts, metadata, k, where, deleted)
+        n = snap.live if where else min(k, snap.live)
+        ids, similarity = _dense(vectors, query, n, deleted)
+        return _collect(zip(ids, 1 - similarity), texts, metadata, k, where, deleted)
+
+
+def _prefixed(arrays, prefix):
+    return {key[len(prefix):]: arrays[key] for key in arrays if key.startswith(prefix)}
+
+
+def _compacted(snap):
+    keep = np.flatnonzero(~snap.deleted)
+    texts = [snap.texts[i] for i in keep]
+    vectors = snap.vectors.take(keep) if snap.vectors is not None else None
+    return _Snapshot(texts, [snap.metadata[i] for i in keep], vectors, snap.projection)
+
+
+def _dense(vectors, query, n, deleted=None):
+    """(ids, cosine similarities) of the n nearest live vectors, best first."""
+    if vectors.kind == "binary":
+        ids = vectors.candidates(query, min(len(vectors), n * RESCORE_FACTOR), exclude=deleted)
+        if deleted is not None:
+            ids = ids[~deleted[ids]]
+        similarity = vectors.scores(query, ids)
+        order = top_n(similarity, n)
+        return ids[order], similarity[order]
+    similarity = vectors.scores(query)
+    if deleted is not None:
+        similarity[deleted] = -np.inf
+    ids = top_n(similarity, n)
+    return ids, similarity[ids]
+
+
+def _hybrid(vectors, query, lex_ids, lex_scores, n, deleted=None):
+    dense_ids, _ = _dense(vectors, query, n, deleted)
+    ids = np.union1d(dense_ids, lex_ids)
+    lexical = np.zeros(len(ids))
+    lexical[np.searchsorted(ids, lex_ids)] = lex_scores / lex_scores.max()
+    fused = HYBRID_ALPHA * vectors.scores(query, ids) + (1 - HYBRID_ALPHA) * lexical
+    order = np.argsort(-fused, kind="stable")
+    return zip(ids[order], 1 - fused[order])
+
+
+def _collect(ranked, texts, metadata, k, where, deleted=None):
+    hits = []
+    for i, dist in ranked:
+        if deleted is not None and deleted[i]:
+            continue
+        meta = metadata[i]
+        if where and any(meta.get(key) != value for key, value in where.items()):
+            continue
+        hits.append((texts[i], meta, float(dist)))
+        if len(hits) >= k:
+            break
+    return hits
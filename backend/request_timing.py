@@ -0,0 +1,130 @@
+"""Per-request phase timings (Server-Timing) and opt-in request profiling.
+
+Code marks phases with `with phase("rag_embed"): ...`; the active request's
+timer lives in a contextvar, so phases recorded in asyncio.to_thread workers
+land on the right request and `phase()` is a no-op outside a request.
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+
+from structured_logging import log_event
+
+logger = logging.getLogger("edupoint.timing")
+
+_current = contextvars.ContextVar("request_timer", default=None)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}  # name -> total ms (a phase entered twice is summed)
+        self._lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def header(self):
+        with self._lock:
+            phases = list(self.phases.items())
+        parts = [f"{name};dur={ms:.1f}" for name, ms in phases]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+@contextlib.contextmanager
+def phase(name):
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - start) * 1000)
+
+
+def _profile_requested(scope):
+    for key, value in scope["headers"]:
+        if key == b"x-profile" and value not in (b"", b"0"):
+            return True
+    return re.search(rb"(^|&)profile=(1|true)(&|$)", scope.get("query_string", b"")) is not None
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header and logs one JSON timing record per request.
+
+    With `profile=True` (opted into with REQUEST_PROFILING), a request sent
+    with `X-Profile: 1` or `?profile=1` runs under cProfile; the stats are
+    written to `profile_dir` and the file name is returned in the
+    X-Profile-File header.
+    """
+
+    def __init__(self, app, allow_origins=(), profile=False, profile_dir="profiles"):
+        self.app = app
+        self.allow_origins = ", ".join(allow_origins)
+        self.profile = profile
+        self.profile_dir = profile_dir
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timer = PhaseTimer()
+        token = _current.set(timer)
+        profiler = cProfile.Profile() if self.profile and _profile_requested(scope) else None
+        profile_name = None
+        if profiler is not None:
+            profile_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(timer):x}.prof"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header().encode()))
+                if self.allow_origins:
+                    headers.append((b"timing-allow-origin", self.allow_origins.encode()))
+                if profile_name:
+                    headers.append((b"x-profile-file", profile_name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            if profiler is not None:
+                # Only samples the event-loop thread; to_thread work shows up as waiting
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    profiler.disable()
+                    self._save_profile(profiler, profile_name)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            log_event(logger, logging.INFO, "request_timing", route=route or scope["path"],
+                      method=scope["method"], status=status, total_ms=round(timer.total_ms(), 1),
+                      phases={name: round(ms, 1) for name, ms in timer.phases.items()})
+
+    def _save_profile(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        logger.info("Saved request profile to %s\n%s", path, summary.getvalue())
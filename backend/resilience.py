@@ -0,0 +1,242 @@
+"""Deadlines, retries, hedged requests and circuit breakers for external APIs.
+
+`Upstream(name, policy)` owns a pooled httpx.AsyncClient for one external
+service. Every call through `Upstream.request` gets:
+- a deadline: the call, retries and hedges included, finishes within
+  `policy.deadline` seconds, and each attempt within `policy.attempt_timeout`.
+- retries with full-jitter exponential backoff for idempotent requests (GET,
+  HEAD, OPTIONS by default) that failed with a transport error, a timeout,
+  429 or 5xx. Connection failures are retried for any method, since nothing
+  reached the upstream.
+- an optional hedge for idempotent requests: if the first attempt has not
+  answered after the upstream's recent p95 latency, an identical second
+  request is sent and whichever answers first wins (the other is cancelled).
+- a circuit breaker: after `failure_threshold` consecutive failed attempts
+  calls fail fast with CircuitOpenError for `reset_timeout` seconds, then a
+  single probe decides whether the circuit closes again.
+"""
+import asyncio
+import collections
+import random
+import time
+from dataclasses import dataclass
+
+import httpx
+
+import metrics
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Successful attempts needed before the hedge delay follows the measured p95
+MIN_LATENCY_SAMPLES = 20
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamError):
+    def __init__(self, name, deadline):
+        super().__init__(f"{name} did not answer within {deadline:g}s")
+        self.name = name
+        self.deadline = deadline
+
+
+@dataclass(frozen=True)
+class UpstreamPolicy:
+    deadline: float = 10.0
+    attempt_timeout: float = 5.0
+    retries: int = 2
+    backoff: float = 0.1  # attempt i sleeps uniform(0, min(backoff_cap, backoff * 2**i))
+    backoff_cap: float = 2.0
+    hedge: bool = False
+    hedge_delay: float = 0.5  # used until MIN_LATENCY_SAMPLES latencies have been seen
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful attempts."""
+
+    def __init__(self, size=200):
+        self._samples = collections.deque(maxlen=size)
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+
+    def quantile(self, q):
+        """The q-quantile of the window, or None while it holds too few samples."""
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0  # consecutive failed attempts
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        """Whether an attempt may be sent now; in half-open state only one probe at a time."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, ok):
+        self._probing = False
+        if ok:
+            self.failures = 0
+            self.state = self.CLOSED
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def available(self):
+        """False while open and not yet due for a probe."""
+        return self.state != self.OPEN or time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def abandon(self):
+        """An allowed attempt was cancelled before it had an outcome."""
+        self._probing = False
+
+    def retry_after(self):
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+
+def _failed(resp):
+    return resp.status_code in RETRY_STATUSES
+
+
+class Upstream:
+    def __init__(self, name, policy=None, llm=False, client_options=None):
+        self.name = name
+        self.policy = policy or UpstreamPolicy()
+        self.llm = llm
+        self.breaker = CircuitBreaker(self.policy.failure_threshold, self.policy.reset_timeout)
+        self.latency = LatencyWindow()
+        self.client_options = client_options or {}
+        self._client = None
+        metrics.register_breaker(name, self.breaker)
+
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self.client_options)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method, url, idempotent=None, model="", **kwargs):
+        """Send the request under the upstream's policy; returns the last httpx.Response.
+
+        Raises CircuitOpenError, DeadlineExceeded, or the last transport error.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        deadline = time.monotonic() + self.policy.deadline
+        with metrics.track_upstream(self.name, model, llm=self.llm) as call:
+            resp = await self._call(method, url, idempotent, deadline, kwargs)
+            call.status_code = resp.status_code
+        return resp
+
+    async def _call(self, method, url, idempotent, deadline, kwargs):
+        policy = self.policy
+        for attempt in range(policy.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            kind = "retry" if attempt else "first"
+            error = resp = None
+            try:
+                if idempotent and policy.hedge and self.breaker.state == CircuitBreaker.CLOSED:
+                    resp = await self._hedged(method, url, deadline, kwargs, kind)
+                else:
+                    resp = await self._send(method, url, deadline, kwargs, kind)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                error = e
+            if resp is not None and not _failed(resp):
+                return resp
+            delay = random.uniform(0, min(policy.backoff_cap, policy.backoff * 2 ** attempt))
+            retryable = idempotent or isinstance(error, httpx.ConnectError)
+            if attempt == policy.retries or not retryable or time.monotonic() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+        if resp is not None:
+            return resp
+        if isinstance(error, asyncio.TimeoutError):
+            limit = policy.deadline if time.monotonic() >= deadline else policy.attempt_timeout
+            raise DeadlineExceeded(self.name, limit) from error
+        raise error
+
+    async def _send(self, method, url, deadline, kwargs, kind):
+        """One attempt the breaker allowed; every way out of it records an outcome or abandons it,
+        so a half-open breaker is never left waiting for a probe that has ended."""
+        timeout = min(self.policy.attempt_timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            self.breaker.abandon()
+            raise DeadlineExceeded(self.name, self.policy.deadline)
+        metrics.UPSTREAM_ATTEMPTS.labels(self.name, kind).inc()
+        start = time.monotonic()
+        try:
+            # wait_for bounds the whole attempt; httpx's timeout only bounds each socket operation
+            resp = await asyncio.wait_for(self.client().request(method, url, timeout=timeout, **kwargs), timeout)
+        except (httpx.RequestError, asyncio.TimeoutError):
+            # Transport errors, timeouts and bad responses (decoding errors, redirect loops)
+            self.breaker.record(False)
+            raise
+        except BaseException:
+            # Cancelled, or failed before reaching the upstream: says nothing about its health
+            self.breaker.abandon()
+            raise
+        self.breaker.record(not _failed(resp))
+        if not _failed(resp):
+            self.latency.observe(time.monotonic() - start)
+        return resp
+
+    async def _hedged(self, method, url, deadline, kwargs, kind):
+        delay = self.latency.quantile(0.95)
+        first = asyncio.ensure_future(self._send(method, url, deadline, kwargs, kind))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.policy.hedge_delay if delay is None else delay)
+            if not done:
+                pending.add(asyncio.ensure_future(self._send(method, url, deadline, kwargs, "hedge")))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not _failed(task.result()):
+                        return task.result()
+            # Every attempt failed: surface the last one
+            return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
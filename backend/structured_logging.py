@@ -0,0 +1,142 @@
+"""Structured, low-overhead logging for the API.
+
+- `log_event(logger, level, event, route=..., **fields)` checks the level and the
+  route's sampling rate before doing any work, so disabled or unsampled events
+  cost a couple of attribute lookups.
+- Field values are clipped with reprlib when the event is emitted, so logging a
+  request body or prompt never serialises a whole corpus.
+- `setup_logging()` routes every record through a QueueHandler; JSON formatting
+  and the actual write happen on a QueueListener thread, off the event loop.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import reprlib
+import sys
+import time
+
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "500"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))
+
+_listener = None
+
+
+def _parse_rates(spec):
+    """'/api/ollama=0.1,/api/rag/upload=1' -> {route: rate}"""
+    rates = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        route, _, rate = item.partition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+# Fraction of DEBUG/INFO events logged per route; warnings and errors are never sampled out
+SAMPLE_RATES = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+_repr = reprlib.Repr()
+_repr.maxstring = _repr.maxother = 80
+_repr.maxlist = _repr.maxdict = _repr.maxtuple = 10
+_repr.maxlevel = 3
+
+
+def clip(value, limit=LOG_MAX_CHARS, depth=2):
+    """Bounded-cost version of a log field.
+
+    Strings are cut to `limit`, small dicts/lists are clipped item by item so
+    they stay structured in JSON output, and anything else goes through reprlib.
+    """
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= limit else f"{value[:limit]}... [{len(value)} chars]"
+    if isinstance(value, BaseException):
+        return clip(f"{type(value).__name__}: {value}", limit)
+    if depth and isinstance(value, dict) and len(value) <= 20:
+        return {str(k): clip(v, limit, depth - 1) for k, v in value.items()}
+    if depth and isinstance(value, (list, tuple)) and len(value) <= 20:
+        return [clip(v, limit, depth - 1) for v in value]
+    return clip(_repr.repr(value), limit)
+
+
+def sampled(route):
+    rate = SAMPLE_RATES.get(route, 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+def log_event(logger, level, event, route=None, **fields):
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING and route is not None and not sampled(route):
+        return
+    if route is not None:
+        fields["route"] = route
+    logger.log(level, event, extra={"fields": fields}, stacklevel=2)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ClippingQueueHandler(logging.handlers.QueueHandler):
+    """Clips fields and merges %-args in the caller; formatting is left to the listener thread."""
+
+    def prepare(self, record):
+        record.msg = clip(record.getMessage(), LOG_MAX_MESSAGE_CHARS)
+        record.args = None
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: clip(value) for key, value in fields.items()}
+        return record
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """Install the queue-based handler on the root logger; returns the running QueueListener.
+
+    Calling it again replaces the previous configuration.
+    """
+    global _listener
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s %(fields)s", defaults={"fields": ""}))
+
+    stop_logging()
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_ClippingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,51 @@
+import asyncio
+
+from chat_history import HistoryManager, message_tokens
+
+MODEL = "gemma3"
+
+
+def conversation(turns):
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"question {turn} " + "word " * 40})
+        messages.append({"role": "assistant", "content": f"answer {turn} " + "word " * 40})
+    return messages + [{"role": "user", "content": "latest question"}]
+
+
+def test_messages_awaiting_their_summary_stay_verbatim():
+    messages = conversation(6)
+    total = sum(message_tokens(MODEL, m) for m in messages)
+
+    async def fit():
+        started = asyncio.Event()
+
+        async def summarize(previous, folded):
+            started.set()
+            await asyncio.Event().wait()  # never finishes during the test
+
+        history = HistoryManager(budget=total - 1, summarize=summarize, fold_step=4, summary_tokens=64,
+                                 overflow_tokens=total)
+        fitted = history.fit(MODEL, messages)
+        await started.wait()
+        history.cancel_pending()
+        return fitted
+
+    fitted = asyncio.run(fit())
+
+    assert fitted.summary == ""
+    assert fitted.pending == 4 and fitted.folded == 0 and fitted.omitted == 0
+    assert fitted.messages == messages
+    assert fitted.tokens == total
+
+
+def test_messages_over_budget_are_dropped_by_block():
+    messages = conversation(6)
+    total = sum(message_tokens(MODEL, m) for m in messages)
+    history = HistoryManager(budget=total // 2, fold_step=4, summary_tokens=64)
+
+    fitted = history.fit(MODEL, messages)
+
+    assert fitted.omitted % 4 == 0 and fitted.omitted > 0
+    assert fitted.messages == messages[fitted.omitted:]
+    assert fitted.tokens <= history.budget
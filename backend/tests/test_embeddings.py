@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from embeddings import TOLERANCE, OnnxEmbedder, compare_embeddings, load_embedder
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+def test_onnx_embedder_does_not_export_at_runtime(tmp_path):
+    embedder = OnnxEmbedder(MODEL, model_dir=str(tmp_path))
+
+    with pytest.raises(FileNotFoundError, match="python -m embeddings"):
+        embedder.encode(["a sentence"])
+    assert list(tmp_path.iterdir()) == []
+
+
+SENTENCES = [
+    "Photosynthesis turns light energy into chemical energy stored in glucose.",
+    "The derivative of sin(x) is cos(x).",
+    "CS-1010 covers recursion, lists and basic complexity analysis.",
+    "Where is the library open on Sundays?",
+    "A short one.",
+    "Mitochondria are the site of aerobic respiration in eukaryotic cells, producing most of the ATP.",
+]
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_embeddings_agree_with_torch(backend):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+    candidate = load_embedder(MODEL, backend)
+    if not os.path.exists(candidate.path):
+        pytest.skip(f"No exported model at {candidate.path} (python -m embeddings {MODEL})")
+
+    agreement = compare_embeddings(load_embedder(MODEL, "torch").encode(SENTENCES), candidate.encode(SENTENCES))
+
+    assert agreement["min_cosine"] >= TOLERANCE[backend]
@@ -0,0 +1,52 @@
+import asyncio
+
+from llm_router import ChatBackend, LlmRouter
+
+
+def backends(remote_available=True):
+    """Local backend with one slot whose requests run until `release` is set, and an instant remote one."""
+    release = asyncio.Event()
+
+    async def local_generate(prompt):
+        await release.wait()
+        return {"result": f"local: {prompt}"}
+
+    async def remote_generate(prompt):
+        return {"result": f"remote: {prompt}"}
+
+    local = ChatBackend("ollama", local_generate, concurrency=1)
+    remote = ChatBackend("gemini", remote_generate, available=lambda: remote_available)
+    return LlmRouter(local, remote, max_queue_wait=1.0, default_latency=5.0), release
+
+
+def test_saturated_local_slots_spill_over_to_gemini():
+    async def run():
+        router, release = backends()
+        held = asyncio.create_task(router.chat("first"))
+        await asyncio.sleep(0)  # first request now holds the only local slot
+        result, decision = await router.chat("second")
+        release.set()
+        await held
+        return result, decision
+
+    result, decision = asyncio.run(run())
+
+    assert decision.reason == "queue_wait" and decision.served_by == "gemini"
+    assert result["result"] == "remote: second"
+
+
+def test_open_gemini_circuit_keeps_requests_local():
+    async def run():
+        router, release = backends(remote_available=False)
+        held = asyncio.create_task(router.chat("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(router.chat("second"))
+        await asyncio.sleep(0)
+        release.set()
+        await held
+        return await second
+
+    result, decision = asyncio.run(run())
+
+    assert decision.reason == "remote_unavailable" and decision.served_by == "ollama"
+    assert result["result"] == "local: second"
@@ -0,0 +1,28 @@
+import pytest
+
+from chat_history import HistoryManager
+from prompts import SYSTEM_PROMPT, PromptParts, template_for
+
+MODEL = "gemma3"
+
+
+@pytest.mark.parametrize("model", ["gemma3:4b", "llama3"])  # system folded into the prompt / own system field
+def test_prefix_is_identical_across_turns_while_context_changes(model):
+    template = template_for(model)
+    history = HistoryManager(budget=100_000)
+    messages = []
+    previous = None
+    for turn in range(4):
+        messages.append({"role": "user", "content": f"question {turn}"})
+        fitted = history.fit(MODEL, messages)
+        parts = PromptParts(SYSTEM_PROMPT, f"chunk retrieved for question {turn}", fitted.question,
+                            fitted.history_text())
+        prompt = template.render(parts)
+        text = prompt.text()
+        if previous is not None:
+            # Everything up to the end of the previous turn's history is resent byte for byte
+            assert text.startswith(previous)
+            assert prompt.system == previous_system
+        previous = text[:text.index(template.context_header)].rstrip("\n")
+        previous_system = prompt.system
+        messages.append({"role": "assistant", "content": f"answer {turn}"})
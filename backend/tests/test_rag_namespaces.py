@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import numpy as np
+
+import rag_namespaces
+from rag_namespaces import NamespaceStore
+
+
+def embed(count, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, 8)).astype(np.float32)
+
+
+def read_current(store, namespace):
+    with open(os.path.join(store._dir(namespace), "CURRENT")) as f:
+        return f.read().split()
+
+
+def test_publish_recovers_from_writer_crash(tmp_path):
+    store = NamespaceStore(str(tmp_path))
+    store.replace("ns", ["a", "b"], embed(2))
+    directory = store._dir("ns")
+    # A writer died after saving generation 2 (and while saving 3) but before updating CURRENT
+    shutil.copytree(os.path.join(directory, "g00000001"), os.path.join(directory, "g00000002"))
+    shutil.copytree(os.path.join(directory, "g00000001"), os.path.join(directory, "g00000003.4242.tmp"))
+
+    store.add("ns", ["c"], embed(1, seed=1))
+    store.add("ns", ["d"], embed(1, seed=2))
+
+    # The next generation skips past the orphaned one
+    assert read_current(store, "ns") == ["1", "3", "4"]
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+    assert NamespaceStore(str(tmp_path)).get("ns").texts == ["a", "b", "c", "d"]
+
+
+def test_appends_publish_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_namespaces, "MAX_SEGMENTS", 4)
+    writer, reader = NamespaceStore(str(tmp_path)), NamespaceStore(str(tmp_path), refresh_interval=0)
+    writer.replace("ns", ["base"], embed(1))
+    texts = ["base"]
+    for i in range(6):
+        writer.add("ns", [f"caption {i}"], embed(1, seed=i + 1), [{"start_ms": i}])
+        texts.append(f"caption {i}")
+        # The reader follows along segment by segment
+        assert reader.get("ns").texts == texts
+    # Generations 1-4 made a full chain, so 5 rewrote the shard in full and 6, 7 are segments again
+    assert read_current(writer, "ns") == ["5", "6", "7"]
+    fresh = NamespaceStore(str(tmp_path)).get("ns")
+    assert fresh.texts == texts
+    assert len(fresh.search(embed(1, seed=3)[0], k=10)) == len(texts)
@@ -0,0 +1,14 @@
+import numpy as np
+
+from rag_store import RagIndex
+
+
+def test_add_to_empty_index():
+    index = RagIndex()
+    index.add(["first caption"], np.ones((1, 8), dtype=np.float32), [{"video_id": "v", "start_ms": 0}])
+    index.add(["second caption"], np.full((1, 8), 2.0, dtype=np.float32), [{"video_id": "v", "start_ms": 1000}])
+
+    assert len(index) == 2
+    assert index.texts == ["first caption", "second caption"]
+    hits = index.search(np.ones(8), k=2)
+    assert [meta["start_ms"] for _, meta, _ in hits] == [0, 1000]
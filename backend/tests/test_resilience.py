@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from resilience import CircuitBreaker, DeadlineExceeded, Upstream, UpstreamPolicy
+
+
+def half_open_upstream(handler, **policy):
+    upstream = Upstream("test", UpstreamPolicy(retries=0, failure_threshold=1, reset_timeout=0, **policy),
+                        client_options={"transport": httpx.MockTransport(handler)})
+    upstream.breaker.record(False)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    return upstream
+
+
+def test_probe_failing_to_decode_is_recorded():
+    def handler(request):
+        raise httpx.DecodingError("bad gzip", request=request)
+
+    upstream = half_open_upstream(handler)
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(upstream.get("http://upstream.test/"))
+
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert upstream.breaker.allow()  # the next probe is let through
+
+
+def test_probe_past_its_deadline_is_abandoned():
+    upstream = half_open_upstream(lambda request: httpx.Response(200))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(upstream._call("GET", "http://upstream.test/", True, time.monotonic() - 1, {}))
+
+    assert upstream.breaker.allow()
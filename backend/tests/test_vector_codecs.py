@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from vector_codecs import CODECS
+
+
+@pytest.mark.parametrize("kind", list(CODECS))
+def test_appends_from_the_same_view_do_not_overwrite_each_other(kind):
+    rows = np.random.default_rng(0).normal(size=(5, 16)).astype(np.float32)
+    codec = CODECS[kind]
+    base = codec.encode(rows[:2]).append(codec.encode(rows[2:3]))
+    first = base.append(codec.encode(rows[3:4]))
+    second = base.append(codec.encode(rows[4:5]))  # base no longer ends the buffer: must copy
+
+    expected = codec.encode(rows)
+    assert np.array_equal(first.scores(rows[0]), expected.scores(rows[0])[:4])
+    assert np.array_equal(second.scores(rows[0]), expected.scores(rows[0])[[0, 1, 2, 4]])
+    assert len(base) == 3
+
+
+def test_binary_rescores_with_the_float_vectors():
+    rows = np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    binary, exact = CODECS["binary"].encode(rows), CODECS["float32"].encode(rows)
+    ids = binary.candidates(rows[0], 10)
+
+    assert ids[0] == 0
+    assert np.allclose(binary.scores(rows[0], ids), exact.scores(rows[0], ids))
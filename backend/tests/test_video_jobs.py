@@ -0,0 +1,56 @@
+import pytest
+
+from video_jobs import VideoJob, VideoJobManager
+
+
+@pytest.fixture
+def manager():
+    manager = VideoJobManager(ollama_client=None, model="gemma3", url_hosts=["youtube.com"])
+    yield manager
+    manager.shutdown()
+
+
+@pytest.mark.parametrize("url", [
+    "http://youtube.com/watch?v=x",  # not https
+    "file:///etc/passwd",
+    "https://169.254.169.254/latest/meta-data",
+    "https://youtube.com.evil.example/watch?v=x",
+    "https://user@youtube.com/watch?v=x",
+    "https://youtube.com:8080/watch?v=x",
+])
+def test_rejects_urls_outside_the_allowlist(manager, url):
+    with pytest.raises(ValueError):
+        manager.submit(url, "Describe the frame.")
+    assert manager.jobs == {}
+
+
+def test_jobs_are_only_visible_to_their_owner(manager):
+    job = VideoJob("https://www.youtube.com/watch?v=x", "Describe the frame.", "gemma3", 30, 10, owner="alice")
+    manager.jobs[job.id] = job
+
+    assert manager.get(job.id, "alice") is job
+    assert manager.get(job.id, "bob") is None
+    assert manager.list("bob") == []
+    assert manager.cancel(job.id, "bob") is None
+    assert not job.cancel_event.is_set()
+
+
+def test_jobs_are_shared_between_workers_through_state_dir(tmp_path):
+    owner = VideoJobManager(ollama_client=None, model="gemma3", state_dir=str(tmp_path))
+    other = VideoJobManager(ollama_client=None, model="gemma3", state_dir=str(tmp_path))
+    job = VideoJob("https://www.youtube.com/watch?v=x", "Describe the frame.", "gemma3", 30, 10, owner="alice",
+                   state_dir=str(tmp_path))
+    owner.jobs[job.id] = job
+    job.update(status="running")
+    job.add_result(0, "A classroom.")
+    try:
+        seen = other.get(job.id, "alice")
+        assert seen.to_dict() == job.to_dict()
+        assert [j.id for j in other.list("alice")] == [job.id]
+        assert other.get(job.id, "bob") is None and other.list("bob") == []
+
+        assert other.cancel(job.id, "alice") is not None
+        assert owner._cancelled(job)
+    finally:
+        owner.shutdown()
+        other.shutdown()
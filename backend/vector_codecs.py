@@ -0,0 +1,244 @@
+"""Compact storage and scoring for unit-normalised embedding vectors.
+
+Codecs hold the vectors of one index and score a float query against them
+(cosine similarity, since stored vectors are normalised):
+- float32: exact, 4 bytes per dimension.
+- int8: per-vector symmetric scalar quantization, 1 byte per dimension plus
+  a float32 scale; scored with the float query (asymmetric), so only the
+  document side is approximated.
+- binary: sign bits, 1 bit per dimension, scanned for candidates by Hamming
+  distance. The float32 vectors are kept next to the bits and only the
+  candidates' rows are read to rescore them; in an index loaded with mmap
+  they stay on disk, so only the bits are resident.
+
+`PcaProjection` optionally reduces the dimensionality before encoding.
+"""
+import threading
+
+import numpy as np
+
+# Rows dequantized per step: small blocks keep the temporary float buffer in cache
+BLOCK_ROWS = 1024
+# Binary search rescoring: Hamming candidates per requested result
+RESCORE_FACTOR = 10
+# Spare capacity allocated when appending, as a fraction of the rows after the append
+GROWTH = 0.25
+_APPEND_LOCK = threading.Lock()
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:  # numpy < 2.0
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(x):
+        return _POPCOUNT_TABLE[x]
+
+
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def top_n(scores, n):
+    """Indices of the n highest scores, best first."""
+    if n < len(scores):
+        idx = np.argpartition(-scores, n - 1)[:n]
+        return idx[np.argsort(-scores[idx], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+
+class _Rows:
+    """Arrays with spare capacity shared by the codecs appended from one another."""
+
+    def __init__(self, buffers, used):
+        self.buffers = buffers
+        self.used = used
+
+
+class _Codec:
+    fields = ()  # per-row arrays, all of the same length
+    _rows = None  # set on codecs produced by append
+
+    def _with(self, arrays, rows):
+        codec = object.__new__(type(self))
+        codec.__dict__.update(self.__dict__)
+        codec.__dict__.update(zip(self.fields, arrays))
+        codec._rows = rows
+        return codec
+
+    def append(self, *others):
+        """A codec holding these rows followed by the others'; this one is unchanged.
+
+        The result is a view of a buffer with spare capacity, so appending to the newest codec
+        again only copies the new rows. Rows past a view's end are only ever written by the
+        append that claims them, so older views keep seeing exactly their rows.
+        """
+        new = [np.concatenate([getattr(o, f) for o in others]) for f in self.fields]
+        count, added = len(self), len(new[0])
+        with _APPEND_LOCK:
+            rows = self._rows
+            if rows is not None and rows.used == count and count + added <= len(rows.buffers[0]):
+                rows.used = count + added
+                for buffer, values in zip(rows.buffers, new):
+                    buffer[count:count + added] = values
+                return self._with([b[:count + added] for b in rows.buffers], rows)
+        capacity = count + added + int(GROWTH * (count + added))
+        buffers = []
+        for field, values in zip(self.fields, new):
+            current = getattr(self, field)
+            buffer = np.empty((capacity,) + current.shape[1:], dtype=current.dtype)
+            buffer[:count] = current
+            buffer[count:count + added] = values
+            buffers.append(buffer)
+        return self._with([b[:count + added] for b in buffers], _Rows(buffers, count + added))
+
+
+class FloatVectors(_Codec):
+    kind = "float32"
+    fields = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def encode(cls, x):
+        return cls(np.ascontiguousarray(x, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.data)
+
+    def take(self, ids):
+        return type(self)(self.data[ids])
+
+    def scores(self, query, ids=None):
+        return (self.data if ids is None else self.data[ids]) @ query
+
+    def nbytes(self):
+        return self.data.nbytes
+
+    def arrays(self):
+        return {"data": self.data}
+
+
+class Int8Vectors(_Codec):
+    kind = "int8"
+    fields = ("codes", "scales")
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def encode(cls, x):
+        x = np.asarray(x, dtype=np.float32)
+        scales = np.abs(x).max(axis=1) / 127 if len(x) else np.zeros(0, np.float32)
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        codes = np.clip(np.rint(x / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(codes, scales)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def take(self, ids):
+        return type(self)(self.codes[ids], self.scales[ids])
+
+    def scores(self, query, ids=None):
+        if ids is not None:
+            return (self.codes[ids].astype(np.float32) @ query) * self.scales[ids]
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            out[block] = (self.codes[block].astype(np.float32) @ query) * self.scales[block]
+        return out
+
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def arrays(self):
+        return {"codes": self.codes, "scales": self.scales}
+
+
+class BinaryVectors(_Codec):
+    kind = "binary"
+    fields = ("bits", "rescore")
+
+    def __init__(self, bits, rescore):
+        self.bits = bits
+        self.rescore = rescore  # float32 vectors, read for candidates only
+        self.dim = rescore.shape[1]
+
+    @classmethod
+    def encode(cls, x):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return cls(np.packbits(x > 0, axis=1), x)
+
+    def __len__(self):
+        return len(self.bits)
+
+    def take(self, ids):
+        return type(self)(self.bits[ids], self.rescore[ids])
+
+    def hamming(self, query):
+        query_bits = np.packbits(np.asarray(query) > 0)
+        out = np.empty(len(self.bits), dtype=np.int32)
+        for start in range(0, len(self.bits), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            out[block] = _popcount(self.bits[block] ^ query_bits).sum(axis=1, dtype=np.int32)
+        return out
+
+    def candidates(self, query, n, exclude=None):
+        """Indices of the n vectors closest to the query in Hamming distance, skipping `exclude` (bool mask)."""
+        distance = self.hamming(query)
+        if exclude is not None:
+            distance[exclude] = self.dim + 1
+        return top_n(-distance, n)
+
+    def scores(self, query, ids=None):
+        return (self.rescore if ids is None else self.rescore[ids]) @ query
+
+    def nbytes(self):
+        """Resident bytes: memory-mapped rescoring vectors are left to the page cache."""
+        return self.bits.nbytes + (0 if isinstance(self.rescore, np.memmap) else self.rescore.nbytes)
+
+    def arrays(self):
+        return {"bits": self.bits, "rescore": self.rescore}
+
+
+CODECS = {codec.kind: codec for codec in (FloatVectors, Int8Vectors, BinaryVectors)}
+
+
+def from_arrays(kind, arrays):
+    return CODECS[kind](**arrays)
+
+
+class PcaProjection:
+    """Centred PCA fitted on a sample of the corpus; outputs are re-normalised."""
+
+    MAX_FIT_ROWS = 20000
+
+    def __init__(self, mean, components):
+        self.mean = mean
+        self.components = components  # (dims, input_dims)
+
+    @classmethod
+    def fit(cls, x, dims, seed=0):
+        x = np.asarray(x, dtype=np.float32)
+        if len(x) > cls.MAX_FIT_ROWS:
+            x = x[np.random.default_rng(seed).choice(len(x), cls.MAX_FIT_ROWS, replace=False)]
+        mean = x.mean(axis=0)
+        _, _, vt = np.linalg.svd(x - mean, full_matrices=False)
+        return cls(mean, np.ascontiguousarray(vt[:dims], dtype=np.float32))
+
+    @property
+    def dims(self):
+        return len(self.components)
+
+    def apply(self, x):
+        return normalize((np.asarray(x, dtype=np.float32) - self.mean) @ self.components.T)
+
+    def nbytes(self):
+        return self.mean.nbytes + self.components.nbytes
+
+    def arrays(self):
+        return {"mean": self.mean, "components": self.components}
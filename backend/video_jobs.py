@@ -0,0 +1,397 @@
+"""Background video analysis jobs.
+
+Jobs run on their own bounded thread pool so frame decoding and the slow
+per-frame Ollama calls never touch the event loop that serves chat requests.
+Ollama usually has a single slot (OLLAMA_NUM_PARALLEL=1) shared with chat, so
+workers also yield it: while any request holds `foreground()`, and for
+IDLE_GRACE seconds after the last one ends (the next request is usually about
+to arrive), they wait before sending the next frame, for at most `max_yield`
+seconds per frame.
+
+Jobs run in the API worker that accepted them. With a `state_dir` shared by
+all uvicorn workers, each job's state is mirrored there as JSON, so any
+worker can report it, and a cancel from another worker leaves a marker file
+the owning worker checks before every frame.
+"""
+import base64
+import collections
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+
+from ollama_client import OllamaClient, OllamaError
+
+logger = logging.getLogger("edupoint.video_jobs")
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+IDLE_GRACE = 0.1
+
+
+class JobQueueFull(Exception):
+    """Raised when the pool already has the maximum number of pending jobs."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class VideoJob:
+    def __init__(self, source, prompt, model, frame_interval, max_frames, video_id=None, namespace=None,
+                 owner=None, state_dir=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner  # only the owner can see or cancel the job
+        self.source = source
+        self.video_id = video_id or hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        self.namespace = namespace  # RAG namespace the results are indexed into
+        self.prompt = prompt
+        self.model = model
+        self.frame_interval = frame_interval
+        self.max_frames = max_frames
+        self.status = QUEUED
+        self.error = None
+        self.total_frames = None
+        self.frame_duration_ms = 0  # time span covered by each sampled frame, known once the video is open
+        self.results = []  # [{"timestamp_ms": int, "result": str}]
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0  # bumped on every change, used for progress streaming
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        # Shared copy of the state for the other API workers, and the marker they create to cancel the job
+        self.state_path = os.path.join(state_dir, f"{self.id}.json") if state_dir else None
+        self.cancel_path = os.path.join(state_dir, f"{self.id}.cancel") if state_dir else None
+
+    @classmethod
+    def from_state(cls, state):
+        """Read-only snapshot of a job another worker runs, from its shared state."""
+        job = cls(state["source"], state["prompt"], state["model"], state["frame_interval"], state["max_frames"],
+                  state["video_id"], state["namespace"], state["owner"])
+        for name, value in state.items():
+            setattr(job, name, value)
+        return job
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._save()
+
+    def add_result(self, timestamp_ms, result):
+        with self._lock:
+            self.results.append({"timestamp_ms": timestamp_ms, "result": result})
+            self.version += 1
+            self._save()
+
+    def _state(self):
+        return {name: getattr(self, name) for name in (
+            "id", "owner", "source", "video_id", "namespace", "prompt", "model", "frame_interval", "max_frames",
+            "status", "error", "total_frames", "frame_duration_ms", "results", "created_at", "started_at",
+            "finished_at", "version")}
+
+    def _save(self):
+        if self.state_path is None:
+            return
+        # Written aside and renamed, so readers never see a partial file
+        tmp = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state(), f)
+        os.replace(tmp, self.state_path)
+
+    def to_dict(self, since=0):
+        with self._lock:
+            return {
+                "id": self.id,
+                "source": self.source,
+                "video_id": self.video_id,
+                "namespace": self.namespace,
+                "prompt": self.prompt,
+                "model": self.model,
+                "status": self.status,
+                "error": self.error,
+                "frames_done": len(self.results),
+                "frames_total": self.total_frames,
+                "results": self.results[since:],
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "version": self.version,
+            }
+
+
+class VideoJobManager:
+    """Runs video analysis jobs on a bounded pool of worker threads."""
+
+    def __init__(self, ollama_client, model, max_workers=2, max_pending=16, max_finished=100,
+                 video_root=None, url_hosts=(), request_timeout=120.0, max_image_size=896, on_result=None,
+                 max_yield=5.0, state_dir=None):
+        if isinstance(ollama_client, str):
+            ollama_client = OllamaClient(ollama_client.split("/api/")[0], timeout=request_timeout)
+        self.client = ollama_client
+        self.model = model
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.video_root = os.path.realpath(video_root) if video_root else None
+        # https URLs are only fetched from these hosts and their subdomains; none allowed when empty
+        self.url_hosts = tuple(h.strip().lower() for h in url_hosts if h.strip())
+        self.request_timeout = request_timeout
+        self.max_image_size = max_image_size
+        # Called as on_result(job, timestamp_ms, result) from the worker thread
+        self.on_result = on_result
+        self.max_yield = max_yield
+        # Directory shared by all API workers that mirrors every job's state; None keeps jobs in this worker
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._foreground = 0  # interactive requests waiting for or using the model
+        self._foreground_ended = 0.0  # monotonic time the last one ended
+        self._idle = threading.Condition()
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="video-job")
+
+    # --- job API ---
+
+    def submit(self, source, prompt, model=None, frame_interval=30, max_frames=10, video_id=None, namespace=None,
+               owner=None):
+        if "://" in source:
+            self._check_url(source)
+        else:
+            source = self._resolve_local_path(source)
+        with self._lock:
+            pending = sum(1 for j in self.jobs.values() if j.status in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} video jobs already pending")
+            self._evict_finished()
+            job = VideoJob(source, prompt, model or self.model, frame_interval, max_frames, video_id, namespace, owner,
+                           state_dir=self.state_dir)
+            self.jobs[job.id] = job
+            job.update()
+        self._executor.submit(self._run, job)
+        logger.info("Queued video job %s for %s", job.id, source)
+        return job
+
+    def get(self, job_id, owner):
+        """The caller's job, or None if it does not exist or belongs to someone else.
+
+        Jobs running in another worker are returned as a snapshot of their shared state.
+        """
+        job = self.jobs.get(job_id) or self._load(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def list(self, owner):
+        jobs = dict(self.jobs)
+        if self.state_dir:
+            for name in os.listdir(self.state_dir):
+                job_id, ext = os.path.splitext(name)
+                if ext == ".json" and job_id not in jobs:
+                    job = self._load(job_id)
+                    if job is not None:
+                        jobs[job_id] = job
+        return [job for job in jobs.values() if job.owner == owner]
+
+    def status_counts(self):
+        return collections.Counter(job.status for job in list(self.jobs.values()))
+
+    def cancel(self, job_id, owner):
+        job = self.get(job_id, owner)
+        if job is None:
+            return None
+        if job.id not in self.jobs:
+            # Another worker runs it and sees the marker before its next frame
+            if job.status not in FINISHED_STATES:
+                open(job.cancel_path, "w").close()
+            return job
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            job.update(status=CANCELLED, finished_at=time.time())
+        return job
+
+    @contextlib.contextmanager
+    def foreground(self):
+        """Mark an interactive request; workers hold back new frames until it is done."""
+        with self._idle:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._foreground -= 1
+                self._foreground_ended = time.monotonic()
+                self._idle.notify_all()
+
+    def _cancelled(self, job):
+        if not job.cancel_event.is_set() and job.cancel_path and os.path.exists(job.cancel_path):
+            job.cancel_event.set()
+        return job.cancel_event.is_set()
+
+    def _yield(self, job):
+        deadline = time.monotonic() + self.max_yield
+        with self._idle:
+            while not job.cancel_event.is_set():
+                now = time.monotonic()
+                idle_at = self._foreground_ended + IDLE_GRACE
+                if now >= deadline or (not self._foreground and now >= idle_at):
+                    return
+                self._idle.wait(min(deadline, idle_at if not self._foreground else deadline) - now)
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                # Never started; without this its shared state would stay queued
+                job.update(status=CANCELLED, finished_at=time.time())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self, job_id):
+        if not self.state_dir or not (len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)):
+            return None
+        try:
+            with open(os.path.join(self.state_dir, f"{job_id}.json"), encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        job = VideoJob.from_state(state)
+        job.cancel_path = os.path.join(self.state_dir, f"{job_id}.cancel")
+        return job
+
+    def _check_url(self, url):
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme != "https":
+            raise ValueError("Only https video URLs are accepted")
+        if parts.username or parts.password or parts.port not in (None, 443):
+            raise ValueError("Video URLs cannot carry credentials or a port")
+        if not any(host == allowed or host.endswith(f".{allowed}") for allowed in self.url_hosts):
+            raise ValueError(f"Video host {host or '(none)'} is not allowed (VIDEO_JOB_URL_HOSTS)")
+
+    def _resolve_local_path(self, path):
+        if self.video_root is None:
+            raise ValueError("Local video paths are disabled (set VIDEO_JOB_ROOT)")
+        full = os.path.realpath(os.path.join(self.video_root, path))
+        if os.path.commonpath([full, self.video_root]) != self.video_root:
+            raise ValueError("Video path is outside VIDEO_JOB_ROOT")
+        if not os.path.isfile(full):
+            raise ValueError(f"Video file not found: {path}")
+        return full
+
+    def _evict_finished(self):
+        finished = sorted((j for j in self.jobs.values() if j.status in FINISHED_STATES),
+                          key=lambda j: j.finished_at or 0)
+        for job in finished[:max(0, len(finished) - self.max_finished + 1)]:
+            del self.jobs[job.id]
+            for path in (job.state_path, job.cancel_path):
+                if path:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+
+    # --- worker side ---
+
+    def _run(self, job):
+        if self._cancelled(job):
+            if job.status == QUEUED:
+                job.update(status=CANCELLED, finished_at=time.time())
+            return
+        job.update(status=RUNNING, started_at=time.time())
+        temp_dir = tempfile.mkdtemp(prefix="video-job-")
+        try:
+            path = job.source
+            if path.startswith("https://"):
+                path = self._download(job.source, temp_dir)
+            for timestamp_ms, image_b64 in self._sample_frames(job, path):
+                self._yield(job)
+                if self._cancelled(job):
+                    raise JobCancelled()
+                result = self._analyze(job, image_b64)
+                job.add_result(timestamp_ms, result)
+                if self.on_result is not None:
+                    try:
+                        self.on_result(job, timestamp_ms, result)
+                    except Exception:
+                        logger.exception("Video job %s result callback failed", job.id)
+            job.update(status=COMPLETED, finished_at=time.time())
+            logger.info("Video job %s completed (%d frames)", job.id, len(job.results))
+        except JobCancelled:
+            job.update(status=CANCELLED, finished_at=time.time())
+            logger.info("Video job %s cancelled", job.id)
+        except Exception as e:
+            job.update(status=FAILED, error=str(e), finished_at=time.time())
+            logger.error("Video job %s failed: %s", job.id, e)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _download(self, url, temp_dir):
+        import yt_dlp
+
+        output_path = os.path.join(temp_dir, "video.mp4")
+        # No generic extractor: it would fetch whatever page the URL (or a redirect) points at
+        ydl_opts = {"format": "best[height<=720]/best", "outtmpl": output_path, "quiet": True,
+                    "allowed_extractors": ["default", "-generic"]}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([url])
+        return output_path
+
+    def _sample_frames(self, job, path):
+        """Yield (timestamp_ms, base64 JPEG) for every frame_interval-th frame."""
+        import cv2
+
+        # One decode thread per job so video work cannot saturate every core
+        cv2.setNumThreads(1)
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video {job.source}")
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if fps > 0:
+                job.update(frame_duration_ms=round(job.frame_interval * 1000 / fps))
+            if frame_count > 0:
+                available = (frame_count + job.frame_interval - 1) // job.frame_interval
+                job.update(total_frames=min(job.max_frames, available))
+            index = extracted = 0
+            while extracted < job.max_frames:
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                if not cap.grab():
+                    break
+                if index % job.frame_interval == 0:
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                    h, w = frame.shape[:2]
+                    scale = self.max_image_size / max(h, w)
+                    if scale < 1:
+                        frame = cv2.resize(frame, (round(w * scale), round(h * scale)),
+                                           interpolation=cv2.INTER_AREA)
+                    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+                    if ok:
+                        timestamp_ms = round(index * 1000 / fps) if fps > 0 else int(cap.get(cv2.CAP_PROP_POS_MSEC))
+                        yield timestamp_ms, base64.b64encode(encoded).decode()
+                        extracted += 1
+                index += 1
+        finally:
+            cap.release()
+
+    def _analyze(self, job, image_b64):
+        try:
+            result = self.client.generate(job.model, job.prompt, images=[image_b64],
+                                          options={"temperature": 0.1, "num_predict": 256},
+                                          timeout=self.request_timeout)
+            return result.text
+        except OllamaError as e:
+            return f"Error: {e.message}"
+        except httpx.HTTPError as e:
+            return f"Error: {e}"
@@ -1,5 +1,5 @@
 "use client";
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import styles from '../styles/chatbot.module.css';
 
 // Helper to render markdown-like bold and bullet points
@@ -17,10 +17,62 @@ function renderBotMessage(text: string) {
   return <span dangerouslySetInnerHTML={{ __html: html }} />;
 }
 
+const BACKEND_URL = 'http://localhost:8000';
+
+type Message = { text: string; from: 'user' | 'bot' };
+
 const Chatbot = () => {
-  const [messages, setMessages] = useState<{ text: string; from: 'user' | 'bot' }[]>([]);
+  const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  // The backend keeps the conversation; we only send the new turn
+  const sessionId = useRef<string | null>(null);
+  // Set when the server cannot keep this conversation (several API workers, or the session
+  // expired): from then on every turn sends the whole conversation to the stateless /api/chat
+  const stateless = useRef(false);
+
+  const sendConversation = async (conversation: Message[]): Promise<any> => {
+    const res = await fetch(`${BACKEND_URL}/api/chat`, {
+      method: 'POST',
+      credentials: 'include',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        messages: conversation.map(m => ({
+          role: m.from === 'user' ? 'user' : 'assistant',
+          content: [{ type: 'text', text: m.text }]
+        }))
+      })
+    });
+    return res.json();
+  };
+
+  const sendTurn = async (conversation: Message[]): Promise<any> => {
+    if (stateless.current) {
+      return sendConversation(conversation);
+    }
+    if (!sessionId.current) {
+      const res = await fetch(`${BACKEND_URL}/api/chat/sessions`, { method: 'POST', credentials: 'include' });
+      if (res.status === 503) {
+        stateless.current = true;
+        return sendConversation(conversation);
+      }
+      sessionId.current = (await res.json()).session_id;
+    }
+    const res = await fetch(`${BACKEND_URL}/api/chat/sessions/${sessionId.current}`, {
+      method: 'POST',
+      credentials: 'include',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ text: conversation[conversation.length - 1].text })
+    });
+    if (res.status === 404 || res.status === 503) {
+      // The server no longer has this conversation; a new session would start without
+      // the earlier turns, so keep sending them ourselves
+      sessionId.current = null;
+      stateless.current = true;
+      return sendConversation(conversation);
+    }
+    return res.json();
+  };
 
   const handleSend = async () => {
     if (input.trim()) {
@@ -29,17 +81,8 @@ const Chatbot = () => {
       setInput('');
       setLoading(true);
       try {
-        const res = await fetch('http://localhost:8000/api/ollama', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            messages: [
-              { content: [{ type: 'text', text: input }] }
-            ]
-          })
-        });
-        const data = await res.json();
-        setMessages(prev => [...prev, { text: data.result, from: 'bot' as const }]);
+        const data = await sendTurn([...messages, userMsg]);
+        setMessages(prev => [...prev, { text: data.result ?? data.error, from: 'bot' as const }]);
       } catch (e) {
         setMessages(prev => [...prev, { text: 'Error contacting Ollama backend.', from: 'bot' as const }]);
       }
@@ -29,6 +29,7 @@ const GoogleCalendar: React.FC = () => {
             const eventTexts = data.items.map(e => `Event: ${e.summary || ''} | Start: ${e.start?.dateTime || e.start?.date || '-'} | End: ${e.end?.dateTime || e.end?.date || '-'} | Location: ${e.location || '-'}`);
             fetch('http://localhost:8000/api/rag/upload', {
               method: 'POST',
+              credentials: 'include',
               headers: { 'Content-Type': 'application/json' },
               body: JSON.stringify({ texts: eventTexts })
             });
@@ -67,6 +68,7 @@ const GoogleCalendar: React.FC = () => {
             const taskTexts = data.items.map(t => `Task: ${t.title || ''} | Status: ${t.status || '-'} | Due: ${t.due || '-'}`);
             fetch('http://localhost:8000/api/rag/upload', {
               method: 'POST',
+              credentials: 'include',
               headers: { 'Content-Type': 'application/json' },
               body: JSON.stringify({ texts: taskTexts })
             });
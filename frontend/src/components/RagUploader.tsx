@@ -15,6 +15,7 @@ const RagUploader: React.FC = () => {
     try {
       const res = await fetch('http://localhost:8000/api/rag/upload', {
         method: 'POST',
+        credentials: 'include',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ texts })
       });
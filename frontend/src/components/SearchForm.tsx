@@ -6,6 +6,7 @@ import { useJsApiLoader } from '@react-google-maps/api';
 import styles from '../styles/acrylicForm.module.css';
 
 const PROVIDERS = [
+  { value: 'auto', label: 'Auto (local, Gemini when busy)' },
   { value: 'gemini', label: 'Google Gemini API' },
   { value: 'ollama', label: 'Ollama' },
 ];
@@ -16,7 +17,7 @@ const SearchForm: React.FC = () => {
     const dispatch = useDispatch();
     const [source, setSource] = useState('');
     const [destination, setDestination] = useState('');
-    const [provider, setProvider] = useState('ollama');
+    const [provider, setProvider] = useState('auto');
     const [loading, setLoading] = useState(false);
     const { isLoaded } = useJsApiLoader({
         googleMapsApiKey: process.env.NEXT_PUBLIC_GOOGLE_MAPS_API_KEY || '',
@@ -67,8 +67,10 @@ export const fetchRecommendations = createAsyncThunk(
     ];
     // Use backend base URL from env or default to http://localhost:8000
     const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
-    const provider = localStorage.getItem('llm_provider') || 'gemini';
-    let apiUrl = `${backendUrl}/api/gemini`;
+    // 'auto' lets the backend route between local Ollama and Gemini by load
+    const provider = localStorage.getItem('llm_provider') || 'auto';
+    let apiUrl = `${backendUrl}/api/chat`;
+    if (provider === 'gemini') apiUrl = `${backendUrl}/api/gemini`;
     if (provider === 'ollama') apiUrl = `${backendUrl}/api/ollama`;
     // If you want to disable API calls, uncomment the next line:
     // return null;
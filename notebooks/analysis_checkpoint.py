@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+On-disk checkpoint log for video analysis runs.
+Each completed frame result is appended as one JSON line, keyed by
+video id + frame timestamp + prompt + model, so a crashed or interrupted
+run can resume without re-analyzing finished frames.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+
+def video_id_for(source: str) -> str:
+    """Stable id for a video URL or local file (path + size + mtime)"""
+    if os.path.exists(source):
+        stat = os.stat(source)
+        source = f"{os.path.abspath(source)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
+class FrameResultLog:
+    """Append-only JSONL log of per-frame analysis results"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(video_id: str, timestamp_ms: int, prompt: str, model: str) -> str:
+        """Checkpoint key for one frame result"""
+        raw = json.dumps([video_id, int(timestamp_ms), prompt, model])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def records(self):
+        """Yield every valid record; a line cut short by a crash is ignored"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def completed(self, video_id: str, prompt: str, model: str) -> Dict[int, str]:
+        """Results already recorded for this video/prompt/model, by frame timestamp (ms)"""
+        done = {}
+        for record in self.records():
+            if (record.get("video_id") == video_id and record.get("prompt") == prompt
+                    and record.get("model") == model):
+                done[int(record["timestamp_ms"])] = record["result"]
+        return done
+
+    def append(self, video_id: str, timestamp_ms: int, prompt: str, model: str, result: str,
+               extra: Optional[dict] = None):
+        """Durably record one frame result"""
+        record = {
+            "key": self.key(video_id, timestamp_ms, prompt, model),
+            "video_id": video_id,
+            "timestamp_ms": int(timestamp_ms),
+            "prompt": prompt,
+            "model": model,
+            "result": result,
+        }
+        if extra:
+            record.update(extra)
+        line = json.dumps(record) + "\n"
+        with open(self.path, "ab") as f:
+            # A crash can leave the last line cut short; start on a new line so this record stays readable
+            if f.tell() > 0:
+                with open(self.path, "rb") as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        line = "\n" + line
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
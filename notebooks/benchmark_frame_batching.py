@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-frame vs. batched/tiled frame analysis against a local Ollama.
+Reports frames/sec and Ollama token counts for each mode.
+
+Usage:
+    python benchmark_frame_batching.py --video path/to/video.mp4 --frames 8
+    python benchmark_frame_batching.py --frames 8   # synthetic frames
+"""
+
+import argparse
+import json
+import time
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from video_inference_ollama import OllamaVideoAnalyzer
+
+
+def synthetic_frames(count: int, size=(1280, 720)) -> List[Image.Image]:
+    """Create simple frames with a moving square so each frame differs"""
+    frames = []
+    w, h = size
+    for i in range(count):
+        img = np.full((h, w, 3), 40, dtype=np.uint8)
+        x = int((w - 200) * i / max(1, count - 1))
+        img[h // 2 - 100:h // 2 + 100, x:x + 200] = [255, 80, 0]
+        frames.append(Image.fromarray(img))
+    return frames
+
+
+def run_mode(analyzer: OllamaVideoAnalyzer, frames: List[Image.Image], prompt: str,
+             batch_size: int, tile: bool) -> dict:
+    """Analyze all frames in one mode and collect throughput and token usage"""
+    prompt_tokens = 0
+    output_tokens = 0
+    requests_made = 0
+
+    # Wrap the request helper so every call's stats are accumulated
+    original = analyzer._post_generate
+
+    def counting_post(*args, **kwargs):
+        nonlocal prompt_tokens, output_tokens, requests_made
+        requests_made += 1
+        result = original(*args, **kwargs)
+        prompt_tokens += analyzer.last_response_stats.get('prompt_eval_count', 0)
+        output_tokens += analyzer.last_response_stats.get('eval_count', 0)
+        return result
+
+    analyzer._post_generate = counting_post
+    try:
+        start = time.perf_counter()
+        results = analyzer.analyze_video_frames(frames, prompt, batch_size=batch_size, tile=tile)
+        elapsed = time.perf_counter() - start
+    finally:
+        analyzer._post_generate = original
+
+    errors = sum(1 for r in results if r.startswith("Error"))
+    return {
+        'mode': 'single' if batch_size <= 1 else ('tiled' if tile else 'batched'),
+        'batch_size': batch_size,
+        'requests': requests_made,
+        'seconds': round(elapsed, 3),
+        'frames_per_sec': round(len(frames) / elapsed, 3) if elapsed else None,
+        'prompt_tokens': prompt_tokens,
+        'output_tokens': output_tokens,
+        'tokens_per_frame': round((prompt_tokens + output_tokens) / len(frames), 1),
+        'frame_errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', help='Local video to sample frames from (default: synthetic frames)')
+    parser.add_argument('--model', help='Ollama model (default: best available vision model)')
+    parser.add_argument('--frames', type=int, default=8)
+    parser.add_argument('--batch-sizes', default='2,4,8')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    analyzer = OllamaVideoAnalyzer()
+    analyzer.request_delay = 0
+    analyzer.model_name = args.model or analyzer.find_best_vision_model()
+    if not analyzer.model_name:
+        print("❌ No Ollama models found.")
+        return
+
+    if args.video:
+        frames = analyzer.extract_frames(args.video, frame_interval=30, max_frames=args.frames)
+    else:
+        frames = synthetic_frames(args.frames)
+    prompt = "Describe the main objects and actions in one sentence."
+
+    # Load the model up front so the first mode does not pay the load time
+    analyzer.warm_model()
+
+    runs = [run_mode(analyzer, frames, prompt, 1, False)]
+    for size in (int(s) for s in args.batch_sizes.split(',')):
+        runs.append(run_mode(analyzer, frames, prompt, size, False))
+        runs.append(run_mode(analyzer, frames, prompt, size, True))
+
+    print(f"\n📊 {len(frames)} frames, model {analyzer.model_name}")
+    print(f"{'mode':<8} {'batch':>5} {'reqs':>5} {'sec':>8} {'fps':>7} {'tok/frame':>10} {'errors':>7}")
+    for r in runs:
+        print(f"{r['mode']:<8} {r['batch_size']:>5} {r['requests']:>5} {r['seconds']:>8} "
+              f"{r['frames_per_sec']:>7} {r['tokens_per_frame']:>10} {r['frame_errors']:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': analyzer.model_name, 'frames': len(frames), 'runs': runs}, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+
+    analyzer.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of frame encoding: the PIL path (cvtColor -> fromarray ->
+thumbnail(LANCZOS) -> JPEG into BytesIO -> base64) vs. the raw-array path
+(INTER_AREA resize -> cv2.imencode -> base64). Reports ms/frame and bytes/frame
+for 1080p and 4K inputs. No Ollama needed.
+
+Usage:
+    python benchmark_frame_encoding.py --repeats 50 --output encoding.json
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from video_inference_ollama import OllamaVideoAnalyzer
+
+RESOLUTIONS = {
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Gradient background with shapes and mild noise, closer to real video than pure noise"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 0.6 + y * 0.4).astype(np.uint8)
+    frame[..., 1] = (255 - x * 0.5).astype(np.uint8)
+    frame[..., 2] = (y * 0.8).astype(np.uint8)
+    cv2.rectangle(frame, (width // 5, height // 5), (width // 2, height // 2), (20, 200, 40), -1)
+    cv2.circle(frame, (width * 2 // 3, height * 2 // 3), height // 6, (240, 240, 240), -1)
+    cv2.putText(frame, "Lecture 3: Integrals", (width // 10, height - height // 10),
+                cv2.FONT_HERSHEY_SIMPLEX, height / 400, (0, 0, 0), max(1, height // 300))
+    noise = rng.integers(-8, 9, size=frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def pil_path(analyzer: OllamaVideoAnalyzer, frame: np.ndarray) -> str:
+    """The original per-frame conversion used by extract_frames + image_to_base64"""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    pil_image = Image.fromarray(frame_rgb)
+    if pil_image.size[0] > 1024 or pil_image.size[1] > 1024:
+        pil_image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+    return analyzer.image_to_base64(pil_image)
+
+
+def measure(fn, frame: np.ndarray, repeats: int) -> dict:
+    fn(frame)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encoded = fn(frame)
+    elapsed = time.perf_counter() - start
+    return {
+        'ms_per_frame': round(elapsed / repeats * 1000, 2),
+        'base64_bytes_per_frame': len(encoded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    analyzer = OllamaVideoAnalyzer(image_quality=args.quality)
+    paths = {
+        'pil_lanczos_jpeg': lambda f: pil_path(analyzer, f),
+        'cv2_area_jpeg_1024': analyzer.encode_frame,
+    }
+    native = OllamaVideoAnalyzer(image_quality=args.quality, max_image_size=None)
+    paths[f'cv2_area_jpeg_native_{native.target_image_size()}'] = native.encode_frame
+    webp = OllamaVideoAnalyzer(image_format='webp', image_quality=args.quality, max_image_size=None)
+    paths['cv2_area_webp_native'] = webp.encode_frame
+
+    results = {}
+    for name, (w, h) in RESOLUTIONS.items():
+        frame = synthetic_frame(w, h)
+        results[name] = {path: measure(fn, frame, args.repeats) for path, fn in paths.items()}
+
+    print(f"{'input':<6} {'path':<28} {'ms/frame':>9} {'bytes/frame':>12}")
+    for name, by_path in results.items():
+        for path, r in by_path.items():
+            print(f"{name:<6} {path:<28} {r['ms_per_frame']:>9} {r['base64_bytes_per_frame']:>12}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+
+    for a in (analyzer, native, webp):
+        a.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compare bytes transferred when sampling a few frames from a remote video:
+full yt-dlp download vs. seeking in the remote stream (HTTP range requests),
+plus a second full-mode run that should be served from the download cache.
+
+Serves a video from a local HTTP server that supports Range requests, so no
+internet access or Ollama is needed.
+
+Usage:
+    python benchmark_partial_download.py --video lecture.mp4 --frames 5
+    python benchmark_partial_download.py   # synthetic 5-minute video
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from video_cache import VideoDownloadCache
+from video_inference_ollama import OllamaVideoAnalyzer
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with single-range 'Range: bytes=a-b' support and byte accounting"""
+
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if not match:
+            return super().send_head()
+        path = self.translate_path(self.path)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404)
+            return None
+        size = os.fstat(f.fileno()).st_size
+        first, last = match.groups()
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = size - int(last), size - 1
+        end = min(end, size - 1)
+        if start >= size:
+            f.close()
+            self.send_error(416)
+            return None
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        f.seek(start)
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        while remaining is None or remaining > 0:
+            chunk = source.read(64 * 1024 if remaining is None else min(64 * 1024, remaining))
+            if not chunk:
+                break
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            with RangeRequestHandler.lock:
+                RangeRequestHandler.bytes_sent += len(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+
+def make_test_video(path, seconds=300, fps=30, size=(640, 360)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    rng = np.random.default_rng(0)
+    # A small noisy patch keeps the bitrate realistic without making generation slow
+    noise = [rng.integers(0, 255, size=(90, 160, 3), dtype=np.uint8) for _ in range(16)]
+    for i in range(seconds * fps):
+        frame = np.full((size[1], size[0], 3), (i // fps) % 200, dtype=np.uint8)
+        frame[:90, :160] = noise[i % len(noise)]
+        cv2.putText(frame, f"t={i / fps:.1f}s", (50, 250), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 4)
+        writer.write(frame)
+    writer.release()
+
+
+def measure(label, fn):
+    RangeRequestHandler.bytes_sent = 0
+    start = time.perf_counter()
+    frames = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(frames):>6} {elapsed:>8.2f} {RangeRequestHandler.bytes_sent / 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Video file to serve (default: synthetic video)")
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--frame-interval", type=int, default=1500)
+    args = parser.parse_args()
+
+    serve_dir = tempfile.mkdtemp(prefix="range-serve-")
+    cache_dir = tempfile.mkdtemp(prefix="video-cache-")
+    try:
+        video_name = "video.mp4"
+        if args.video:
+            shutil.copy(args.video, os.path.join(serve_dir, video_name))
+        else:
+            print("Creating synthetic video...")
+            make_test_video(os.path.join(serve_dir, video_name))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(RangeRequestHandler, directory=serve_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/{video_name}"
+        size = os.path.getsize(os.path.join(serve_dir, video_name))
+        print(f"Serving {url} ({size / 1e6:.1f} MB)\n")
+
+        analyzer = OllamaVideoAnalyzer(download_cache=VideoDownloadCache(cache_dir, max_bytes=2 * size))
+
+        def full_download():
+            path = analyzer.download_video_from_url(url)
+            return analyzer.extract_frames(path, args.frame_interval, args.frames, raw=True)
+
+        def streamed():
+            stream_url = analyzer.resolve_stream_url(url)
+            return analyzer.sample_frames_by_seeking(stream_url, args.frame_interval, args.frames, raw=True)
+
+        print(f"{'mode':<28} {'frames':>6} {'sec':>8} {'MB served':>12}")
+        measure("stream + seek (ranges)", streamed)
+        measure("full download", full_download)
+        measure("full download (cached)", full_download)
+
+        server.shutdown()
+        analyzer.cleanup()
+    finally:
+        shutil.rmtree(serve_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Hierarchical map-reduce summarization for long videos.
+
+Frame captions or transcript segments are packed into windows that fit a
+per-call token budget and summarized in parallel (map). The summaries are then
+grouped and summarized again level by level until one call can hold them all,
+and that last call applies the final prompt (reduce). Every map and
+intermediate reduce result is cached on disk, so asking a new final question
+about the same video only reruns the final call.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from ollama_client import shared_client
+
+# (start_ms, end_ms, text) or plain text
+Item = Union[str, Tuple[int, int, str]]
+
+MAP_PROMPT = ("Summarize the following part of a video ({span}). Keep key facts, names, "
+              "formulas and on-screen text. Be concise.\n\n{text}")
+REDUCE_PROMPT = ("Merge these consecutive section summaries of a video into one concise summary, "
+                 "keeping the order of events and important details.\n\n{text}")
+FINAL_PROMPT = "Summarize this video for a student who missed it."
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def ollama_generate_fn(url: str = "http://localhost:11434", model: str = "gemma3",
+                       num_predict: int = 512, timeout: int = 300) -> Callable[[str], str]:
+    """Text-only Ollama call usable as MapReduceSummarizer.generate_fn"""
+    client = shared_client(url.split("/api/")[0])
+
+    def generate(prompt: str) -> str:
+        return client.generate(model, prompt, options={"temperature": 0.2, "num_predict": num_predict},
+                               timeout=timeout).text
+    generate.cache_tag = f"ollama:{model}:{num_predict}"
+    return generate
+
+
+def _format_ms(ms: int) -> str:
+    seconds = int(ms) // 1000
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class MapReduceSummarizer:
+    """Summarize arbitrarily long captions/transcripts under a per-call token budget"""
+
+    def __init__(self, generate_fn: Callable[[str], str], token_budget: int = 3000,
+                 max_workers: int = 4, cache_dir: Optional[str] = ".summary_cache",
+                 count_tokens: Callable[[str], int] = approx_tokens,
+                 map_prompt: str = MAP_PROMPT, reduce_prompt: str = REDUCE_PROMPT):
+        self.generate_fn = generate_fn
+        self.token_budget = token_budget
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.count_tokens = count_tokens
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.calls = 0  # model calls actually made (cache misses)
+        self._memory_cache = {}
+        # Cached summaries are only valid for the same model/settings
+        self._cache_tag = getattr(generate_fn, "cache_tag", getattr(generate_fn, "__qualname__", "generate"))
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # -------- caching --------
+    def _cached_generate(self, prompt: str) -> str:
+        key = hashlib.sha256(f"{self._cache_tag}\0{prompt}".encode("utf-8")).hexdigest()
+        if key in self._memory_cache:
+            return self._memory_cache[key]
+        path = os.path.join(self.cache_dir, f"{key}.json") if self.cache_dir else None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)["summary"]
+        else:
+            summary = self.generate_fn(prompt)
+            self.calls += 1
+            if path:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"summary": summary}, f)
+                os.replace(tmp_path, path)
+        self._memory_cache[key] = summary
+        return summary
+
+    # -------- windowing --------
+    def _pack(self, pieces: Sequence[Tuple[Optional[int], Optional[int], str]], overhead: int):
+        """Greedily group pieces into windows that fit the token budget after the prompt overhead"""
+        limit = max(1, self.token_budget - overhead)
+        windows, current, used = [], [], 0
+        for start, end, text in pieces:
+            tokens = self.count_tokens(text)
+            if tokens > limit:
+                # A single oversized piece is cut by characters into windows of its own
+                if current:
+                    windows.append(current)
+                    current, used = [], 0
+                step = max(1, len(text) * limit // tokens)
+                windows.extend([(start, end, text[i:i + step])] for i in range(0, len(text), step))
+                continue
+            if current and used + tokens > limit:
+                windows.append(current)
+                current, used = [], 0
+            current.append((start, end, text))
+            used += tokens
+        if current:
+            windows.append(current)
+        return windows
+
+    def _overhead(self, template: str) -> int:
+        return self.count_tokens(template.format(span="", text=""))
+
+    @staticmethod
+    def _render(window) -> Tuple[str, str]:
+        starts = [s for s, _, _ in window if s is not None]
+        ends = [e for _, e, _ in window if e is not None]
+        span = f"{_format_ms(min(starts))} - {_format_ms(max(ends))}" if starts and ends else "part of the video"
+        lines = []
+        for start, end, text in window:
+            lines.append(f"[{_format_ms(start)}] {text}" if start is not None else text)
+        return span, "\n".join(lines)
+
+    def _summarize_level(self, windows, template: str):
+        def run(window):
+            span, text = self._render(window)
+            summary = self._cached_generate(template.format(span=span, text=text))
+            return (window[0][0], window[-1][1], summary)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run, windows))
+
+    def _final_prompt(self, final_prompt: str, text: str) -> str:
+        return f"{final_prompt}\n\nSection summaries:\n{text}"
+
+    # -------- public API --------
+    def map(self, items: Sequence[Item]) -> List[Tuple[Optional[int], Optional[int], str]]:
+        """Summarize windows of items in parallel; returns (start_ms, end_ms, summary) per window"""
+        pieces = [(None, None, item) if isinstance(item, str) else tuple(item) for item in items]
+        pieces = [p for p in pieces if p[2].strip()]
+        windows = self._pack(pieces, self._overhead(self.map_prompt))
+        return self._summarize_level(windows, self.map_prompt)
+
+    def reduce(self, summaries: Sequence[Item], final_prompt: str = FINAL_PROMPT, max_levels: int = 8) -> str:
+        """Merge summaries level by level until one call fits, then answer final_prompt"""
+        level = [(None, None, s) if isinstance(s, str) else tuple(s) for s in summaries]
+        final_overhead = self.count_tokens(self._final_prompt(final_prompt, ""))
+        for _ in range(max_levels):
+            if len(self._pack(level, final_overhead)) <= 1:
+                break
+            windows = self._pack(level, self._overhead(self.reduce_prompt))
+            level = self._summarize_level(windows, self.reduce_prompt)
+        _, text = self._render(level)
+        # The final answer depends on the question, so it is never cached
+        self.calls += 1
+        return self.generate_fn(self._final_prompt(final_prompt, text))
+
+    def summarize(self, items: Sequence[Item], final_prompt: str = FINAL_PROMPT) -> str:
+        """Full map-reduce; only the final call reruns when final_prompt changes"""
+        return self.reduce(self.map(items), final_prompt)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark frame extraction: ffmpeg -> PNG files -> re-read + base64 (current path)
+vs. frames piped from ffmpeg's stdout (MJPEG and raw RGB). Reports wall time,
+frames, base64 payload bytes and bytes written to disk for each mode.
+
+Uses a synthetic test video unless --video is given. Requires ffmpeg/ffprobe.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from glob import glob
+
+from test_insights_path import encode_frame_base64, encode_image_base64, extract_frames, stream_frames
+
+
+def make_test_video(path, seconds, size):
+    subprocess.run([
+        "ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi",
+        "-i", f"testsrc2=duration={seconds}:size={size}:rate=30",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", path
+    ], check=True)
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(f) for f in glob(os.path.join(path, "*")))
+
+
+def bench_png(video_path, frame_rate, work_dir):
+    frames_dir = os.path.join(work_dir, "frames")
+    start = time.perf_counter()
+    extract_frames(video_path, frames_dir, frame_rate=frame_rate)
+    payload = 0
+    files = sorted(glob(os.path.join(frames_dir, "frame_*.png")))
+    for frame_path in files:
+        payload += len(encode_image_base64(frame_path))
+    elapsed = time.perf_counter() - start
+    written = dir_bytes(frames_dir)
+    shutil.rmtree(frames_dir)
+    return {"seconds": round(elapsed, 3), "frames": len(files), "payload_bytes": payload, "disk_bytes_written": written}
+
+
+def bench_stream(video_path, frame_rate, codec, width):
+    start = time.perf_counter()
+    frames = payload = 0
+    for frame in stream_frames(video_path, frame_rate, width=width, codec=codec):
+        payload += len(encode_frame_base64(frame))
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "frames": frames, "payload_bytes": payload, "disk_bytes_written": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Video to benchmark (default: synthetic testsrc2 video)")
+    parser.add_argument("--seconds", type=int, default=120, help="Length of the synthetic video")
+    parser.add_argument("--size", default="1920x1080", help="Resolution of the synthetic video")
+    parser.add_argument("--frame-rate", type=float, default=1)
+    parser.add_argument("--width", type=int, default=896, help="Scale width for the streamed modes")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="frame-bench-")
+    try:
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(work_dir, "test.mp4")
+            make_test_video(video_path, args.seconds, args.size)
+
+        results = {
+            "png_files": bench_png(video_path, args.frame_rate, work_dir),
+            "pipe_mjpeg": bench_stream(video_path, args.frame_rate, "mjpeg", None),
+            f"pipe_mjpeg_scaled_{args.width}": bench_stream(video_path, args.frame_rate, "mjpeg", args.width),
+            f"pipe_raw_scaled_{args.width}": bench_stream(video_path, args.frame_rate, "rawvideo", args.width),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'mode':<24} {'sec':>8} {'frames':>7} {'payload MB':>11} {'disk MB':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<24} {r['seconds']:>8} {r['frames']:>7} "
+              f"{r['payload_bytes'] / 1e6:>11.2f} {r['disk_bytes_written'] / 1e6:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Real-time factor of the chunked transcription pipeline for several worker counts.
+
+    python benchmark_transcription.py --video lecture.mp4 --transcriber whisper --workers 1,2,4
+    python benchmark_transcription.py --video lecture.mp4   # offline stub transcriber
+"""
+
+import argparse
+import json
+
+from transcription_pipeline import StubTranscriber, WhisperTranscriber, transcribe_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--transcriber", choices=["stub", "whisper"], default="stub")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    transcriber = WhisperTranscriber() if args.transcriber == "whisper" else StubTranscriber()
+    runs = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        result = transcribe_video(args.video, transcriber, max_workers=workers)
+        runs.append({
+            "workers": workers,
+            "segments": len(result.segments),
+            "audio_seconds": round(result.audio_seconds, 1),
+            "wall_seconds": round(result.wall_seconds, 2),
+            "first_segment_seconds": round(result.first_segment_seconds or 0, 2),
+            "real_time_factor": round(result.real_time_factor, 4),
+        })
+        print(runs[-1])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"transcriber": args.transcriber, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
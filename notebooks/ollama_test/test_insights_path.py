@@ -5,6 +5,8 @@ Extract insights from a video using Ollama's Gemma 3 model
 
 import subprocess
 import os
+import io
+import json
 import base64
 import requests
 from PIL import Image
@@ -17,6 +19,10 @@ FRAME_RATE = 1  # Extract 1 frame per second
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3"
 INSIGHT_PROMPT = "Give a brief summary of what is happening in this frame."
+STREAM_FRAMES = True  # Pipe frames from ffmpeg through memory instead of writing PNGs
+STREAM_CODEC = "mjpeg"  # "mjpeg" (JPEG bytes, sent as-is) or "rawvideo" (RGB24, encoded here)
+FRAME_WIDTH = 896  # Scale inside ffmpeg (keeps aspect ratio); None keeps source size
+PIPE_READ_SIZE = 1 << 16
 
 # -------- STEP 1: Extract Frames --------
 def extract_frames(video_path, output_dir, frame_rate=1):
@@ -28,6 +34,105 @@ def extract_frames(video_path, output_dir, frame_rate=1):
     ]
     subprocess.run(cmd, check=True)
 
+# -------- STEP 1b: Stream Frames from ffmpeg stdout --------
+def probe_size(video_path):
+    out = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height", "-of", "json", video_path
+    ], check=True, capture_output=True).stdout
+    stream = json.loads(out)["streams"][0]
+    return stream["width"], stream["height"]
+
+def scaled_size(video_path, width):
+    src_w, src_h = probe_size(video_path)
+    if not width:
+        return src_w, src_h
+    # Same rounding as ffmpeg's scale=W:-2 (height kept even)
+    height = int(round(src_h * width / src_w / 2) * 2)
+    return width, height
+
+def stream_frames(video_path, frame_rate=1, width=None, codec="mjpeg", read_size=PIPE_READ_SIZE):
+    """Yield frames decoded by ffmpeg straight from its stdout, no temp files.
+
+    mjpeg yields complete JPEG bytes; rawvideo yields (width, height, rgb24 bytes).
+    Scaling is done inside ffmpeg with the portable software scaler.
+    """
+    filters = [f"fps={frame_rate}"]
+    if width:
+        filters.append(f"scale={width}:-2:flags=area")
+    cmd = ["ffmpeg", "-loglevel", "error", "-i", video_path, "-vf", ",".join(filters)]
+    if codec == "mjpeg":
+        cmd += ["-f", "image2pipe", "-c:v", "mjpeg", "-q:v", "3", "-"]
+    elif codec == "rawvideo":
+        frame_w, frame_h = scaled_size(video_path, width)
+        cmd += ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    else:
+        raise ValueError(f"Unsupported stream codec: {codec}")
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        if codec == "mjpeg":
+            yield from _split_jpegs(proc.stdout, read_size)
+        else:
+            frame_bytes = frame_w * frame_h * 3
+            buffer = bytearray(frame_bytes)
+            view = memoryview(buffer)
+            while True:
+                filled = 0
+                while filled < frame_bytes:
+                    n = proc.stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                if filled < frame_bytes:
+                    break
+                yield frame_w, frame_h, bytes(buffer)
+    except BaseException:
+        # Generator closed early (or reading failed): ffmpeg would block writing to the closed pipe
+        proc.kill()
+        raise
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+def _split_jpegs(pipe, read_size):
+    """Cut a concatenated MJPEG stream into JPEG images using fixed-size reads"""
+    pending = bytearray()
+    scanned = 0  # bytes of the current image already searched for the end marker
+    while True:
+        chunk = pipe.read(read_size)
+        if not chunk:
+            break
+        pending += chunk
+        while True:
+            start = pending.find(b"\xff\xd8")
+            if start < 0:
+                # Keep a trailing 0xFF in case the marker is split across reads
+                del pending[:-1 if pending.endswith(b"\xff") else len(pending)]
+                scanned = 0
+                break
+            if start:
+                del pending[:start]
+                scanned = 0
+            end = pending.find(b"\xff\xd9", max(2, scanned - 1))
+            if end < 0:
+                scanned = len(pending)
+                break
+            yield bytes(pending[:end + 2])
+            del pending[:end + 2]
+            scanned = 0
+
+def encode_frame_base64(frame):
+    """Base64 for a streamed frame (JPEG bytes, or raw RGB encoded to JPEG)"""
+    if isinstance(frame, bytes):
+        return base64.b64encode(frame).decode("utf-8")
+    width, height, rgb = frame
+    buffer = io.BytesIO()
+    Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1).save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
 # -------- STEP 2: Encode Image to Base64 --------
 def encode_image_base64(image_path):
     with open(image_path, "rb") as f:
@@ -45,6 +150,14 @@ def get_insight_from_frame(image_b64):
 
 # -------- MAIN --------
 def main():
+    if STREAM_FRAMES:
+        print("Streaming frames from ffmpeg...")
+        for i, frame in enumerate(stream_frames(VIDEO_PATH, FRAME_RATE, FRAME_WIDTH, STREAM_CODEC)):
+            print(f"\nAnalyzing Frame {i+1} (t={i / FRAME_RATE:.0f}s)")
+            insight = get_insight_from_frame(encode_frame_base64(frame))
+            print(f"Insight: {insight}")
+        return
+
     print("Extracting frames...")
     extract_frames(VIDEO_PATH, FRAMES_DIR, frame_rate=FRAME_RATE)
 
@@ -1,9 +1,17 @@
 import os
+import re
+import sys
 import subprocess
 import requests
 from google.cloud import speech_v1 as speech
 from google.cloud import storage, texttospeech
 from pydub import AudioSegment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from map_reduce_summarizer import FINAL_PROMPT, MapReduceSummarizer, ollama_generate_fn
+from transcription_pipeline import (
+    GoogleSpeechTranscriber, IncrementalQuerier, StubTranscriber, WhisperTranscriber,
+    format_timestamp, transcribe_video,
+)
 
 # CONFIGURATION
 VIDEO_PATH = "temp/copy.mp4"
@@ -11,6 +19,11 @@ AUDIO_PATH = "temp/copy_audio.wav"
 BUCKET_NAME = "staging.ngo-vidyasagar.appspot.com"  
 BLOB_NAME = "copy_audio.wav"
 OLLAMA_ENDPOINT = "http://localhost:11434/api/generate"  # Gemma via Ollama
+CHUNKED_TRANSCRIPTION = True  # Split audio on silence and transcribe segments concurrently
+TRANSCRIBER = "google"  # "google", "whisper" (local/offline) or "stub" (offline testing)
+TRANSCRIBE_WORKERS = 4
+GEMMA_WINDOW_SECONDS = 120  # Query Gemma for every ~2 minutes of transcript as it arrives
+SUMMARY_TOKEN_BUDGET = 3000  # Max prompt tokens per Gemma call when summarizing long transcripts
 
 # STEP 1: Extract Audio from Video
 def extract_audio(video_path, audio_path):
@@ -71,14 +84,53 @@ def synthesize_speech(text, output_audio="response.mp3"):
         out.write(response.audio_content)
     print(f"Gemma reply spoken: {output_audio}")
 
+def make_summarizer():
+    return MapReduceSummarizer(ollama_generate_fn(OLLAMA_ENDPOINT, "gemma3"),
+                               token_budget=SUMMARY_TOKEN_BUDGET)
+
+def make_transcriber(name):
+    if name == "google":
+        return GoogleSpeechTranscriber()
+    if name == "whisper":
+        return WhisperTranscriber()
+    if name == "stub":
+        return StubTranscriber()
+    raise ValueError(f"Unknown transcriber: {name}")
+
+# MAIN FLOW (chunked)
+def main_chunked():
+    querier = IncrementalQuerier(query_gemma3, window_seconds=GEMMA_WINDOW_SECONDS)
+
+    def on_segment(segment):
+        print(f"[{format_timestamp(segment.start_ms)} - {format_timestamp(segment.end_ms)}] {segment.text}")
+        querier(segment)
+
+    result = transcribe_video(VIDEO_PATH, make_transcriber(TRANSCRIBER),
+                              max_workers=TRANSCRIBE_WORKERS, on_segment=on_segment)
+    partial_answers = querier.results()
+    print(f"⏱️  {len(result.segments)} segments, {result.audio_seconds:.1f}s audio in "
+          f"{result.wall_seconds:.1f}s (real-time factor {result.real_time_factor:.3f}, "
+          f"first segment after {result.first_segment_seconds or 0:.1f}s)")
+
+    gemma_reply = make_summarizer().reduce(partial_answers, FINAL_PROMPT)
+    print("🤖 Gemma:", gemma_reply)
+
+    synthesize_speech(gemma_reply)
+
 # MAIN FLOW
 def main():
+    if CHUNKED_TRANSCRIPTION:
+        main_chunked()
+        return
+
     extract_audio(VIDEO_PATH, AUDIO_PATH)
     gcs_uri = upload_to_gcs(BUCKET_NAME, AUDIO_PATH, BLOB_NAME)
     transcript = transcribe_from_gcs(gcs_uri)
     print("📝 Transcript:", transcript)
 
-    gemma_reply = query_gemma3(transcript)
+    # Map-reduce over sentences so long transcripts never exceed the model context
+    sentences = re.split(r"(?<=[.!?])\s+", transcript)
+    gemma_reply = make_summarizer().summarize(sentences, FINAL_PROMPT)
     print("🤖 Gemma:", gemma_reply)
 
     synthesize_speech(gemma_reply)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Chunked, concurrent transcription of a video's audio track.
+
+Audio is streamed out of ffmpeg as 16 kHz mono PCM (no WAV on disk), split on
+silence into segments, and each segment is transcribed concurrently through a
+pluggable Transcriber. Finished segments are stitched back in order with
+timestamps and handed to a callback as soon as they are ready, so downstream
+work (e.g. querying Gemma) can start before the whole video is transcribed.
+"""
+
+import abc
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # s16le
+
+
+@dataclass
+class AudioChunk:
+    start_ms: int
+    end_ms: int
+    pcm: bytes  # 16-bit little-endian mono
+
+
+@dataclass
+class TranscriptSegment:
+    start_ms: int
+    end_ms: int
+    text: str
+
+
+# -------- Audio streaming and silence splitting --------
+def stream_pcm(video_path: str, sample_rate: int = SAMPLE_RATE, read_size: int = 1 << 15) -> Iterator[bytes]:
+    """Yield fixed-size reads of mono s16le PCM decoded by ffmpeg"""
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-i", video_path, "-vn",
+        "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        while True:
+            chunk = proc.stdout.read(read_size)
+            if not chunk:
+                break
+            yield chunk
+    except BaseException:
+        # Generator closed early (or reading failed): ffmpeg would block writing to the closed pipe
+        proc.kill()
+        raise
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def split_on_silence(pcm_stream: Iterator[bytes], sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                     silence_db: float = -40.0, min_silence_ms: int = 400,
+                     min_segment_ms: int = 2000, max_segment_ms: int = 30000) -> Iterator[AudioChunk]:
+    """Cut a PCM stream at pauses, yielding segments as soon as each one closes.
+
+    A segment closes at the first run of min_silence_ms quiet audio after
+    min_segment_ms, or is force-cut at max_segment_ms. Fully silent segments
+    are dropped.
+    """
+    frame_bytes = sample_rate * frame_ms // 1000 * BYTES_PER_SAMPLE
+    threshold = 32768 * 10 ** (silence_db / 20)
+    silence_frames_needed = max(1, min_silence_ms // frame_ms)
+
+    pending = bytearray()
+    segment = bytearray()
+    segment_start_ms = 0
+    position_ms = 0
+    quiet_run = 0
+    voiced = False
+
+    def close_segment():
+        nonlocal segment, segment_start_ms, voiced
+        chunk = AudioChunk(segment_start_ms, position_ms, bytes(segment)) if voiced else None
+        segment = bytearray()
+        segment_start_ms = position_ms
+        voiced = False
+        return chunk
+
+    for data in pcm_stream:
+        pending += data
+        usable = len(pending) - len(pending) % frame_bytes
+        frames = np.frombuffer(bytes(pending[:usable]), dtype="<i2").reshape(-1, frame_bytes // BYTES_PER_SAMPLE)
+        del pending[:usable]
+        rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1)) if len(frames) else []
+
+        for frame, level in zip(frames, rms):
+            segment += frame.tobytes()
+            position_ms += frame_ms
+            if level < threshold:
+                quiet_run += 1
+            else:
+                quiet_run = 0
+                voiced = True
+            length_ms = position_ms - segment_start_ms
+            if ((quiet_run >= silence_frames_needed and length_ms >= min_segment_ms)
+                    or length_ms >= max_segment_ms):
+                chunk = close_segment()
+                if chunk is not None:
+                    yield chunk
+
+    if pending:
+        segment += pending
+        position_ms += len(pending) // BYTES_PER_SAMPLE * 1000 // sample_rate
+    chunk = close_segment()
+    if chunk is not None:
+        yield chunk
+
+
+# -------- Transcribers --------
+class Transcriber(abc.ABC):
+    """Turns one PCM segment into text. Implementations must be thread-safe."""
+
+    @abc.abstractmethod
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        ...
+
+
+class GoogleSpeechTranscriber(Transcriber):
+    """Google Speech-to-Text synchronous recognize, audio sent inline (segments < 60 s)"""
+
+    def __init__(self, language_code: str = "en-US"):
+        from google.cloud import speech_v1 as speech
+
+        self.speech = speech
+        self.client = speech.SpeechClient()
+        self.config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=SAMPLE_RATE,
+            language_code=language_code,
+            enable_automatic_punctuation=True,
+        )
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        audio = self.speech.RecognitionAudio(content=pcm)
+        response = self.client.recognize(config=self.config, audio=audio, timeout=120)
+        return " ".join(r.alternatives[0].transcript for r in response.results).strip()
+
+
+class WhisperTranscriber(Transcriber):
+    """Local/offline transcription with faster-whisper (pip install faster-whisper)"""
+
+    def __init__(self, model_size: str = "base", compute_type: str = "int8", cpu_threads: int = 2):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(audio, beam_size=1)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+class StubTranscriber(Transcriber):
+    """Offline stand-in for tests and benchmarks: fixed delay per audio second"""
+
+    def __init__(self, seconds_per_audio_second: float = 0.05):
+        self.seconds_per_audio_second = seconds_per_audio_second
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        duration = len(pcm) / BYTES_PER_SAMPLE / sample_rate
+        time.sleep(duration * self.seconds_per_audio_second)
+        return f"[speech {duration:.1f}s]"
+
+
+# -------- Pipeline --------
+@dataclass
+class TranscriptionResult:
+    segments: List[TranscriptSegment]
+    audio_seconds: float
+    wall_seconds: float
+    first_segment_seconds: Optional[float]
+
+    @property
+    def real_time_factor(self) -> float:
+        """Processing time / audio duration (below 1.0 is faster than real time)"""
+        return self.wall_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+    @property
+    def text(self) -> str:
+        return " ".join(s.text for s in self.segments if s.text)
+
+
+def transcribe_video(video_path: str, transcriber: Transcriber, max_workers: int = 4,
+                     on_segment: Optional[Callable[[TranscriptSegment], None]] = None,
+                     **split_options) -> TranscriptionResult:
+    """Transcribe a video's audio concurrently, segment by segment.
+
+    on_segment is called from a worker thread for every segment, strictly in
+    timeline order, as soon as it and all earlier segments are transcribed.
+    If it raises, no further audio is submitted or passed to it, and the first
+    error is re-raised once the segments already submitted have finished.
+    (A failing transcription is not an error here: its segment text says so.)
+    """
+    start = time.perf_counter()
+    first_ready = None
+    results = {}
+    next_index = 0
+    ordered: List[TranscriptSegment] = []
+    lock = threading.Lock()
+    callback_errors: List[Exception] = []
+    # Bound how many decoded segments wait for a worker, so memory stays flat on long videos
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def run(index: int, chunk: AudioChunk):
+        nonlocal next_index, first_ready
+        try:
+            text = transcriber.transcribe(chunk.pcm)
+        except Exception as e:
+            text = f"[transcription error: {e}]"
+        finally:
+            slots.release()
+        with lock:
+            results[index] = TranscriptSegment(chunk.start_ms, chunk.end_ms, text)
+            # Emit the contiguous prefix of finished segments
+            while next_index in results:
+                segment = results.pop(next_index)
+                ordered.append(segment)
+                next_index += 1
+                if first_ready is None:
+                    first_ready = time.perf_counter() - start
+                if on_segment is not None and not callback_errors:
+                    try:
+                        on_segment(segment)
+                    except Exception as e:
+                        callback_errors.append(e)
+
+    audio_ms = 0
+    chunks = split_on_silence(stream_pcm(video_path), **split_options)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcribe") as pool:
+            for index, chunk in enumerate(chunks):
+                slots.acquire()
+                if callback_errors:
+                    break
+                audio_ms = chunk.end_ms
+                pool.submit(run, index, chunk)
+    finally:
+        chunks.close()  # stops ffmpeg when leaving early
+    if callback_errors:
+        raise callback_errors[0]
+
+    return TranscriptionResult(
+        segments=ordered,
+        audio_seconds=audio_ms / 1000,
+        wall_seconds=time.perf_counter() - start,
+        first_segment_seconds=first_ready,
+    )
+
+
+class IncrementalQuerier:
+    """Sends transcript windows to an LLM as soon as enough segments are ready.
+
+    Queries run on their own single worker so transcription never waits on the model.
+    """
+
+    def __init__(self, query_fn: Callable[[str], str], window_seconds: float = 120,
+                 prompt_template: str = "Summarize this part of a lecture transcript ({start} - {end}):\n\n{text}"):
+        self.query_fn = query_fn
+        self.window_ms = int(window_seconds * 1000)
+        self.prompt_template = prompt_template
+        self.window: List[TranscriptSegment] = []
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gemma")
+        self.futures = []
+
+    def __call__(self, segment: TranscriptSegment):
+        self.window.append(segment)
+        if segment.end_ms - self.window[0].start_ms >= self.window_ms:
+            self._flush()
+
+    def _flush(self):
+        if not self.window:
+            return
+        window, self.window = self.window, []
+        prompt = self.prompt_template.format(
+            start=format_timestamp(window[0].start_ms),
+            end=format_timestamp(window[-1].end_ms),
+            text=" ".join(s.text for s in window),
+        )
+        self.futures.append((window[0].start_ms, window[-1].end_ms, self.pool.submit(self.query_fn, prompt)))
+
+    def results(self):
+        """Flush the last window and wait for every partial answer, in order"""
+        self._flush()
+        answers = [(start, end, future.result()) for start, end, future in self.futures]
+        self.pool.shutdown()
+        return answers
+
+
+def format_timestamp(ms: int) -> str:
+    seconds, millis = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Tests for the video analysis checkpoint log (run with pytest from notebooks/)
+"""
+
+from analysis_checkpoint import FrameResultLog
+
+
+def test_append_after_a_truncated_last_line(tmp_path):
+    log = FrameResultLog(str(tmp_path / "frames.jsonl"))
+    log.append("video", 0, "Describe.", "gemma3", "first")
+    log.append("video", 1000, "Describe.", "gemma3", "second")
+
+    # Simulate a crash in the middle of writing the second record
+    with open(log.path, "rb+") as f:
+        f.truncate(len(f.read()) - 10)
+    log.append("video", 2000, "Describe.", "gemma3", "third")
+
+    assert log.completed("video", "Describe.", "gemma3") == {0: "first", 2000: "third"}
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+URL-keyed local cache for downloaded videos with size-bounded LRU eviction.
+"""
+
+import hashlib
+import os
+import time
+from typing import Optional
+
+
+class VideoDownloadCache:
+    """Keeps downloaded videos on disk so re-analyzing a URL skips the download"""
+
+    def __init__(self, cache_dir: str = ".video_cache", max_bytes: int = 5 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, url: str, extension: str = ".mp4") -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, key + extension)
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached file for url, marked as recently used; None on a miss"""
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        return path
+
+    def total_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in self._entries())
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used videos until the cache fits max_bytes"""
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(os.path.getsize(p) for p in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            total -= os.path.getsize(path)
+            os.remove(path)
+            print(f"🧹 Evicted cached video: {path}")
+
+    def _entries(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if not name.endswith((".part", ".ytdl"))]
@@ -6,34 +6,73 @@ This script uses Ollama to analyze videos with Gemma3 model.
 
 import cv2
 import yt_dlp
-import requests
 import os
+import sys
 from PIL import Image
 import numpy as np
-from typing import List, Optional
+from typing import List, Optional, Union
 import tempfile
 from pathlib import Path
 import time
+from analysis_checkpoint import FrameResultLog, video_id_for
+from map_reduce_summarizer import FINAL_PROMPT, MapReduceSummarizer, ollama_generate_fn
+from video_cache import VideoDownloadCache
+
+# Shared Ollama client layer lives with the backend
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from ollama_client import OllamaError, shared_client
 import json
 import base64
 import io
+import math
+import re
+
+# A sampled frame: PIL image (RGB) or raw decoded OpenCV array (BGR)
+Frame = Union[Image.Image, np.ndarray]
+
+# Longest side each model resizes images to internally; larger frames only cost bandwidth
+NATIVE_INPUT_SIZES = {
+    'gemma3': 896,
+    'llava': 672,
+}
+
+IMAGE_ENCODE_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', None),
+}
 
 class OllamaVideoAnalyzer:
     """Video analyzer using Ollama with Gemma3"""
     
-    def __init__(self, ollama_url: str = "http://localhost:11434", model_name: str = "gemma3"):
+    def __init__(self, ollama_url: str = "http://localhost:11434", model_name: str = "gemma3",
+                 batch_size: int = 1, tile_batches: bool = False,
+                 image_format: str = 'jpeg', image_quality: int = 85, max_image_size: Optional[int] = 1024,
+                 download_cache: Optional[VideoDownloadCache] = None, keep_alive: str = "30m"):
         self.ollama_url = ollama_url
         self.model_name = model_name
+        # Pooled connections, TTL-cached model discovery and keep_alive, shared per Ollama host
+        self.client = shared_client(ollama_url, keep_alive=keep_alive)
         self.temp_dir = tempfile.mkdtemp()
+        # Frames packed into one /api/generate call (1 = one request per frame)
+        self.batch_size = batch_size
+        # Send each batch as a single grid image instead of N separate images
+        self.tile_batches = tile_batches
+        self.num_predict_per_frame = 256
+        self.request_delay = 1.0
+        # Timing/token fields of the most recent Ollama response
+        self.last_response_stats = {}
+        # Encoding of frames sent to the model; max_image_size=None uses the model's native size
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_image_size = max_image_size
+        # Reuse downloads of videos that are analyzed again (None = always download to temp_dir)
+        self.download_cache = download_cache
         
-    def get_available_models(self):
-        """Get list of available models"""
+    def get_available_models(self, refresh: bool = False):
+        """Get list of available models (cached by the shared client)"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                return [m['name'] for m in models]
-            return []
+            return self.client.list_models(refresh=refresh)
         except Exception as e:
             print(f"Error getting models: {e}")
             return []
@@ -54,6 +93,12 @@ class OllamaVideoAnalyzer:
                 print(f"✅ Found vision model: {model}")
                 return model
         
+        # Otherwise prefer any model that reports the vision capability
+        for model in models:
+            if 'vision' in self.client.capabilities(model):
+                print(f"✅ Found vision-capable model: {model}")
+                return model
+        
         # If no vision models found, use the first available model
         if models:
             print(f"⚠️  No specific vision models found. Using: {models[0]}")
@@ -61,81 +106,291 @@ class OllamaVideoAnalyzer:
         
         return None
     
-    def image_to_base64(self, image: Image.Image) -> str:
-        """Convert PIL image to base64 string"""
+    def warm_model(self):
+        """Load the selected model now and keep it resident, so the first frame doesn't pay the load"""
+        try:
+            timings = self.client.warm(self.model_name)
+            print(f"🔥 Model {self.model_name} loaded in {timings.load_ms:.0f} ms "
+                  f"(keep_alive={self.client.keep_alive})")
+            return timings
+        except Exception as e:
+            print(f"Error warming model: {e}")
+            return None
+    
+    def target_image_size(self) -> int:
+        """Longest side frames are downsized to before encoding"""
+        if self.max_image_size:
+            return self.max_image_size
+        for prefix, size in NATIVE_INPUT_SIZES.items():
+            if self.model_name.startswith(prefix):
+                return size
+        return 1024
+    
+    def downsize_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Shrink a raw frame to the target size with area interpolation (no copy if already small)"""
+        h, w = frame.shape[:2]
+        limit = self.target_image_size()
+        scale = limit / max(h, w)
+        if scale >= 1:
+            return frame
+        return cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                          interpolation=cv2.INTER_AREA)
+    
+    def encode_frame(self, frame: np.ndarray) -> str:
+        """Downsize and encode a raw BGR frame straight to base64, without a PIL round trip"""
+        extension, quality_flag = IMAGE_ENCODE_FORMATS[self.image_format]
+        params = [quality_flag, self.image_quality] if quality_flag is not None else []
+        ok, encoded = cv2.imencode(extension, self.downsize_frame(frame), params)
+        if not ok:
+            raise ValueError(f"Could not encode frame as {self.image_format}")
+        return base64.b64encode(encoded).decode()
+    
+    def image_to_base64(self, image: Frame) -> str:
+        """Convert PIL image (or raw BGR frame) to base64 string"""
+        if isinstance(image, np.ndarray):
+            return self.encode_frame(image)
         buffer = io.BytesIO()
         image.save(buffer, format='JPEG', quality=85)
         img_str = base64.b64encode(buffer.getvalue()).decode()
         return img_str
     
-    def analyze_image_with_ollama(self, image: Image.Image, prompt: str) -> str:
+    def _post_generate(self, prompt: str, images_base64: List[str], num_predict: int):
+        """Send one /api/generate request and record its token/timing stats"""
+        result = self.client.generate(
+            self.model_name,
+            prompt,
+            images=images_base64,
+            options={
+                "temperature": 0.1,
+                "top_p": 0.9,
+                "top_k": 40,
+                "num_predict": num_predict
+            },
+            timeout=60 * max(1, len(images_base64))
+        )
+        self.last_response_stats = {
+            key: result.raw.get(key, 0)
+            for key in ('prompt_eval_count', 'eval_count', 'total_duration',
+                        'load_duration', 'prompt_eval_duration', 'eval_duration')
+        }
+        # Model load vs. inference time, from Ollama's own timing fields
+        self.last_response_stats.update(result.timings.as_dict())
+        return result
+    
+    def _describe_error(self, error: OllamaError) -> str:
+        """Turn a failed Ollama response into a readable error message"""
+        print(f"Error from Ollama API: {error.status_code}")
+        error_text = error.message.lower()
+        
+        # Check for specific error types
+        if "vision" in error_text or "image" in error_text:
+            return "Error: This model doesn't support vision/image analysis. Try installing a vision model like 'llava'."
+        elif "model" in error_text and "not found" in error_text:
+            return f"Error: Model '{self.model_name}' not found. Available models: {self.get_available_models()}"
+        else:
+            return f"Error: {error.message}"
+    
+    def analyze_image_with_ollama(self, image: Frame, prompt: str) -> str:
         """Analyze a single image using Ollama"""
         try:
             # Convert image to base64
             image_base64 = self.image_to_base64(image)
             
-            # Prepare the request payload
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "images": [image_base64],
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "top_k": 40,
-                    "num_predict": 256
-                }
-            }
-            
-            # Make request to Ollama
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '').strip()
-            else:
-                print(f"Error from Ollama API: {response.status_code}")
-                error_text = response.text.lower()
-                
-                # Check for specific error types
-                if "vision" in error_text or "image" in error_text:
-                    return "Error: This model doesn't support vision/image analysis. Try installing a vision model like 'llava'."
-                elif "model" in error_text and "not found" in error_text:
-                    return f"Error: Model '{self.model_name}' not found. Available models: {self.get_available_models()}"
-                else:
-                    return f"Error: {response.text}"
-                
+            return self._post_generate(prompt, [image_base64], self.num_predict_per_frame).text
+        
+        except OllamaError as e:
+            return self._describe_error(e)
         except Exception as e:
             print(f"Error analyzing image with Ollama: {e}")
             return f"Error: {str(e)}"
     
+    def tile_frames(self, frames: List[Frame], max_size: int = 1024) -> Frame:
+        """Pack frames into one numbered grid image (left-to-right, top-to-bottom)"""
+        columns = math.ceil(math.sqrt(len(frames)))
+        rows = math.ceil(len(frames) / columns)
+        cell_w = max(1, max_size // columns)
+        cell_h = max(1, max_size // rows)
+        
+        if isinstance(frames[0], np.ndarray):
+            grid = np.zeros((cell_h * rows, cell_w * columns, 3), dtype=np.uint8)
+            for i, frame in enumerate(frames):
+                h, w = frame.shape[:2]
+                scale = min(cell_w / w, cell_h / h)
+                cell = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                  interpolation=cv2.INTER_AREA)
+                x, y = (i % columns) * cell_w, (i // columns) * cell_h
+                grid[y:y + cell.shape[0], x:x + cell.shape[1]] = cell
+                cv2.rectangle(grid, (x, y), (x + 22, y + 14), (0, 0, 0), -1)
+                cv2.putText(grid, str(i + 1), (x + 3, y + 12), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            return grid
+        
+        from PIL import ImageDraw
+        
+        grid = Image.new('RGB', (cell_w * columns, cell_h * rows))
+        draw = ImageDraw.Draw(grid)
+        for i, frame in enumerate(frames):
+            cell = frame.convert('RGB')
+            cell.thumbnail((cell_w, cell_h), Image.Resampling.LANCZOS)
+            x, y = (i % columns) * cell_w, (i // columns) * cell_h
+            grid.paste(cell, (x, y))
+            # Label each cell so the model can refer to it by number
+            draw.rectangle([x, y, x + 22, y + 14], fill=(0, 0, 0))
+            draw.text((x + 3, y + 2), str(i + 1), fill=(255, 255, 255))
+        return grid
+    
+    def build_batch_prompt(self, prompt: str, num_frames: int, tiled: bool = False) -> str:
+        """Wrap a per-frame prompt so the model answers once per frame"""
+        if tiled:
+            layout = (f"The image is a grid of {num_frames} consecutive video frames, "
+                      f"numbered 1 to {num_frames} left-to-right, top-to-bottom.")
+        else:
+            layout = f"You are given {num_frames} consecutive video frames, in order, numbered 1 to {num_frames}."
+        return (
+            f"{layout}\n"
+            f"For each frame: {prompt}\n"
+            f"Answer with exactly {num_frames} entries, one per frame, each starting on a new line "
+            f"as 'Frame <number>: <answer>'. Do not add any other text."
+        )
+    
+    def parse_batch_response(self, text: str, num_frames: int) -> List[str]:
+        """Split a 'Frame <n>: ...' response back into per-frame results"""
+        marker = re.compile(r'^[\s*#>-]*(?:frame|image)\s*(\d+)\s*\**\s*[:.)\-\u2013\u2014]\s*\**\s*(.*)$',
+                            re.IGNORECASE)
+        sections = {}
+        current = None
+        for line in text.splitlines():
+            match = marker.match(line)
+            if match:
+                current = int(match.group(1))
+                sections.setdefault(current, [])
+                if match.group(2).strip():
+                    sections[current].append(match.group(2).strip())
+            elif current is not None and line.strip():
+                sections[current].append(line.strip())
+        
+        results = []
+        for n in range(1, num_frames + 1):
+            if sections.get(n):
+                results.append(" ".join(sections[n]))
+            else:
+                results.append("Error: No description for this frame in the batched response.")
+        return results
+    
+    def analyze_frame_batch(self, frames: List[Frame], prompt: str, tile: bool = False) -> List[str]:
+        """Analyze several consecutive frames with a single Ollama request"""
+        try:
+            if tile:
+                images_base64 = [self.image_to_base64(self.tile_frames(frames))]
+            else:
+                images_base64 = [self.image_to_base64(frame) for frame in frames]
+            
+            batch_prompt = self.build_batch_prompt(prompt, len(frames), tiled=tile)
+            result = self._post_generate(batch_prompt, images_base64,
+                                         self.num_predict_per_frame * len(frames))
+            return self.parse_batch_response(result.text, len(frames))
+        
+        except OllamaError as e:
+            return [self._describe_error(e)] * len(frames)
+        except Exception as e:
+            print(f"Error analyzing frame batch with Ollama: {e}")
+            return [f"Error: {str(e)}"] * len(frames)
+    
     def download_video_from_url(self, url: str, output_path: Optional[str] = None) -> str:
-        """Download video from URL using yt-dlp"""
+        """Download video from URL using yt-dlp (served from the download cache when possible)"""
+        if output_path is None and self.download_cache is not None:
+            cached = self.download_cache.get(url)
+            if cached:
+                print(f"Using cached video: {cached}")
+                return cached
+            output_path = self.download_cache.path_for(url)
         if output_path is None:
             output_path = os.path.join(self.temp_dir, "video.mp4")
         
         ydl_opts = {
-            'format': 'best[height<=720]',  # Limit to 720p for efficiency
+            'format': 'best[height<=720]/best',  # Limit to 720p for efficiency (direct links have no height)
             'outtmpl': output_path,
-            'quiet': True
+            'quiet': True,
+            'noprogress': True
         }
         
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 ydl.download([url])
             print(f"Video downloaded to: {output_path}")
+            if self.download_cache is not None:
+                self.download_cache.evict(keep=output_path)
             return output_path
         except Exception as e:
             print(f"Error downloading video: {e}")
             return None
     
-    def extract_frames(self, video_path: str, frame_interval: int = 30, max_frames: int = 10) -> List[Image.Image]:
-        """Extract frames from video"""
+    def resolve_stream_url(self, url: str) -> Optional[str]:
+        """Direct media URL for a page/video URL, without downloading anything"""
+        ydl_opts = {
+            'format': 'best[height<=720][protocol^=http]/best[protocol^=http]',
+            'quiet': True
+        }
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+            return info.get('url') or info['requested_formats'][0]['url']
+        except Exception as e:
+            print(f"Error resolving stream URL: {e}")
+            return None
+    
+    def sample_frames_by_seeking(self, source: str, frame_interval: int = 30, max_frames: int = 10,
+                                 raw: bool = False, with_timestamps: bool = False) -> list:
+        """Sample the same frames as extract_frames by seeking to each one
+        
+        For a remote URL FFmpeg fetches only the byte ranges around each seek
+        target, so a short preview of a long video does not download the whole file.
+        """
+        frames = []
+        cap = cv2.VideoCapture(source)
+        
+        if not cap.isOpened():
+            print(f"Error: Could not open video {source}")
+            return frames
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if fps <= 0:
+            cap.release()
+            print("Error: Stream does not report a frame rate; download the video instead")
+            return frames
+        
+        print(f"Stream info: {total_frames} frames, {fps:.2f} fps, {total_frames / fps:.2f} seconds")
+        
+        for i in range(max_frames):
+            frame_index = i * frame_interval
+            if total_frames > 0 and frame_index >= total_frames:
+                break
+            timestamp_ms = round(frame_index * 1000 / fps)
+            cap.set(cv2.CAP_PROP_POS_MSEC, timestamp_ms)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            if raw:
+                frame = self.downsize_frame(frame)
+            else:
+                frame = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                if frame.size[0] > 1024 or frame.size[1] > 1024:
+                    frame.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+            frames.append((timestamp_ms, frame) if with_timestamps else frame)
+            print(f"Extracted frame {i+1}/{max_frames} at {timestamp_ms / 1000:.1f}s")
+        
+        cap.release()
+        return frames
+    
+    def extract_frames(self, video_path: str, frame_interval: int = 30, max_frames: int = 10,
+                       raw: bool = False, with_timestamps: bool = False) -> list:
+        """Extract frames from video
+        
+        With raw=True frames are returned as downsized BGR arrays for encode_frame,
+        skipping the RGB conversion and PIL copies of the full-resolution frame.
+        With with_timestamps=True each item is a (timestamp_ms, frame) tuple.
+        """
         frames = []
         cap = cv2.VideoCapture(video_path)
         
@@ -153,20 +408,32 @@ class OllamaVideoAnalyzer:
         extracted_count = 0
         
         while extracted_count < max_frames:
-            ret, frame = cap.read()
-            if not ret:
+            # grab() skips decoding the frames we are not going to keep
+            if not cap.grab():
                 break
             
             if frame_count % frame_interval == 0:
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                pil_image = Image.fromarray(frame_rgb)
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
                 
-                # Resize if too large
-                if pil_image.size[0] > 1024 or pil_image.size[1] > 1024:
-                    pil_image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+                if raw:
+                    frame = self.downsize_frame(frame)
+                else:
+                    # Convert BGR to RGB
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    pil_image = Image.fromarray(frame_rgb)
+                    
+                    # Resize if too large
+                    if pil_image.size[0] > 1024 or pil_image.size[1] > 1024:
+                        pil_image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+                    frame = pil_image
                 
-                frames.append(pil_image)
+                if with_timestamps:
+                    timestamp_ms = round(frame_count * 1000 / fps) if fps > 0 else int(cap.get(cv2.CAP_PROP_POS_MSEC))
+                    frames.append((timestamp_ms, frame))
+                else:
+                    frames.append(frame)
                 extracted_count += 1
                 print(f"Extracted frame {extracted_count}/{max_frames} at frame {frame_count}")
             
@@ -175,52 +442,119 @@ class OllamaVideoAnalyzer:
         cap.release()
         return frames
     
-    def analyze_video_frames(self, frames: List[Image.Image], prompt: str) -> List[str]:
-        """Analyze multiple frames from a video"""
-        results = []
+    def analyze_video_frames(self, frames: List[Frame], prompt: str,
+                             batch_size: Optional[int] = None, tile: Optional[bool] = None,
+                             timestamps: Optional[List[int]] = None,
+                             checkpoint: Optional[FrameResultLog] = None,
+                             video_id: Optional[str] = None) -> List[str]:
+        """Analyze multiple frames from a video
         
-        for i, frame in enumerate(frames):
-            print(f"\n--- Analyzing Frame {i+1}/{len(frames)} ---")
-            
-            result = self.analyze_image_with_ollama(frame, prompt)
-            results.append(result)
-            
+        With a checkpoint log (plus video_id and frame timestamps), every finished
+        frame is appended to the log as soon as it completes and frames already in
+        the log are skipped, so an interrupted run resumes where it stopped.
+        """
+        if checkpoint is not None:
+            if not video_id:
+                raise ValueError("A checkpoint needs the video_id its frames belong to")
+            if timestamps is None or len(timestamps) != len(frames):
+                raise ValueError("A checkpoint needs one timestamp per frame")
+        batch_size = batch_size or self.batch_size
+        tile = self.tile_batches if tile is None else tile
+        results: List[Optional[str]] = [None] * len(frames)
+        
+        if checkpoint is not None:
+            done = checkpoint.completed(video_id, prompt, self.model_name)
+            for i, ts in enumerate(timestamps):
+                if ts in done:
+                    results[i] = done[ts]
+            resumed = sum(r is not None for r in results)
+            if resumed:
+                print(f"⏩ Resuming: {resumed}/{len(frames)} frames already in {checkpoint.path}")
+        
+        def record(i: int, result: str):
+            results[i] = result
             print(f"Frame {i+1} Analysis:")
             print(result)
+            # Errors are not checkpointed so they are retried on the next run
+            if checkpoint is not None and not result.startswith("Error"):
+                checkpoint.append(video_id, timestamps[i], prompt, self.model_name, result)
+        
+        pending = [i for i, r in enumerate(results) if r is None]
+        
+        if batch_size > 1:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                print(f"\n--- Analyzing Frames {', '.join(str(i+1) for i in batch)} of {len(frames)} "
+                      f"({'tiled' if tile else 'batched'}) ---")
+                
+                batch_results = self.analyze_frame_batch([frames[i] for i in batch], prompt, tile=tile)
+                for i, result in zip(batch, batch_results):
+                    record(i, result)
+                print("-" * 50)
+                
+                time.sleep(self.request_delay)
+            return results
+        
+        for i in pending:
+            print(f"\n--- Analyzing Frame {i+1}/{len(frames)} ---")
+            
+            record(i, self.analyze_image_with_ollama(frames[i], prompt))
             print("-" * 50)
             
             # Small delay to prevent overwhelming the API
-            time.sleep(1)
+            time.sleep(self.request_delay)
         
         return results
     
-    def analyze_video_from_url(self, video_url: str, prompt: str = "Describe what you see in this video frame in detail.", 
-                              frame_interval: int = 30, max_frames: int = 5):
-        """Analyze a video from URL"""
-        print(f"Processing video from URL: {video_url}")
-        
-        # Download video
-        video_path = self.download_video_from_url(video_url)
-        if video_path is None:
-            return None
-        
-        # Extract frames
-        frames = self.extract_frames(video_path, frame_interval, max_frames)
-        if not frames:
+    def _analyze_video_file(self, video_path: str, video_id: str, prompt: str, frame_interval: int,
+                            max_frames: int, checkpoint_path: Optional[str], seek: bool = False):
+        """Extract and analyze frames, checkpointing results if a log path is given"""
+        extract = self.sample_frames_by_seeking if seek else self.extract_frames
+        sampled = extract(video_path, frame_interval, max_frames, raw=True, with_timestamps=True)
+        if not sampled:
             print("No frames extracted from video")
             return None
         
-        # Analyze frames
-        results = self.analyze_video_frames(frames, prompt)
+        timestamps = [ts for ts, _ in sampled]
+        frames = [frame for _, frame in sampled]
+        checkpoint = FrameResultLog(checkpoint_path) if checkpoint_path else None
         
+        results = self.analyze_video_frames(frames, prompt, timestamps=timestamps,
+                                            checkpoint=checkpoint, video_id=video_id)
         return {
-            'video_url': video_url,
+            'video_id': video_id,
             'frames_analyzed': len(frames),
+            'timestamps_ms': timestamps,
             'results': results
         }
     
+    def analyze_video_from_url(self, video_url: str, prompt: str = "Describe what you see in this video frame in detail.", 
+                              frame_interval: int = 30, max_frames: int = 5,
+                              checkpoint_path: Optional[str] = None, stream: bool = False):
+        """Analyze a video from URL
+        
+        With stream=True frames are read from the remote file by seeking
+        (HTTP range requests) instead of downloading the whole video first.
+        """
+        print(f"Processing video from URL: {video_url}")
+        
+        if stream and not (self.download_cache and self.download_cache.get(video_url)):
+            video_path = self.resolve_stream_url(video_url)
+        else:
+            stream = False
+            video_path = self.download_video_from_url(video_url)
+        if video_path is None:
+            return None
+        
+        analysis = self._analyze_video_file(video_path, video_id_for(video_url), prompt,
+                                            frame_interval, max_frames, checkpoint_path, seek=stream)
+        if analysis is None:
+            return None
+        return {'video_url': video_url, **analysis}
+    
     def analyze_local_video(self, video_path: str, prompt: str = "Describe what you see in this video frame in detail.", 
-                           frame_interval: int = 30, max_frames: int = 5):
+                           frame_interval: int = 30, max_frames: int = 5,
+                           checkpoint_path: Optional[str] = None):
         """Analyze a local video file"""
         print(f"Processing local video: {video_path}")
         
@@ -228,20 +562,25 @@ class OllamaVideoAnalyzer:
             print(f"Error: Video file not found: {video_path}")
             return None
         
-        # Extract frames
-        frames = self.extract_frames(video_path, frame_interval, max_frames)
-        if not frames:
-            print("No frames extracted from video")
+        analysis = self._analyze_video_file(video_path, video_id_for(video_path), prompt,
+                                            frame_interval, max_frames, checkpoint_path)
+        if analysis is None:
             return None
-        
-        # Analyze frames
-        results = self.analyze_video_frames(frames, prompt)
-        
-        return {
-            'video_path': video_path,
-            'frames_analyzed': len(frames),
-            'results': results
-        }
+        return {'video_path': video_path, **analysis}
+    
+    def summarize_results(self, analysis: dict, final_prompt: str = FINAL_PROMPT,
+                          token_budget: int = 3000, cache_dir: str = ".summary_cache") -> str:
+        """Map-reduce summary of per-frame results; cached so only the final prompt reruns"""
+        summarizer = MapReduceSummarizer(
+            ollama_generate_fn(self.ollama_url, self.model_name),
+            token_budget=token_budget,
+            cache_dir=cache_dir,
+        )
+        timestamps = analysis.get('timestamps_ms') or [None] * len(analysis['results'])
+        items = [(ts, ts, result) if ts is not None else result
+                 for ts, result in zip(timestamps, analysis['results'])
+                 if result and not result.startswith("Error")]
+        return summarizer.summarize(items, final_prompt)
     
     def cleanup(self):
         """Clean up temporary files"""
@@ -250,6 +589,8 @@ class OllamaVideoAnalyzer:
             shutil.rmtree(self.temp_dir)
             print(f"Cleaned up temporary directory: {self.temp_dir}")
 
+CHECKPOINT_PATH = "video_analysis_checkpoint.jsonl"
+
 def main():
     """Main function to demonstrate video analysis with Ollama"""
     
@@ -261,13 +602,8 @@ def main():
     
     # Test Ollama connection
     try:
-        response = requests.get(f"{analyzer.ollama_url}/api/tags")
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            print(f"✅ Connected to Ollama. Available models: {[m['name'] for m in models]}")
-        else:
-            print("❌ Could not connect to Ollama. Make sure it's running.")
-            return
+        models = analyzer.client.list_models(refresh=True)
+        print(f"✅ Connected to Ollama. Available models: {models}")
     except Exception as e:
         print(f"❌ Error connecting to Ollama: {e}")
         print("Make sure Ollama is running with: ollama serve")
@@ -278,6 +614,7 @@ def main():
     if best_model:
         analyzer.model_name = best_model
         print(f"🤖 Using model: {analyzer.model_name}")
+        analyzer.warm_model()
     else:
         print("❌ No models found. Please install a model first:")
         print("  ollama pull gemma3")
@@ -293,8 +630,9 @@ def main():
     print(f"📹 Processing video: {video_url}")
     print(f"🔍 Analysis prompt: {prompt}")
     
-    # Run analysis
-    results = analyzer.analyze_video_from_url(video_url, prompt, frame_interval=60, max_frames=3)
+    # Run analysis; finished frames are checkpointed so a rerun resumes after a crash
+    results = analyzer.analyze_video_from_url(video_url, prompt, frame_interval=60, max_frames=3,
+                                              checkpoint_path=CHECKPOINT_PATH)
     
     if results:
         print("\n" + "="*50)
@@ -307,6 +645,10 @@ def main():
             print(result)
             print("-" * 30)
         
+        results['summary'] = analyzer.summarize_results(results)
+        print("\n📝 Video Summary:")
+        print(results['summary'])
+        
         # Save results
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         output_file = f"video_analysis_{timestamp}.json"